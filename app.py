@@ -6,39 +6,32 @@ that integrates with AdGuard Home to block websites on schedule.
 
 import os
 import logging
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import atexit
+import itertools
 import signal
 import sys
 
 from services.database import DatabaseManager
 from services.adguard_api import AdGuardAPI
 from services.scheduler_service import SchedulerService
+from services.stats_service import StatsService
+from services.querylog_ingest import QueryLogIngester
+from services import heatmap, log_export, schedule_io, shared_snapshot
+from services.domain_utils import domain_key
+from services.logging_setup import configure_logging
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-log_level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper())
-log_file = os.getenv('LOG_FILE', 'logs/app.log')
-
-# Create logs directory if it doesn't exist
-os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
-logging.basicConfig(
-    level=log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging (non-blocking, rotated; see services/logging_setup.py)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -70,14 +63,56 @@ def create_app():
     adguard_api = AdGuardAPI()
     scheduler_service = SchedulerService(db_manager, adguard_api)
     
+    def managed_domains():
+        return {domain_key(website['url']) for website in db_manager.get_all_websites()}
+    
+    # AdGuard stats for our domains, refreshed off the request path
+    stats_service = StatsService(adguard_api, managed_domains)
+    scheduler_service.add_maintenance_job(
+        stats_service.refresh, stats_service.ttl, 'stats_refresh', 'Refresh AdGuard stats', run_now=True
+    )
+    
+    # Per-minute query counts for our domains from the AdGuard query log
+    querylog_ingester = QueryLogIngester(db_manager, adguard_api, managed_domains)
+    scheduler_service.add_maintenance_job(
+        querylog_ingester.ingest, querylog_ingester.interval, 'querylog_ingest', 'Ingest AdGuard query log',
+        run_now=True
+    )
+    
+    # Schedules and merged intervals shared with every worker through /dev/shm
+    snapshot_reader = shared_snapshot.SnapshotReader()
+    shared_snapshot.publish(db_manager, snapshot_reader.path)
+    
+    # Views whose successful POSTs change schedules or websites
+    schedule_writers = {'add_website', 'edit_schedule', 'toggle_schedule', 'edit_website',
+                        'delete_website', 'toggle_website', 'api_import_schedules'}
+    
+    @app.after_request
+    def publish_snapshot(response):
+        """Publish a new schedule snapshot after a schedule or website change."""
+        if request.method == 'POST' and request.endpoint in schedule_writers and response.status_code < 400:
+            # The change is already committed; a failed publish only leaves workers on the old snapshot
+            try:
+                shared_snapshot.publish(db_manager, snapshot_reader.path)
+            except Exception as e:
+                logger.error(f"Error publishing schedule snapshot: {e}")
+        return response
+    
     # Routes
     @app.route('/')
     @login_required
     def dashboard():
         """Main dashboard showing all scheduled website groups."""
         try:
-            schedules = db_manager.get_all_schedules()
-            return render_template('dashboard.html', schedules=schedules)
+            snapshot = snapshot_reader.get()
+            schedules = snapshot.schedules if snapshot else db_manager.get_all_schedules()
+            domain_counts = {
+                website['url']: stats_service.get_domain_counts(domain_key(website['url']))
+                for schedule in schedules for website in schedule['websites']
+            }
+            return render_template('dashboard.html', schedules=schedules,
+                                   adguard_health=adguard_api.get_health(),
+                                   domain_counts=domain_counts)
         except Exception as e:
             logger.error(f"Error loading dashboard: {e}")
             flash('Error loading dashboard', 'error')
@@ -152,13 +187,11 @@ def create_app():
                     try:
                         schedule_data = db_manager.get_schedule(schedule_id)
                         if schedule_data and 'websites' in schedule_data:
-                            for website in schedule_data['websites']:
-                                try:
-                                    scheduler_service.schedule_website(website['id'], website['url'], start_time, end_time)
-                                    logger.info(f"Scheduled website: {website['url']}")
-                                except Exception as scheduler_error:
-                                    logger.error(f"Error scheduling website {website['url']}: {scheduler_error}")
-                                    # Continue with other websites even if one fails
+                            scheduler_service.schedule_many([
+                                {'id': website['id'], 'url': website['url'],
+                                 'start_time': start_time, 'end_time': end_time}
+                                for website in schedule_data['websites']
+                            ])
                         else:
                             logger.warning(f"Could not retrieve schedule data for ID: {schedule_id}")
                     except Exception as schedule_error:
@@ -180,6 +213,88 @@ def create_app():
         
         return render_template('add_website.html')
     
+    @app.route('/edit_schedule/<int:schedule_id>', methods=['GET', 'POST'])
+    @login_required
+    def edit_schedule(schedule_id):
+        """Edit a schedule, applying only what changed."""
+        schedule = db_manager.get_schedule(schedule_id)
+        if not schedule:
+            flash('Schedule not found', 'error')
+            return redirect(url_for('dashboard'))
+        
+        if request.method == 'POST':
+            name = request.form.get('name', '').strip()
+            websites_text = request.form.get('websites', '').strip()
+            start_time = request.form.get('start_time')
+            end_time = request.form.get('end_time')
+            enabled = request.form.get('enabled') == 'on'
+            form = dict(name=name, websites=websites_text, start_time=start_time,
+                        end_time=end_time, enabled=enabled)
+            
+            websites = []
+            for line in websites_text.split('\n'):
+                url = line.strip()
+                if url:
+                    # Clean URL (remove protocol if present)
+                    if url.startswith(('http://', 'https://')):
+                        url = url.split('://', 1)[1]
+                    websites.append(url)
+            
+            if not name or not websites or not start_time or not end_time:
+                flash('All fields are required', 'error')
+                return render_template('edit_schedule.html', **form)
+            
+            try:
+                diff = db_manager.update_schedule(schedule_id, name, start_time, end_time, websites, enabled)
+                if diff is None:
+                    flash('Schedule not found', 'error')
+                    return redirect(url_for('dashboard'))
+                
+                # Only the websites the edit touched get their jobs changed
+                scheduler_service.queue_schedule_diff(diff)
+                
+                flash(f'Schedule "{name}" updated ({len(diff["added"])} added, '
+                      f'{len(diff["removed"])} removed)', 'success')
+                return redirect(url_for('dashboard'))
+                
+            except Exception as e:
+                logger.error(f"Error updating schedule: {e}")
+                flash('Error updating schedule', 'error')
+                return render_template('edit_schedule.html', **form)
+        
+        return render_template(
+            'edit_schedule.html',
+            name=schedule['name'],
+            websites='\n'.join(website['url'] for website in schedule['websites']),
+            start_time=schedule['start_time'],
+            end_time=schedule['end_time'],
+            enabled=schedule['enabled']
+        )
+    
+    @app.route('/toggle_schedule/<int:schedule_id>', methods=['POST'])
+    @login_required
+    def toggle_schedule(schedule_id):
+        """Toggle a whole schedule on/off."""
+        try:
+            schedule = db_manager.get_schedule(schedule_id)
+            if schedule:
+                new_enabled = not schedule['enabled']
+                diff = db_manager.update_schedule(
+                    schedule_id, schedule['name'], schedule['start_time'], schedule['end_time'],
+                    [website['url'] for website in schedule['websites']], new_enabled
+                )
+                scheduler_service.queue_schedule_diff(diff)
+                
+                status = 'enabled' if new_enabled else 'disabled'
+                flash(f'Schedule "{schedule["name"]}" {status}', 'success')
+            else:
+                flash('Schedule not found', 'error')
+        except Exception as e:
+            logger.error(f"Error toggling schedule: {e}")
+            flash('Error updating schedule status', 'error')
+        
+        return redirect(url_for('dashboard'))
+    
     @app.route('/edit_website/<int:website_id>', methods=['GET', 'POST'])
     @login_required
     def edit_website(website_id):
@@ -204,15 +319,22 @@ def create_app():
                 if url.startswith(('http://', 'https://')):
                     url = url.split('://', 1)[1]
                 
-                # Remove old schedule
-                scheduler_service.remove_website_schedule(website_id)
-                
-                # Update database
-                db_manager.update_website(website_id, url, start_time, end_time, enabled)
+                # Times belong to the website's schedule, so the edit is applied
+                # as a schedule diff with this website's URL swapped in
+                schedule = db_manager.get_schedule(website['schedule_id'])
+                urls = [url if other['id'] == website_id else other['url'] for other in schedule['websites']]
+                diff = db_manager.update_schedule(schedule['id'], schedule['name'], start_time, end_time,
+                                                  urls, schedule['enabled'])
+                scheduler_service.queue_schedule_diff(diff)
                 
-                # Add new schedule if enabled
-                if enabled:
-                    scheduler_service.schedule_website(website_id, url, start_time, end_time)
+                # The enabled checkbox is this website's own flag
+                edited = next(other for other in diff['added'] + diff['kept'] if other['url'] == url)
+                if bool(edited['enabled']) != enabled:
+                    db_manager.update_website_enabled(edited['id'], enabled)
+                    if enabled and diff['enabled']:
+                        scheduler_service.queue_schedule_website(edited['id'], url, start_time, end_time)
+                    else:
+                        scheduler_service.queue_remove_website_schedule(edited['id'])
                 
                 flash(f'Website {url} updated successfully', 'success')
                 return redirect(url_for('dashboard'))
@@ -230,7 +352,7 @@ def create_app():
         try:
             website = db_manager.get_website(website_id)
             if website:
-                scheduler_service.remove_website_schedule(website_id)
+                scheduler_service.queue_remove_website_schedule(website_id)
                 db_manager.delete_website(website_id)
                 flash(f'Website {website["url"]} deleted successfully', 'success')
             else:
@@ -252,12 +374,12 @@ def create_app():
                 db_manager.update_website_enabled(website_id, new_enabled)
                 
                 if new_enabled:
-                    scheduler_service.schedule_website(
+                    scheduler_service.queue_schedule_website(
                         website_id, website['url'], 
                         website['start_time'], website['end_time']
                     )
                 else:
-                    scheduler_service.remove_website_schedule(website_id)
+                    scheduler_service.queue_remove_website_schedule(website_id)
                 
                 status = 'enabled' if new_enabled else 'disabled'
                 flash(f'Website {website["url"]} {status}', 'success')
@@ -281,15 +403,248 @@ def create_app():
             flash('Error loading history', 'error')
             return render_template('history.html', logs=[])
     
+    @app.route('/search')
+    @login_required
+    def search():
+        """Search schedules, websites and history."""
+        query = request.args.get('q', '').strip()
+        failed_only = request.args.get('failed') == '1'
+        results = {'schedules': [], 'websites': [], 'logs': []}
+        if query:
+            try:
+                results = db_manager.search(query, limit=50, failed_only=failed_only)
+            except Exception as e:
+                logger.error(f"Error searching: {e}")
+                flash('Error running search', 'error')
+        return render_template('search.html', query=query, failed_only=failed_only, results=results)
+    
+    @app.route('/history/summary')
+    @login_required
+    def history_summary():
+        """Show daily, per-domain and per-schedule action summaries."""
+        days = request.args.get('days', 30, type=int)
+        try:
+            summary = db_manager.get_history_summary(days)
+        except Exception as e:
+            logger.error(f"Error loading history summary: {e}")
+            flash('Error loading history summary', 'error')
+            summary = {'days': days, 'by_day': [], 'by_domain': [], 'by_schedule': []}
+        return render_template('history_summary.html', summary=summary)
+    
+    @app.route('/api/schedules/import', methods=['POST'])
+    @login_required
+    def api_import_schedules():
+        """Bulk import schedules from a JSON or CSV document."""
+        try:
+            upload = request.files.get('file')
+            if upload is not None:
+                text = upload.read().decode('utf-8-sig')
+                filename = upload.filename or ''
+            else:
+                text = request.get_data(as_text=True)
+                filename = ''
+            
+            fmt = request.args.get('format')
+            if not fmt:
+                is_csv = filename.lower().endswith('.csv') or 'csv' in (request.content_type or '')
+                fmt = 'csv' if is_csv else 'json'
+            
+            if fmt == 'csv':
+                schedules, errors = schedule_io.parse_csv(text)
+            elif fmt == 'json':
+                schedules, errors = schedule_io.parse_json(text)
+            else:
+                return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+            
+            if errors and request.args.get('strict', 'false').lower() == 'true':
+                return jsonify({'error': 'Validation failed', 'errors': errors}), 400
+            
+            websites = db_manager.bulk_add_schedules(schedules)
+            enabled_websites = [w for w in websites if w['enabled']]
+            scheduled = scheduler_service.schedule_many(enabled_websites)
+            
+            return jsonify({
+                'imported_schedules': len(schedules),
+                'imported_websites': len(websites),
+                'scheduled_websites': scheduled,
+                'errors': errors
+            })
+        except Exception as e:
+            logger.error(f"Error importing schedules: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/schedules/export')
+    @login_required
+    def api_export_schedules():
+        """Stream all schedules as a JSON or CSV document."""
+        fmt = request.args.get('format', 'json')
+        rows = db_manager.iter_schedule_rows()
+        
+        if fmt == 'csv':
+            body, mimetype = schedule_io.export_csv(rows), 'text/csv'
+        elif fmt == 'json':
+            body, mimetype = schedule_io.export_json(rows), 'application/json'
+        else:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=schedules.{fmt}'}
+        )
+    
+    @app.route('/api/logs/export')
+    @login_required
+    def api_export_logs():
+        """Stream the action log as CSV or NDJSON, optionally filtered."""
+        fmt = request.args.get('format', 'csv')
+        try:
+            filters = log_export.parse_filters(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        log_archive = scheduler_service.log_archive
+        if log_archive is not None:
+            # Archived rows are older, so they come first; skip any not yet removed from the database
+            rows = itertools.chain(
+                log_archive.iter_logs(**filters),
+                db_manager.iter_logs(after_id=log_archive.get_max_id(), **filters)
+            )
+        else:
+            rows = db_manager.iter_logs(**filters)
+        if fmt == 'csv':
+            body, mimetype = log_export.export_csv(rows), 'text/csv'
+        elif fmt == 'ndjson':
+            body, mimetype = log_export.export_ndjson(rows), 'application/x-ndjson'
+        else:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=logs.{fmt}'}
+        )
+    
+    @app.route('/api/rules/minimize', methods=['POST'])
+    @login_required
+    def api_minimize_rules():
+        """Compact AdGuard user rules and report how many were removed."""
+        removed = adguard_api.minimize_user_rules()
+        if removed is None:
+            return jsonify({'error': 'Failed to update AdGuard user rules'}), 502
+        return jsonify({'removed_rules': removed})
+    
+    @app.route('/api/websites/<int:website_id>/<any(block, unblock):action>', methods=['POST'])
+    @login_required
+    def api_manual_action(website_id, action):
+        """Queue a manual block/unblock and return 202 with an action ID to poll."""
+        website = db_manager.get_website(website_id)
+        if not website:
+            return jsonify({'error': 'Website not found'}), 404
+        
+        domain = domain_key(website['url'])
+        action_id = scheduler_service.submit_manual_action(website_id, domain, f"manual_{action}")
+        if action_id is None:
+            return jsonify({'error': f'Failed to queue {action} for {domain}'}), 500
+        
+        status_url = url_for('api_action_status', action_id=action_id)
+        return jsonify({
+            'action_id': action_id,
+            'status': 'pending',
+            'status_url': status_url
+        }), 202, {'Location': status_url}
+    
+    @app.route('/api/actions/<int:action_id>')
+    @login_required
+    def api_action_status(action_id):
+        """Report whether a queued action is pending, succeeded or failed."""
+        status = scheduler_service.get_action_status(action_id)
+        if status is None:
+            return jsonify({'error': 'Action not found'}), 404
+        return jsonify(status)
+    
+    @app.route('/api/search')
+    @login_required
+    def api_search():
+        """API endpoint for ranked, prefix-aware search over schedules, websites and logs."""
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query'}), 400
+        try:
+            limit = min(request.args.get('limit', 20, type=int), 200)
+            return jsonify(db_manager.search(query, limit, request.args.get('failed') == '1'))
+        except Exception as e:
+            logger.error(f"Error searching: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/history/summary')
+    @login_required
+    def api_history_summary():
+        """API endpoint for action counts and success rates from the history rollups."""
+        try:
+            days = request.args.get('days', 30, type=int)
+            return jsonify(db_manager.get_history_summary(days))
+        except Exception as e:
+            logger.error(f"Error getting history summary: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/history/heatmap')
+    @login_required
+    def api_history_heatmap():
+        """API endpoint for the weekly actual vs. scheduled blocking heatmap."""
+        weeks = request.args.get('weeks', 4, type=int)
+        resolution = request.args.get('resolution', 60, type=int)
+        if not 1 <= weeks <= 52 or resolution < 1:
+            return jsonify({'error': 'weeks must be 1-52 and resolution positive'}), 400
+        try:
+            return jsonify(heatmap.weekly_heatmap(db_manager, weeks, resolution, request.args.get('domain')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error building heatmap: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/latency')
+    @login_required
+    def api_latency():
+        """API endpoint for transition lag percentiles."""
+        try:
+            days = request.args.get('days', 7, type=int)
+            return jsonify(scheduler_service.get_latency_report(days))
+        except Exception as e:
+            logger.error(f"Error getting latency report: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/stats/domains')
+    @login_required
+    def api_domain_stats():
+        """API endpoint for cached AdGuard query/block counts per managed domain."""
+        return jsonify(stats_service.get_snapshot())
+    
     @app.route('/api/status')
     @login_required
     def api_status():
         """API endpoint for system status."""
         try:
+            snapshot = snapshot_reader.get()
+            if snapshot:
+                now = datetime.now() if scheduler_service.engine == 'timeline' else datetime.now(timezone.utc)
+                active_websites = snapshot.count_active_websites()
+                blocked_now = snapshot.blocked_domains(now.hour * 60 + now.minute)
+            else:
+                active_websites = len(db_manager.get_enabled_websites())
+                blocked_now = None
             return jsonify({
                 'status': 'running',
                 'scheduler_running': scheduler_service.is_running(),
-                'active_websites': len(db_manager.get_enabled_websites()),
+                'active_websites': active_websites,
+                'blocked_now': blocked_now,
+                'snapshot_generation': snapshot.generation if snapshot else None,
+                'adguard': adguard_api.get_health(),
+                'adguard_circuit': adguard_api.get_circuit_status(),
+                'pending_actions': db_manager.count_pending_actions(),
+                'scheduler_lanes': scheduler_service.get_lane_stats(),
+                'log_archive': scheduler_service.log_archive.get_stats() if scheduler_service.log_archive else None,
                 'timestamp': datetime.now().isoformat()
             })
         except Exception as e:
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark of the text-based and the compact log schema.
+
+Fills the old logs table (TEXT url, action and timestamp) with N rows,
+migrates a copy through DatabaseManager, and reports the bytes held by each
+schema's log tables and indexes plus typical history query times.
+
+Usage: python benchmark_logs.py [rows]
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+
+LEGACY_TABLES = ('logs', 'idx_logs_timestamp')
+COMPACT_TABLES = ('log_entries', 'idx_log_entries_ts', 'domains', 'sqlite_autoindex_domains_1',
+                  'log_actions', 'sqlite_autoindex_log_actions_1')
+
+DAYS = 60
+
+def build_legacy(path, count, seed=42):
+    """Create the pre-migration logs table with count rows over DAYS days."""
+    rng = random.Random(seed)
+    domains = [f"site{i}.example.com" for i in range(300)]
+    actions = ['block', 'unblock', 'manual_block', 'manual_unblock']
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    step = DAYS * 86400 / count
+
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            website_id INTEGER,
+            website_url TEXT NOT NULL,
+            action TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            success BOOLEAN DEFAULT 1,
+            error_message TEXT,
+            FOREIGN KEY (website_id) REFERENCES websites (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_logs_timestamp ON logs(timestamp DESC)')
+    conn.executemany(
+        'INSERT INTO logs (website_id, website_url, action, timestamp, success, error_message) VALUES (?, ?, ?, ?, ?, ?)',
+        ((rng.randrange(1, 300), rng.choice(domains), rng.choice(actions),
+          (start + timedelta(seconds=i * step)).strftime('%Y-%m-%d %H:%M:%S'),
+          *((0, 'Connection refused') if rng.random() < 0.01 else (1, None)))
+         for i in range(count))
+    )
+    conn.commit()
+    conn.close()
+    return start
+
+def table_bytes(conn, names):
+    """Sum the pages held by the given tables and indexes."""
+    placeholders = ','.join('?' * len(names))
+    return conn.execute(f'SELECT SUM(pgsize) FROM dbstat WHERE name IN ({placeholders})', names).fetchone()[0]
+
+def best_ms(conn, sql, params=(), repeat=5):
+    """Best-of-N wall time of a query, fetching every row."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix='funtime-logs-')
+    legacy_path = os.path.join(workdir, 'legacy.db')
+    compact_path = os.path.join(workdir, 'compact.db')
+    try:
+        start = build_legacy(legacy_path, count)
+        shutil.copy(legacy_path, compact_path)
+
+        begin = time.perf_counter()
+        DatabaseManager(compact_path)
+        migrate_seconds = time.perf_counter() - begin
+
+        legacy = sqlite3.connect(legacy_path)
+        compact = sqlite3.connect(compact_path)
+        compact.execute('VACUUM')
+
+        day = start + timedelta(days=DAYS // 2)
+        day_text = (day.strftime('%Y-%m-%d %H:%M:%S'), (day + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'))
+        day_epoch = (int(day.timestamp()), int((day + timedelta(days=1)).timestamp()))
+        week_text = (day_text[0], (day + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S'), 'site7.example.com')
+        week_epoch = (day_epoch[0], int((day + timedelta(days=7)).timestamp()), 'site7.example.com')
+
+        queries = [
+            ('recent 100 (history page)',
+             'SELECT * FROM logs ORDER BY timestamp DESC LIMIT 100', (),
+             'SELECT * FROM logs ORDER BY id DESC LIMIT 100', ()),
+            ('count one day',
+             'SELECT COUNT(*) FROM logs WHERE timestamp >= ? AND timestamp < ?', day_text,
+             'SELECT COUNT(*) FROM log_entries WHERE ts >= ? AND ts < ?', day_epoch),
+            ('one domain, one week (export)',
+             'SELECT * FROM logs WHERE timestamp >= ? AND timestamp < ? AND website_url = ?', week_text,
+             '''SELECT e.id, datetime(e.ts, 'unixepoch'), e.website_id, d.name, a.name, e.success, e.error_message
+                FROM log_entries AS e JOIN domains AS d ON d.id = e.domain_id
+                JOIN log_actions AS a ON a.id = e.action_id
+                WHERE e.ts >= ? AND e.ts < ? AND d.name = ?''', week_epoch),
+            ('failures per action (full scan)',
+             'SELECT action, COUNT(*) FROM logs WHERE success = 0 GROUP BY action', (),
+             'SELECT action_id, COUNT(*) FROM log_entries WHERE success = 0 GROUP BY action_id', ()),
+        ]
+
+        print(f"{count:,} log rows; migration took {migrate_seconds:.1f} s (including the search index)")
+        legacy_bytes = table_bytes(legacy, LEGACY_TABLES)
+        compact_bytes = table_bytes(compact, COMPACT_TABLES)
+        print(f"{'':<40} {'text':>10} {'compact':>10}")
+        print(f"{'log tables + indexes (MiB)':<40} {legacy_bytes / 1024 / 1024:>10.1f} {compact_bytes / 1024 / 1024:>10.1f}")
+        for label, legacy_sql, legacy_params, compact_sql, compact_params in queries:
+            print(f"{label + ' (ms)':<40} {best_ms(legacy, legacy_sql, legacy_params):>10.1f} "
+                  f"{best_ms(compact, compact_sql, compact_params):>10.1f}")
+
+        legacy.close()
+        compact.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark of per-row dicts and slotted row models.
+
+Fills a scratch database with N websites and N log rows, then fetches them
+once through the old dict row factory and once through the model row
+factories, reporting fetch time and the memory held by the result list.
+
+Usage: python benchmark_rows.py [rows]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import (DatabaseManager, LEGACY_WEBSITE_COLUMNS, LOG_ROWS, SCHEDULE_JOIN_COLUMNS,
+                               WEBSITE_ROWS)
+
+def dict_factory(cursor, row):
+    """The previous row factory: a fresh dict per row."""
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+def populate(db_manager, count):
+    """Add count websites over count // 50 schedules and count log rows."""
+    db_manager.bulk_add_schedules([
+        {'name': f"Schedule {i}", 'start_time': '21:00', 'end_time': '07:00', 'enabled': True,
+         'websites': [f"site{i}-{j}.example.com" for j in range(50)]}
+        for i in range(count // 50)
+    ])
+    with sqlite3.connect(db_manager.db_path) as conn:
+        cursor = conn.cursor()
+        for i in range(count):
+            db_manager._insert_log(cursor, i % 300, f"site{i % 300}.example.com", 'block', i % 100 != 0)
+        conn.commit()
+
+def measure(path, sql, factory):
+    """Fetch every row of a query; return (seconds, bytes held by the rows)."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = factory
+    conn.execute(sql).fetchmany(1)  # warm the page cache
+
+    start = time.perf_counter()
+    conn.execute(sql).fetchall()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    rows = conn.execute(sql).fetchall()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    conn.close()
+    return seconds, held
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    workdir = tempfile.mkdtemp(prefix='funtime-rows-')
+    try:
+        db_manager = DatabaseManager(os.path.join(workdir, 'rows.db'))
+        populate(db_manager, count)
+
+        queries = [
+            ('websites (get_all_websites)', WEBSITE_ROWS,
+             f'SELECT {LEGACY_WEBSITE_COLUMNS}, {SCHEDULE_JOIN_COLUMNS} FROM websites w '
+             'JOIN schedules s ON w.schedule_id = s.id'),
+            ('logs (iter_logs columns)', LOG_ROWS,
+             'SELECT id, timestamp, website_id, website_url, action, success, error_message FROM logs'),
+        ]
+
+        print(f"{count:,} rows per query")
+        print(f"{'':<30} {'dict ms':>9} {'model ms':>9} {'dict MiB':>9} {'model MiB':>10}")
+        for label, factory, sql in queries:
+            dict_seconds, dict_bytes = measure(db_manager.db_path, sql, dict_factory)
+            model_seconds, model_bytes = measure(db_manager.db_path, sql, factory)
+            print(f"{label:<30} {dict_seconds * 1000:>9.0f} {model_seconds * 1000:>9.0f} "
+                  f"{dict_bytes / 1024 / 1024:>9.1f} {model_bytes / 1024 / 1024:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
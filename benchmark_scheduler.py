@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Head-to-head benchmark of the APScheduler engine and the timeline engine.
+
+Registers N websites (a block and an unblock job each) at random HH:MM times
+and reports registration time, memory held by the jobs, and the CPU cost of
+recomputing every job's next fire time once, as each engine's trigger does
+after a run. Both engines do the same per-job trigger math there; the
+timeline's timer thread itself only bisects its occupied fire times.
+
+Usage: python benchmark_scheduler.py [websites]
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.timer_engine import DailyTrigger, TimelineScheduler
+
+def noop(*args):
+    """Job body; never runs during the benchmark."""
+
+def random_times(count, seed=42):
+    """Generate (block, unblock) HH:MM pairs."""
+    rng = random.Random(seed)
+    return [((rng.randrange(24), rng.randrange(60)), (rng.randrange(24), rng.randrange(60))) for _ in range(count)]
+
+def measure(label, build, register, next_fire_times):
+    """Run one engine through registration and one pass of next fire times."""
+    gc.collect()
+    tracemalloc.start()
+    scheduler = build()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    register(scheduler)
+    register_seconds = time.perf_counter() - start
+    job_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    next_fire_times(scheduler)
+    fire_seconds = time.perf_counter() - start
+
+    scheduler.shutdown(wait=False)
+    print(f"{label:<34} {register_seconds * 1000:>10.1f} ms {job_bytes / 1024 / 1024:>10.2f} MiB {fire_seconds * 1000:>10.1f} ms")
+
+def bench_apscheduler(times, shared_triggers):
+    """APScheduler BackgroundScheduler with a MemoryJobStore."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
+    def build():
+        scheduler = BackgroundScheduler(timezone='UTC')
+        scheduler.start(paused=True)
+        return scheduler
+
+    def register(scheduler):
+        cache = {}
+        def trigger(hour, minute):
+            if not shared_triggers:
+                return CronTrigger(hour=hour, minute=minute)
+            if (hour, minute) not in cache:
+                cache[(hour, minute)] = CronTrigger(hour=hour, minute=minute)
+            return cache[(hour, minute)]
+
+        for website_id, ((bh, bm), (uh, um)) in enumerate(times):
+            scheduler.add_job(noop, trigger(bh, bm), args=[website_id], id=f"block_{website_id}")
+            scheduler.add_job(noop, trigger(uh, um), args=[website_id], id=f"unblock_{website_id}")
+
+    def next_fire_times(scheduler):
+        now = datetime.now(timezone.utc)
+        for job in scheduler.get_jobs():
+            job.trigger.get_next_fire_time(job.next_run_time, now)
+
+    label = 'APScheduler (shared CronTrigger)' if shared_triggers else 'APScheduler (CronTrigger per job)'
+    measure(label, build, register, next_fire_times)
+
+def bench_timeline(times):
+    """TimelineScheduler from services/timer_engine.py."""
+    def build():
+        return TimelineScheduler()
+
+    def register(scheduler):
+        cache = {}
+        for website_id, ((bh, bm), (uh, um)) in enumerate(times):
+            for job_id, key in ((f"block_{website_id}", (bh, bm)), (f"unblock_{website_id}", (uh, um))):
+                if key not in cache:
+                    cache[key] = DailyTrigger(*key)
+                scheduler.add_job(noop, cache[key], args=[website_id], id=job_id)
+
+    def next_fire_times(scheduler):
+        now = datetime.now(timezone.utc)
+        for job in scheduler.get_jobs():
+            job.trigger.next_fire_time(now)
+
+    measure('Timeline engine', build, register, next_fire_times)
+
+def main():
+    """Run the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    times = random_times(count)
+
+    print(f"⏱️  Scheduler engine benchmark: {count} websites, {count * 2} jobs")
+    print(f"{'Engine':<34} {'Register':>13} {'Job memory':>14} {'Next fires':>13}")
+
+    try:
+        bench_apscheduler(times, shared_triggers=False)
+        bench_apscheduler(times, shared_triggers=True)
+    except ImportError:
+        print("   ⚠️  APScheduler not installed, skipping its runs")
+    bench_timeline(times)
+
+if __name__ == '__main__':
+    main()
@@ -26,7 +26,7 @@ sudo apt update && sudo apt upgrade -y
 
 # Install required system packages
 echo "🔧 Installing system dependencies..."
-sudo apt install -y python3 python3-venv python3-pip git nginx supervisor curl
+sudo apt install -y python3 python3-venv python3-pip git nginx supervisor curl libopenblas0
 
 # Check if AdGuard Home is installed
 if ! systemctl is-active --quiet AdguardHome; then
@@ -6,11 +6,20 @@ Handles communication with AdGuard Home to block/unblock websites.
 import requests
 import logging
 import os
-from typing import List, Dict, Optional
+import threading
+import time
+from datetime import datetime
+from typing import Any, List, Dict, Optional
 import base64
+from urllib.parse import urlencode
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, STATE_CLOSED, STATE_OPEN
+from services.rule_compiler import (
+    DomainTrie, block_rule, compile_rules, join_managed_section, parse_block_rule, split_managed_section
+)
+
 logger = logging.getLogger(__name__)
 
 class AdGuardAPI:
@@ -39,7 +48,36 @@ class AdGuardAPI:
         # Set timeout
         self.timeout = 10
         
-        logger.info(f"AdGuard API initialized for {self.base_url}")
+        # Fail fast while AdGuard is down instead of holding threads for
+        # timeout x retries on every call
+        self.circuit = CircuitBreaker(
+            'adguard',
+            failure_threshold=int(os.getenv('ADGUARD_CIRCUIT_FAILURES', '3')),
+            recovery_timeout=float(os.getenv('ADGUARD_CIRCUIT_RECOVERY', '30')),
+        )
+        self.circuit.add_listener(self._on_circuit_change)
+        self._probe_thread = None
+        
+        # Domains whose pre-existing ||domain^ rules are adopted into the
+        # managed section when it is first created
+        self._legacy_domains = set()
+        
+        # Last known health from probe_health; reads never touch the network.
+        # Probes use their own retry-free session so one probe is one round-trip.
+        self._probe_session = requests.Session()
+        self._health_lock = threading.Lock()
+        self._health: Dict[str, Any] = {
+            'healthy': None,
+            'version': None,
+            'running': None,
+            'protection_enabled': None,
+            'latency_ms': None,
+            'checked_at': None,
+            'last_healthy_at': None,
+            'error': None,
+        }
+        
+        logger.info("AdGuard API initialized for %s", self.base_url)
     
     def _get_auth_headers(self) -> Dict[str, str]:
         """Get authentication headers."""
@@ -56,6 +94,10 @@ class AdGuardAPI:
         url = f"{self.base_url}{endpoint}"
         headers = self._get_auth_headers()
         
+        if not self.circuit.allow_request():
+            logger.debug("AdGuard circuit open, rejecting %s %s", method, url)
+            return None
+        
         try:
             response = self.session.request(
                 method=method,
@@ -66,19 +108,111 @@ class AdGuardAPI:
             )
             
             response.raise_for_status()
+            self.circuit.record_success()
             
             # Some endpoints return empty responses
             if response.content:
                 return response.json()
             return {}
             
+        except requests.exceptions.HTTPError as e:
+            # A 4xx means AdGuard is up but rejected this request
+            if e.response is not None and e.response.status_code < 500:
+                self.circuit.record_success()
+            else:
+                self.circuit.record_failure(e)
+            logger.error("AdGuard API request failed: %s %s - %s", method, url, e)
+            return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"AdGuard API request failed: {method} {url} - {e}")
+            self.circuit.record_failure(e)
+            logger.error("AdGuard API request failed: %s %s - %s", method, url, e)
             return None
         except ValueError as e:
-            logger.error(f"AdGuard API response parsing failed: {e}")
+            logger.error("AdGuard API response parsing failed: %s", e)
             return None
     
+    def _on_circuit_change(self, old_state: str, new_state: str):
+        """Start background probing whenever the circuit opens."""
+        if new_state == STATE_OPEN and (self._probe_thread is None or not self._probe_thread.is_alive()):
+            self._probe_thread = threading.Thread(target=self._probe_until_closed, name='adguard-probe', daemon=True)
+            self._probe_thread.start()
+    
+    def _probe_until_closed(self):
+        """Probe /control/status with single, retry-free requests until AdGuard answers."""
+        while self.circuit.state != STATE_CLOSED:
+            time.sleep(max(self.circuit.seconds_until_retry(), 1.0))
+            self.probe_health()
+    
+    def probe_health(self) -> Dict[str, Any]:
+        """
+        Poll /control/status once and cache the result.
+        
+        The outcome feeds the circuit breaker, so an outage found by the
+        background prober opens the circuit before a transition runs into
+        it. While the circuit rejects calls this only records that.
+        """
+        if not self.circuit.allow_request():
+            self._update_health(healthy=False, error=f"Circuit open: {self.circuit.get_status()['last_error']}")
+            return self.get_health()
+        
+        started = time.monotonic()
+        try:
+            response = self._probe_session.get(
+                f"{self.base_url}/control/status",
+                headers=self._get_auth_headers(),
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            status = response.json() if response.content else {}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.circuit.record_failure(e)
+            self._update_health(healthy=False, error=str(e), latency_ms=round((time.monotonic() - started) * 1000, 1))
+            logger.warning("AdGuard health probe failed: %s", e)
+            return self.get_health()
+        
+        self.circuit.record_success()
+        self._update_health(
+            healthy=True,
+            version=status.get('version'),
+            running=status.get('running'),
+            protection_enabled=status.get('protection_enabled'),
+            latency_ms=round((time.monotonic() - started) * 1000, 1),
+            last_healthy_at=datetime.now().isoformat(),
+            error=None,
+        )
+        return self.get_health()
+    
+    def _update_health(self, **fields):
+        """Merge a probe result into the cached health."""
+        with self._health_lock:
+            self._health.update(fields, checked_at=datetime.now().isoformat())
+    
+    def get_health(self) -> Dict[str, Any]:
+        """Get the last known AdGuard health (healthy is None until the first probe)."""
+        with self._health_lock:
+            return dict(self._health)
+    
+    def _ensure_circuit_closed(self):
+        """Raise CircuitOpenError so callers can defer work instead of failing it."""
+        if self.circuit.is_open():
+            raise CircuitOpenError(f"AdGuard circuit is open (retry in {self.circuit.seconds_until_retry():.0f}s)")
+    
+    def get_circuit_status(self) -> Dict:
+        """Get circuit breaker state and counters."""
+        return self.circuit.get_status()
+    
+    def prewarm(self) -> bool:
+        """
+        Prepare for an imminent transition.
+        
+        Reads the user rules, which leaves a pooled keep-alive connection to
+        AdGuard open, so the transition does not pay for connection setup.
+        The transition still reads the rules again before writing them.
+        """
+        if self.circuit.is_open():
+            return False
+        return self.get_user_rules() is not None
+    
     def test_connection(self) -> bool:
         """Test connection to AdGuard Home."""
         try:
@@ -90,7 +224,7 @@ class AdGuardAPI:
                 logger.error("AdGuard connection test failed")
                 return False
         except Exception as e:
-            logger.error(f"AdGuard connection test error: {e}")
+            logger.error("AdGuard connection test error: %s", e)
             return False
     
     def get_filtering_status(self) -> Optional[Dict]:
@@ -121,75 +255,143 @@ class AdGuardAPI:
             return response.get('filters', [])
         return None
     
-    def block_domain(self, domain: str) -> bool:
+    def set_legacy_domains(self, domains):
+        """Set the domains whose rules predate the managed section and belong to us."""
+        self._legacy_domains = {domain.strip().lower().rstrip('.') for domain in domains if domain}
+    
+    def _managed_section(self, rules: List[str]):
         """
-        Block a domain by adding it to user rules.
-        AdGuard Home uses DNS filtering rules format.
+        Split user rules into (before, managed, after).
+        
+        The first time (no section yet) plain ||domain^ rules for legacy
+        domains are moved out of the hand-written rules into the new section;
+        it is written together with the caller's update, so the migration
+        runs exactly once.
         """
+        section = split_managed_section(rules)
+        if section is not None:
+            return section
+        
+        before, adopted = [], []
+        for rule in rules:
+            (adopted if parse_block_rule(rule) in self._legacy_domains else before).append(rule)
+        if adopted:
+            logger.info("Moving %s existing rules into the managed rule section", len(adopted))
+        return before, adopted, []
+    
+    def migrate_managed_rules(self) -> bool:
+        """Create the managed rule section now if it does not exist yet."""
         try:
-            # Get current user rules
-            current_rules = self.get_user_rules()
-            if current_rules is None:
-                logger.error("Failed to get current user rules")
-                return False
-            
-            # Create blocking rule
-            block_rule = f"||{domain}^"
-            
-            # Check if rule already exists
-            if block_rule in current_rules:
-                logger.info(f"Domain {domain} is already blocked")
-                return True
-            
-            # Add new rule
-            updated_rules = current_rules + [block_rule]
-            
-            # Update user rules
-            if self.set_user_rules(updated_rules):
-                logger.info(f"Successfully blocked domain: {domain}")
-                return True
-            else:
-                logger.error(f"Failed to block domain: {domain}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error blocking domain {domain}: {e}")
+            return self.apply_domain_changes()
+        except CircuitOpenError as e:
+            logger.warning("Managed rule section migration deferred: %s", e)
             return False
     
-    def unblock_domain(self, domain: str) -> bool:
+    def apply_domain_changes(self, block: Optional[List[str]] = None, unblock: Optional[List[str]] = None,
+                             keep_blocked: Optional[List[str]] = None) -> bool:
         """
-        Unblock a domain by removing it from user rules.
+        Apply a batch of block/unblock changes with one read and one write.
+        
+        Only the managed section of the user rules is parsed and rewritten;
+        hand-written rules around it pass through untouched. Domains covered
+        by an already blocked parent need no rule of their own, and subdomain
+        rules made redundant by a new parent rule are compiled out.
+        keep_blocked lists subdomains that must stay blocked; they get their
+        own rule back if an unblocked parent was covering them.
+        Raises CircuitOpenError if AdGuard is known to be down.
         """
+        self._ensure_circuit_closed()
+        
         try:
-            # Get current user rules
+            # Always read live rules: set_rules replaces the whole list, so a
+            # stale copy would drop rules the admin added since
             current_rules = self.get_user_rules()
             if current_rules is None:
                 logger.error("Failed to get current user rules")
+                # The failed read may have just opened the circuit
+                self._ensure_circuit_closed()
                 return False
             
-            # Create blocking rule to remove
-            block_rule = f"||{domain}^"
+            normalize = lambda domain: domain.strip().lower().rstrip('.')
+            to_block = [normalize(domain) for domain in block or ()]
+            to_unblock = {normalize(domain) for domain in unblock or ()}
             
-            # Check if rule exists
-            if block_rule not in current_rules:
-                logger.info(f"Domain {domain} is not currently blocked")
-                return True
+            before, managed, after = self._managed_section(current_rules)
+            
+            # Remove rules for unblocked domains (in any case/trailing-dot variant)
+            managed = [rule for rule in managed if parse_block_rule(rule) not in to_unblock]
+            
+            # Add rules for blocked domains and restore uncovered subdomains
+            trie = DomainTrie(d for d in map(parse_block_rule, managed) if d)
+            for domain in to_block + [normalize(domain) for domain in keep_blocked or ()]:
+                if not trie.covers(domain):
+                    managed.append(block_rule(domain))
+                    trie.add(domain)
             
-            # Remove rule
-            updated_rules = [rule for rule in current_rules if rule != block_rule]
+            managed, removed = compile_rules(managed)
+            if removed:
+                logger.info("Rule compiler removed %s redundant rules", removed)
+            updated_rules = join_managed_section(before, managed, after)
+            
+            if updated_rules == current_rules:
+                logger.info("AdGuard rules already up to date (%s block, %s unblock)", len(to_block), len(to_unblock))
+                return True
             
             # Update user rules
             if self.set_user_rules(updated_rules):
-                logger.info(f"Successfully unblocked domain: {domain}")
+                logger.info("Updated AdGuard rules: %s block, %s unblock", len(to_block), len(to_unblock))
                 return True
             else:
-                logger.error(f"Failed to unblock domain: {domain}")
+                logger.error("Failed to update AdGuard rules")
                 return False
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            logger.error(f"Error unblocking domain {domain}: {e}")
+            logger.error("Error applying AdGuard rule changes: %s", e)
             return False
     
+    def block_domain(self, domain: str) -> bool:
+        """
+        Block a domain by adding it to user rules.
+        AdGuard Home uses DNS filtering rules format.
+        """
+        return self.apply_domain_changes(block=[domain])
+    
+    def unblock_domain(self, domain: str, keep_blocked: Optional[List[str]] = None) -> bool:
+        """
+        Unblock a domain by removing it from user rules.
+        
+        keep_blocked lists subdomains that must stay blocked; they get their
+        own rule back if removing the parent rule would uncover them.
+        """
+        return self.apply_domain_changes(unblock=[domain], keep_blocked=keep_blocked)
+    
+    def minimize_user_rules(self) -> Optional[int]:
+        """
+        Compact the managed rule section with the rule compiler.
+        
+        Returns the number of rules removed, or None if AdGuard could not be
+        read or written.
+        """
+        current_rules = self.get_user_rules()
+        if current_rules is None:
+            logger.error("Failed to get current user rules")
+            return None
+        
+        before, managed, after = self._managed_section(current_rules)
+        managed, removed = compile_rules(managed)
+        compiled = join_managed_section(before, managed, after)
+        if removed == 0 and compiled == current_rules:
+            return 0
+        
+        if not self.set_user_rules(compiled):
+            logger.error("Failed to write minimized user rules")
+            return None
+        
+        logger.info("Rule compiler removed %s redundant rules", removed)
+        return removed
+    
     def get_user_rules(self) -> Optional[List[str]]:
         """Get current user-defined filtering rules."""
         response = self._make_request('GET', '/control/filtering/status')
@@ -198,11 +400,13 @@ class AdGuardAPI:
             # AdGuard Home returns user_rules as either a list or a string
             if isinstance(user_rules, list):
                 # If it's already a list, return it as-is (filtering out empty rules)
-                return [rule.strip() for rule in user_rules if rule and rule.strip()]
+                rules = [rule.strip() for rule in user_rules if rule and rule.strip()]
             elif isinstance(user_rules, str):
                 # If it's a string, split by newlines (legacy format)
-                return [rule.strip() for rule in user_rules.split('\n') if rule.strip()]
-            return []
+                rules = [rule.strip() for rule in user_rules.split('\n') if rule.strip()]
+            else:
+                rules = []
+            return rules
         return None
     
     def set_user_rules(self, rules: List[str]) -> bool:
@@ -219,17 +423,28 @@ class AdGuardAPI:
             if current_rules is None:
                 return False
             
-            block_rule = f"||{domain}^"
-            return block_rule in current_rules
+            trie = DomainTrie(d for d in map(parse_block_rule, current_rules) if d)
+            return trie.covers(domain.strip().lower().rstrip('.'))
             
         except Exception as e:
-            logger.error(f"Error checking if domain {domain} is blocked: {e}")
+            logger.error("Error checking if domain %s is blocked: %s", domain, e)
             return False
     
     def get_stats(self) -> Optional[Dict]:
         """Get AdGuard Home statistics."""
         return self._make_request('GET', '/control/stats')
     
+    def get_query_log(self, older_than: Optional[str] = None, limit: int = 500) -> Optional[Dict]:
+        """
+        Get one page of the AdGuard Home query log, newest entries first.
+        
+        Pass the previous page's 'oldest' timestamp as older_than to continue.
+        """
+        params = {'limit': limit}
+        if older_than:
+            params['older_than'] = older_than
+        return self._make_request('GET', f"/control/querylog?{urlencode(params)}")
+    
     def reset_stats(self) -> bool:
         """Reset AdGuard Home statistics."""
         response = self._make_request('POST', '/control/stats_reset')
@@ -0,0 +1,152 @@
+"""
+Circuit breaker for FunTime Scheduler.
+Fails calls fast while a downstream service (AdGuard Home) is unavailable.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and every
+    call is rejected until recovery_timeout seconds have passed. The circuit
+    then lets up to half_open_max_calls trial calls through; one success
+    closes it again, one failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """Initialize circuit breaker."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._half_open_calls = 0
+        self._rejected = 0
+        self._total_failures = 0
+        self._last_error: Optional[str] = None
+        self._listeners: List[Callable[[str, str], Any]] = []
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the timeout expires."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def add_listener(self, listener: Callable[[str, str], Any]):
+        """Register a callback invoked as listener(old_state, new_state) on transitions."""
+        self._listeners.append(listener)
+
+    def is_open(self) -> bool:
+        """Check whether calls are currently being rejected outright."""
+        return self.state == STATE_OPEN
+
+    def allow_request(self) -> bool:
+        """Check whether a call may proceed, counting it as rejected if not."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError if a call may not proceed."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self):
+        """Record a successful call."""
+        with self._lock:
+            self._consecutive_failures = 0
+            transition = self._transition(STATE_CLOSED)
+        self._notify(transition)
+
+    def record_failure(self, error: Any = None):
+        """Record a failed call, opening the circuit once the threshold is hit."""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._total_failures += 1
+            self._last_error = str(error) if error is not None else None
+
+            transition = None
+            if self._state == STATE_HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                transition = self._transition(STATE_OPEN)
+        self._notify(transition)
+
+    def seconds_until_retry(self) -> float:
+        """Seconds left before an open circuit allows a trial call."""
+        with self._lock:
+            if self._state != STATE_OPEN or self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get a snapshot of the breaker state and counters."""
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                'name': self.name,
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'total_failures': self._total_failures,
+                'rejected_calls': self._rejected,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'last_error': self._last_error,
+            }
+
+    def _maybe_half_open(self):
+        """Move an open circuit to half-open once its timeout has passed (lock held)."""
+        if (self._state == STATE_OPEN and self._opened_at is not None
+                and time.monotonic() - self._opened_at >= self.recovery_timeout):
+            self._state = STATE_HALF_OPEN
+            self._half_open_calls = 0
+
+    def _transition(self, new_state: str):
+        """Switch state (lock held) and return (old, new) if it changed."""
+        old_state = self._state
+        if old_state == new_state:
+            return None
+        self._state = new_state
+        self._half_open_calls = 0
+        return old_state, new_state
+
+    def _notify(self, transition):
+        """Log a state change and inform listeners outside the lock."""
+        if transition is None:
+            return
+        old_state, new_state = transition
+        if new_state == STATE_OPEN:
+            logger.warning("Circuit '%s' opened after %s failures", self.name, self._consecutive_failures)
+        else:
+            logger.info("Circuit '%s' %s -> %s", self.name, old_state, new_state)
+
+        for listener in self._listeners:
+            try:
+                listener(old_state, new_state)
+            except Exception as e:
+                logger.error("Circuit listener error: %s", e)
@@ -5,12 +5,52 @@ Handles SQLite database operations for websites, schedules, and logs.
 
 import sqlite3
 import os
+import json
 import logging
+import time
+import re
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+
+from services.domain_utils import domain_key
+from services.models import LogEntry, Schedule, Website, row_factory
 
 logger = logging.getLogger(__name__)
 
+# Row factories for the model-backed queries
+SCHEDULE_ROWS = row_factory(Schedule)
+WEBSITE_ROWS = row_factory(Website)
+LOG_ROWS = row_factory(LogEntry)
+
+# Column lists in model field order, so rows map straight onto the models
+WEBSITE_COLUMNS = 'w.id, w.schedule_id, w.url, w.enabled, w.created_at, w.updated_at'
+# The legacy website getters report the schedule's enabled flag as enabled
+LEGACY_WEBSITE_COLUMNS = 'w.id, w.schedule_id, w.url, s.enabled AS enabled, w.created_at, w.updated_at'
+SCHEDULE_JOIN_COLUMNS = 's.name AS schedule_name, s.start_time, s.end_time, s.enabled AS schedule_enabled'
+SCHEDULE_COLUMNS = 'id, name, start_time, end_time, enabled, created_at, updated_at'
+
+# Integer codes of the built-in log actions; other actions get codes as they appear
+LOG_ACTIONS = {1: 'block', 2: 'unblock', 3: 'manual_block', 4: 'manual_unblock'}
+
+# Full-text indexes as (index table, source table, indexed columns)
+SEARCH_INDEXES = [
+    ('schedules_search', 'schedules', ('name',)),
+    ('websites_search', 'websites', ('url',)),
+]
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 phrase query with prefix matching on the last word.
+    
+    "*.tiktok.com" becomes "tiktok com"* and "redd" becomes "redd"*, so
+    partial domains match while FTS syntax in the input is ignored.
+    Returns None if the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    return '"' + ' '.join(words) + '"*'
+
 class DatabaseManager:
     """Manages SQLite database operations."""
     
@@ -105,27 +145,272 @@ class DatabaseManager:
                                     VALUES (?, ?, ?, ?)
                                 ''', (schedule_id, old_site[1], old_site[4], old_site[5]))
                                 
-                            logger.info(f"Migrated {len(old_websites)} websites to new structure")
+                            logger.info("Migrated %s websites to new structure", len(old_websites))
                 except sqlite3.Error as e:
                     logger.info("No migration needed or migration failed: " + str(e))
                 
+                # Action log: epoch seconds, and domains and actions stored once
+                # in lookup tables and referenced by integer ID
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS domains (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL UNIQUE
+                    )
+                ''')
+                
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS log_actions (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL UNIQUE
+                    )
+                ''')
+                conn.executemany('INSERT OR IGNORE INTO log_actions (id, name) VALUES (?, ?)', LOG_ACTIONS.items())
+                
                 conn.execute('''
-                    CREATE TABLE IF NOT EXISTS logs (
+                    CREATE TABLE IF NOT EXISTS log_entries (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         website_id INTEGER,
-                        website_url TEXT NOT NULL,
+                        domain_id INTEGER NOT NULL REFERENCES domains (id),
+                        action_id INTEGER NOT NULL REFERENCES log_actions (id),
+                        ts INTEGER NOT NULL,
+                        success INTEGER DEFAULT 1,
+                        error_message TEXT
+                    )
+                ''')
+                
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_log_entries_ts ON log_entries(ts)
+                ''')
+                
+                # Move rows out of the old text-based logs table
+                legacy = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs'"
+                ).fetchone()
+                if legacy:
+                    conn.execute('INSERT OR IGNORE INTO domains (name) SELECT DISTINCT website_url FROM logs')
+                    conn.execute('INSERT OR IGNORE INTO log_actions (name) SELECT DISTINCT action FROM logs')
+                    cursor = conn.execute('''
+                        INSERT INTO log_entries (id, website_id, domain_id, action_id, ts, success, error_message)
+                        SELECT l.id, l.website_id, d.id, a.id, CAST(strftime('%s', l.timestamp) AS INTEGER),
+                               l.success, l.error_message
+                        FROM logs AS l
+                        JOIN domains AS d ON d.name = l.website_url
+                        JOIN log_actions AS a ON a.name = l.action
+                    ''')
+                    # Also drops the old table's triggers; they are recreated on log_entries below
+                    conn.execute('DROP TABLE logs')
+                    logger.info("Migrated %s log rows to the compact log schema", cursor.rowcount)
+                
+                # The old logs shape, for readers
+                conn.execute('''
+                    CREATE VIEW IF NOT EXISTS logs AS
+                    SELECT e.id, e.website_id, d.name AS website_url, a.name AS action,
+                           datetime(e.ts, 'unixepoch') AS timestamp, e.success, e.error_message
+                    FROM log_entries AS e
+                    JOIN domains AS d ON d.id = e.domain_id
+                    JOIN log_actions AS a ON a.id = e.action_id
+                ''')
+                
+                # Durable outbox of block/unblock intents waiting for AdGuard
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS outbox (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        website_id INTEGER,
+                        domain TEXT NOT NULL,
                         action TEXT NOT NULL,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        success BOOLEAN DEFAULT 1,
-                        error_message TEXT,
-                        FOREIGN KEY (website_id) REFERENCES websites (id)
+                        keep_blocked TEXT,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        attempts INTEGER DEFAULT 0,
+                        next_attempt_at REAL DEFAULT 0,
+                        last_error TEXT,
+                        log_id INTEGER,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (log_id) REFERENCES log_entries (id)
                     )
                 ''')
                 
+                # Outboxes created before the compact log schema point their
+                # log_id at the old logs table, now a view; rebuild them
+                outbox_sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'outbox'"
+                ).fetchone()[0]
+                if 'REFERENCES logs ' in outbox_sql:
+                    conn.execute('ALTER TABLE outbox RENAME TO outbox_old')
+                    conn.execute(outbox_sql.replace('REFERENCES logs ', 'REFERENCES log_entries '))
+                    conn.execute('INSERT INTO outbox SELECT * FROM outbox_old')
+                    # Keep AUTOINCREMENT from reusing IDs of deleted rows
+                    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'outbox'")
+                    conn.execute("UPDATE sqlite_sequence SET name = 'outbox' WHERE name = 'outbox_old'")
+                    conn.execute('DROP TABLE outbox_old')
+                    logger.info("Pointed outbox log links at log_entries")
+                
                 conn.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp DESC)
+                    CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(status, next_attempt_at)
                 ''')
                 
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_outbox_domain ON outbox(domain, status)
+                ''')
+                
+                # Scheduled vs. started vs. AdGuard-acknowledged time of each
+                # transition (epoch seconds), keyed by its outbox action
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS transition_latency (
+                        outbox_id INTEGER PRIMARY KEY,
+                        is_block INTEGER NOT NULL,
+                        scheduled_at REAL NOT NULL,
+                        started_at REAL NOT NULL,
+                        acked_at REAL
+                    )
+                ''')
+                
+                # Daily per-domain, per-action outcome counts, kept up to date by
+                # the triggers below. Days are UTC like the logs' timestamps, and
+                # rows outlive the raw logs they were built from.
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS log_rollups (
+                        day TEXT NOT NULL,
+                        domain TEXT NOT NULL,
+                        action TEXT NOT NULL,
+                        succeeded INTEGER NOT NULL DEFAULT 0,
+                        failed INTEGER NOT NULL DEFAULT 0,
+                        pending INTEGER NOT NULL DEFAULT 0,
+                        last_error TEXT,
+                        PRIMARY KEY (day, domain, action)
+                    ) WITHOUT ROWID
+                ''')
+                
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS logs_rollup_insert AFTER INSERT ON log_entries
+                    BEGIN
+                        INSERT INTO log_rollups (day, domain, action, succeeded, failed, pending, last_error)
+                        VALUES (date(NEW.ts, 'unixepoch'),
+                                (SELECT name FROM domains WHERE id = NEW.domain_id),
+                                (SELECT name FROM log_actions WHERE id = NEW.action_id),
+                                NEW.success IS 1, NEW.success IS 0, NEW.success IS NULL,
+                                CASE WHEN NEW.success IS 0 THEN NEW.error_message END)
+                        ON CONFLICT (day, domain, action) DO UPDATE SET
+                            succeeded = succeeded + excluded.succeeded,
+                            failed = failed + excluded.failed,
+                            pending = pending + excluded.pending,
+                            last_error = coalesce(excluded.last_error, last_error);
+                    END
+                ''')
+                
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS logs_rollup_update AFTER UPDATE OF success, error_message ON log_entries
+                    WHEN OLD.success IS NOT NEW.success OR (NEW.success IS 0 AND NEW.error_message IS NOT NULL)
+                    BEGIN
+                        UPDATE log_rollups SET
+                            succeeded = succeeded - (OLD.success IS 1) + (NEW.success IS 1),
+                            failed = failed - (OLD.success IS 0) + (NEW.success IS 0),
+                            pending = pending - (OLD.success IS NULL) + (NEW.success IS NULL),
+                            last_error = CASE WHEN NEW.success IS 0 THEN coalesce(NEW.error_message, last_error)
+                                              ELSE last_error END
+                        WHERE day = date(OLD.ts, 'unixepoch')
+                          AND domain = (SELECT name FROM domains WHERE id = OLD.domain_id)
+                          AND action = (SELECT name FROM log_actions WHERE id = OLD.action_id);
+                    END
+                ''')
+                
+                # Per-minute AdGuard query counts for our domains (minute = epoch // 60, UTC)
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS query_buckets (
+                        domain TEXT NOT NULL,
+                        minute INTEGER NOT NULL,
+                        queries INTEGER NOT NULL DEFAULT 0,
+                        blocked INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (domain, minute)
+                    ) WITHOUT ROWID
+                ''')
+                
+                # Resume points of incremental ingestion jobs
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS ingest_cursors (
+                        name TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Full-text indexes over schedule names, website URLs and log
+                # entries. They store only the tokens and point back at the
+                # source rows; dots separate tokens, so domains index by label.
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                for table, source, columns in SEARCH_INDEXES:
+                    conn.execute(f'''
+                        CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                            {', '.join(columns)}, content='{source}', content_rowid='id', prefix='2 3'
+                        )
+                    ''')
+                    values = ', '.join(f'NEW.{column}' for column in columns)
+                    old_values = ', '.join(f'OLD.{column}' for column in columns)
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON {source}
+                        BEGIN
+                            INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES (NEW.id, {values});
+                        END
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON {source}
+                        BEGIN
+                            INSERT INTO {table} ({table}, rowid, {', '.join(columns)})
+                            VALUES ('delete', OLD.id, {old_values});
+                        END
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF {', '.join(columns)} ON {source}
+                        BEGIN
+                            INSERT INTO {table} ({table}, rowid, {', '.join(columns)})
+                            VALUES ('delete', OLD.id, {old_values});
+                            INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES (NEW.id, {values});
+                        END
+                    ''')
+                    if table not in existing:
+                        conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+                
+                # Log entries are indexed through the logs view, which resolves
+                # the domain name; the triggers have to resolve it themselves
+                conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS logs_search USING fts5(
+                        website_url, error_message, content='logs', content_rowid='id', prefix='2 3'
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS logs_search_insert AFTER INSERT ON log_entries
+                    BEGIN
+                        INSERT INTO logs_search (rowid, website_url, error_message)
+                        VALUES (NEW.id, (SELECT name FROM domains WHERE id = NEW.domain_id), NEW.error_message);
+                    END
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS logs_search_delete AFTER DELETE ON log_entries
+                    BEGIN
+                        INSERT INTO logs_search (logs_search, rowid, website_url, error_message)
+                        VALUES ('delete', OLD.id, (SELECT name FROM domains WHERE id = OLD.domain_id),
+                                OLD.error_message);
+                    END
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS logs_search_update AFTER UPDATE OF domain_id, error_message ON log_entries
+                    BEGIN
+                        INSERT INTO logs_search (logs_search, rowid, website_url, error_message)
+                        VALUES ('delete', OLD.id, (SELECT name FROM domains WHERE id = OLD.domain_id),
+                                OLD.error_message);
+                        INSERT INTO logs_search (rowid, website_url, error_message)
+                        VALUES (NEW.id, (SELECT name FROM domains WHERE id = NEW.domain_id), NEW.error_message);
+                    END
+                ''')
+                if 'logs_search' not in existing:
+                    conn.execute("INSERT INTO logs_search (logs_search) VALUES ('rebuild')")
+                
+                # Build rollups for logs written before they existed
+                rollups_empty = conn.execute('SELECT NOT EXISTS (SELECT 1 FROM log_rollups)').fetchone()[0]
+                logs_present = conn.execute('SELECT EXISTS (SELECT 1 FROM log_entries)').fetchone()[0]
+                if rollups_empty and logs_present:
+                    self._rebuild_log_rollups(conn)
+                
                 conn.execute('''
                     CREATE INDEX IF NOT EXISTS idx_websites_schedule ON websites(schedule_id)
                 ''')
@@ -138,7 +423,7 @@ class DatabaseManager:
                 logger.info("Database initialized successfully")
                 
         except sqlite3.Error as e:
-            logger.error(f"Error initializing database: {e}")
+            logger.error("Error initializing database: %s", e)
             raise
     
     def _dict_factory(self, cursor, row):
@@ -159,193 +444,318 @@ class DatabaseManager:
                 
                 schedule_id = cursor.lastrowid
                 
-                # Add websites to the schedule
-                for url in websites:
-                    url = url.strip()
-                    if url:  # Skip empty URLs
-                        cursor.execute('''
-                            INSERT INTO websites (schedule_id, url, enabled)
-                            VALUES (?, ?, ?)
-                        ''', (schedule_id, url, enabled))
+                # Add websites to the schedule (skip empty URLs)
+                cursor.executemany('''
+                    INSERT INTO websites (schedule_id, url, enabled)
+                    VALUES (?, ?, ?)
+                ''', [(schedule_id, url.strip(), enabled) for url in websites if url.strip()])
                 
                 conn.commit()
                 
-                logger.info(f"Added schedule: {name} with {len(websites)} websites (ID: {schedule_id})")
+                logger.info("Added schedule: %s with %s websites (ID: %s)", name, len(websites), schedule_id)
                 return schedule_id
                 
         except sqlite3.Error as e:
-            logger.error(f"Error adding schedule {name}: {e}")
+            logger.error("Error adding schedule %s: %s", name, e)
             raise
 
+    def bulk_add_schedules(self, schedules: List[Dict[str, Any]]) -> List[Website]:
+        """
+        Add many schedules and their websites in a single transaction.
+
+        Each schedule is a dict with name, start_time, end_time, enabled and a
+        list of already-normalized website domains. Returns the inserted
+        websites with their schedule info (same shape as get_enabled_websites).
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = WEBSITE_ROWS
+                cursor = conn.cursor()
+
+                schedule_ids = []
+                website_rows = []
+                for schedule in schedules:
+                    enabled = schedule.get('enabled', True)
+                    cursor.execute('''
+                        INSERT INTO schedules (name, start_time, end_time, enabled)
+                        VALUES (?, ?, ?, ?)
+                    ''', (schedule['name'], schedule['start_time'], schedule['end_time'], enabled))
+                    schedule_id = cursor.lastrowid
+                    schedule_ids.append(schedule_id)
+                    website_rows.extend((schedule_id, url, enabled) for url in schedule['websites'])
+
+                cursor.executemany('''
+                    INSERT INTO websites (schedule_id, url, enabled)
+                    VALUES (?, ?, ?)
+                ''', website_rows)
+
+                websites = []
+                if schedule_ids:
+                    cursor.execute(f'''
+                        SELECT {WEBSITE_COLUMNS}, {SCHEDULE_JOIN_COLUMNS}
+                        FROM websites w
+                        JOIN schedules s ON w.schedule_id = s.id
+                        WHERE s.id BETWEEN ? AND ?
+                        ORDER BY w.id
+                    ''', (min(schedule_ids), max(schedule_ids)))
+                    websites = cursor.fetchall()
+
+                conn.commit()
+
+                logger.info("Bulk added %s schedules with %s websites", len(schedule_ids), len(website_rows))
+                return websites
+
+        except sqlite3.Error as e:
+            logger.error("Error bulk adding schedules: %s", e)
+            raise
+
+    def iter_schedule_rows(self, batch_size: int = 500):
+        """
+        Stream every schedule/website pair ordered by schedule.
+
+        Rows are fetched from the cursor in batches so exports never hold the
+        whole table in memory. Schedules without websites yield one row with
+        url set to None.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = self._dict_factory
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.id as schedule_id, s.name, s.start_time, s.end_time, s.enabled, w.url
+                FROM schedules s
+                LEFT JOIN websites w ON w.schedule_id = s.id
+                ORDER BY s.id, w.url
+            ''')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
     def add_website(self, url: str, start_time: str, end_time: str, enabled: bool = True) -> int:
         """Add a single website (creates a schedule with one website for backward compatibility)."""
         schedule_name = f"Schedule for {url}"
         return self.add_schedule(schedule_name, start_time, end_time, [url], enabled)
     
-    def get_schedule(self, schedule_id: int) -> Optional[Dict[str, Any]]:
+    def get_schedule(self, schedule_id: int) -> Optional[Schedule]:
         """Get a schedule by ID with its websites."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self._dict_factory
+                conn.row_factory = SCHEDULE_ROWS
                 cursor = conn.cursor()
                 
                 # Get schedule
-                cursor.execute('SELECT * FROM schedules WHERE id = ?', (schedule_id,))
+                cursor.execute(f'SELECT {SCHEDULE_COLUMNS} FROM schedules WHERE id = ?', (schedule_id,))
                 schedule = cursor.fetchone()
                 
                 if schedule:
                     # Get associated websites
-                    cursor.execute('SELECT * FROM websites WHERE schedule_id = ? ORDER BY url', (schedule_id,))
-                    websites = cursor.fetchall()
-                    schedule['websites'] = websites
+                    cursor.row_factory = WEBSITE_ROWS
+                    cursor.execute(f'SELECT {WEBSITE_COLUMNS} FROM websites w WHERE schedule_id = ? ORDER BY url',
+                                   (schedule_id,))
+                    schedule.websites = cursor.fetchall()
                 
                 return schedule
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting schedule {schedule_id}: {e}")
+            logger.error("Error getting schedule %s: %s", schedule_id, e)
             return None
 
-    def get_all_schedules(self) -> List[Dict[str, Any]]:
+    def get_all_schedules(self) -> List[Schedule]:
         """Get all schedules with their websites."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self._dict_factory
+                conn.row_factory = SCHEDULE_ROWS
                 cursor = conn.cursor()
                 
                 # Get all schedules
-                cursor.execute('SELECT * FROM schedules ORDER BY created_at DESC')
+                cursor.execute(f'SELECT {SCHEDULE_COLUMNS} FROM schedules ORDER BY created_at DESC')
                 schedules = cursor.fetchall()
                 
                 # Get websites for each schedule
+                cursor.row_factory = WEBSITE_ROWS
                 for schedule in schedules:
-                    cursor.execute('SELECT * FROM websites WHERE schedule_id = ? ORDER BY url', (schedule['id'],))
-                    schedule['websites'] = cursor.fetchall()
+                    cursor.execute(f'SELECT {WEBSITE_COLUMNS} FROM websites w WHERE schedule_id = ? ORDER BY url',
+                                   (schedule.id,))
+                    schedule.websites = cursor.fetchall()
                 
                 return schedules
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting all schedules: {e}")
+            logger.error("Error getting all schedules: %s", e)
             return []
 
-    def get_enabled_schedules(self) -> List[Dict[str, Any]]:
+    def get_enabled_schedules(self) -> List[Schedule]:
         """Get all enabled schedules with their websites."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self._dict_factory
+                conn.row_factory = SCHEDULE_ROWS
                 cursor = conn.cursor()
                 
                 # Get enabled schedules
-                cursor.execute('SELECT * FROM schedules WHERE enabled = 1 ORDER BY created_at DESC')
+                cursor.execute(f'SELECT {SCHEDULE_COLUMNS} FROM schedules WHERE enabled = 1 ORDER BY created_at DESC')
                 schedules = cursor.fetchall()
                 
                 # Get websites for each schedule
+                cursor.row_factory = WEBSITE_ROWS
                 for schedule in schedules:
-                    cursor.execute('SELECT * FROM websites WHERE schedule_id = ? AND enabled = 1 ORDER BY url', (schedule['id'],))
-                    schedule['websites'] = cursor.fetchall()
+                    cursor.execute(f'''
+                        SELECT {WEBSITE_COLUMNS} FROM websites w
+                        WHERE schedule_id = ? AND enabled = 1 ORDER BY url
+                    ''', (schedule.id,))
+                    schedule.websites = cursor.fetchall()
                 
                 return schedules
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting enabled schedules: {e}")
+            logger.error("Error getting enabled schedules: %s", e)
             return []
 
-    def get_website(self, website_id: int) -> Optional[Dict[str, Any]]:
+    def get_website(self, website_id: int) -> Optional[Website]:
         """Get a website by ID (legacy method for backward compatibility)."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self._dict_factory
+                conn.row_factory = WEBSITE_ROWS
                 cursor = conn.cursor()
                 
                 # Get website with schedule info
-                cursor.execute('''
-                    SELECT w.*, s.name as schedule_name, s.start_time, s.end_time, s.enabled as schedule_enabled
+                cursor.execute(f'''
+                    SELECT {LEGACY_WEBSITE_COLUMNS}, {SCHEDULE_JOIN_COLUMNS}
                     FROM websites w
                     JOIN schedules s ON w.schedule_id = s.id
                     WHERE w.id = ?
                 ''', (website_id,))
                 
-                website = cursor.fetchone()
-                if website:
-                    # Add backward compatibility fields
-                    website['url'] = website['url']
-                    website['enabled'] = website['schedule_enabled']
-                
-                return website
+                return cursor.fetchone()
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting website {website_id}: {e}")
+            logger.error("Error getting website %s: %s", website_id, e)
             return None
     
-    def get_all_websites(self) -> List[Dict[str, Any]]:
+    def get_all_websites(self) -> List[Website]:
         """Get all websites (legacy method - now returns websites with schedule info)."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self._dict_factory
+                conn.row_factory = WEBSITE_ROWS
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT w.*, s.name as schedule_name, s.start_time, s.end_time, s.enabled as schedule_enabled
+                cursor.execute(f'''
+                    SELECT {LEGACY_WEBSITE_COLUMNS}, {SCHEDULE_JOIN_COLUMNS}
                     FROM websites w
                     JOIN schedules s ON w.schedule_id = s.id
                     ORDER BY s.created_at DESC
                 ''')
-                
-                websites = cursor.fetchall()
-                # Add backward compatibility fields
-                for website in websites:
-                    website['enabled'] = website['schedule_enabled']
-                
-                return websites
+                return cursor.fetchall()
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting all websites: {e}")
+            logger.error("Error getting all websites: %s", e)
             return []
 
-    def get_enabled_websites(self) -> List[Dict[str, Any]]:
+    def get_enabled_websites(self) -> List[Website]:
         """Get all enabled websites (legacy method)."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = self._dict_factory
+                conn.row_factory = WEBSITE_ROWS
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT w.*, s.name as schedule_name, s.start_time, s.end_time, s.enabled as schedule_enabled
+                cursor.execute(f'''
+                    SELECT {LEGACY_WEBSITE_COLUMNS}, {SCHEDULE_JOIN_COLUMNS}
                     FROM websites w
                     JOIN schedules s ON w.schedule_id = s.id
                     WHERE s.enabled = 1 AND w.enabled = 1
                     ORDER BY s.created_at DESC
                 ''')
-                
-                websites = cursor.fetchall()
-                # Add backward compatibility fields
-                for website in websites:
-                    website['enabled'] = website['schedule_enabled']
-                
-                return websites
+                return cursor.fetchall()
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting enabled websites: {e}")
+            logger.error("Error getting enabled websites: %s", e)
             return []
     
-    def update_website(self, website_id: int, url: str, start_time: str, end_time: str, enabled: bool):
-        """Update a website."""
+    def update_schedule(self, schedule_id: int, name: str, start_time: str, end_time: str,
+                        websites: List[str], enabled: bool) -> Optional[Dict[str, Any]]:
+        """
+        Apply an edited schedule as a diff against the stored one.
+
+        Only websites added to or removed from the list are inserted or
+        deleted, and the schedule row is only rewritten if one of its fields
+        changed. Returns the diff (added, removed and kept websites plus which
+        fields changed), or None if the schedule does not exist.
+        """
         try:
             with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = SCHEDULE_ROWS
                 cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE websites 
-                    SET url = ?, start_time = ?, end_time = ?, enabled = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (url, start_time, end_time, enabled, website_id))
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(f"Website with ID {website_id} not found")
-                
+
+                cursor.execute('SELECT id, name, start_time, end_time, enabled FROM schedules WHERE id = ?', (schedule_id,))
+                current = cursor.fetchone()
+                if current is None:
+                    return None
+
+                cursor.row_factory = WEBSITE_ROWS
+                cursor.execute('SELECT id, schedule_id, url, enabled FROM websites WHERE schedule_id = ? ORDER BY id',
+                               (schedule_id,))
+                existing = cursor.fetchall()
+
+                wanted = list(dict.fromkeys(url.strip() for url in websites if url.strip()))
+                wanted_set = set(wanted)
+                kept = {}
+                removed = []
+                for website in existing:
+                    if website['url'] in wanted_set and website['url'] not in kept:
+                        kept[website['url']] = website
+                    else:
+                        removed.append(website['id'])
+
+                enabled = bool(enabled)
+                times_changed = (current['start_time'], current['end_time']) != (start_time, end_time)
+                enabled_changed = bool(current['enabled']) != enabled
+
+                if removed:
+                    cursor.executemany('DELETE FROM websites WHERE id = ?', [(website_id,) for website_id in removed])
+
+                added = []
+                for url in wanted:
+                    if url not in kept:
+                        cursor.execute('''
+                            INSERT INTO websites (schedule_id, url, enabled)
+                            VALUES (?, ?, ?)
+                        ''', (schedule_id, url, enabled))
+                        added.append({'id': cursor.lastrowid, 'url': url, 'enabled': enabled})
+
+                # Enabling or disabling a schedule applies to all of its websites
+                if enabled_changed:
+                    cursor.execute('''
+                        UPDATE websites SET enabled = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE schedule_id = ? AND enabled != ?
+                    ''', (enabled, schedule_id, enabled))
+                    for website in kept.values():
+                        website['enabled'] = enabled
+
+                if current['name'] != name or times_changed or enabled_changed:
+                    cursor.execute('''
+                        UPDATE schedules
+                        SET name = ?, start_time = ?, end_time = ?, enabled = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (name, start_time, end_time, enabled, schedule_id))
+
                 conn.commit()
-                logger.info(f"Updated website ID {website_id}: {url}")
-                
+                logger.info("Updated schedule ID %s: %s added, %s removed, %s kept",
+                            schedule_id, len(added), len(removed), len(kept))
+
+                return {
+                    'schedule_id': schedule_id,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'enabled': enabled,
+                    'added': added,
+                    'removed': removed,
+                    'kept': list(kept.values()),
+                    'times_changed': times_changed,
+                    'enabled_changed': enabled_changed,
+                }
+
         except sqlite3.Error as e:
-            logger.error(f"Error updating website {website_id}: {e}")
+            logger.error("Error updating schedule %s: %s", schedule_id, e)
             raise
-    
+
     def update_website_enabled(self, website_id: int, enabled: bool):
         """Update website enabled status."""
         try:
@@ -361,10 +771,10 @@ class DatabaseManager:
                     raise ValueError(f"Website with ID {website_id} not found")
                 
                 conn.commit()
-                logger.info(f"Updated website ID {website_id} enabled status: {enabled}")
+                logger.info("Updated website ID %s enabled status: %s", website_id, enabled)
                 
         except sqlite3.Error as e:
-            logger.error(f"Error updating website enabled status {website_id}: {e}")
+            logger.error("Error updating website enabled status %s: %s", website_id, e)
             raise
     
     def delete_website(self, website_id: int):
@@ -378,59 +788,637 @@ class DatabaseManager:
                     raise ValueError(f"Website with ID {website_id} not found")
                 
                 conn.commit()
-                logger.info(f"Deleted website ID {website_id}")
+                logger.info("Deleted website ID %s", website_id)
                 
         except sqlite3.Error as e:
-            logger.error(f"Error deleting website {website_id}: {e}")
+            logger.error("Error deleting website %s: %s", website_id, e)
             raise
     
+    def _insert_log(self, cursor, website_id: Optional[int], website_url: str, action: str,
+                    success: Optional[bool], error_message: str = None) -> int:
+        """Insert a log entry, registering its domain and action codes if new. Returns its ID."""
+        cursor.execute('INSERT OR IGNORE INTO domains (name) VALUES (?)', (website_url,))
+        cursor.execute('INSERT OR IGNORE INTO log_actions (name) VALUES (?)', (action,))
+        cursor.execute('''
+            INSERT INTO log_entries (website_id, domain_id, action_id, ts, success, error_message)
+            VALUES (?, (SELECT id FROM domains WHERE name = ?), (SELECT id FROM log_actions WHERE name = ?),
+                    ?, ?, ?)
+        ''', (website_id, website_url, action, int(time.time()), success, error_message))
+        return cursor.lastrowid
+    
     def log_action(self, website_id: int, website_url: str, action: str, 
                    success: bool = True, error_message: str = None):
         """Log a blocking/unblocking action."""
         try:
             with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                self._insert_log(cursor, website_id, website_url, action, success, error_message)
+                
+                conn.commit()
+                logger.info("Logged action: %s for %s (success: %s)", action, website_url, success)
+                
+        except sqlite3.Error as e:
+            logger.error("Error logging action: %s", e)
+    
+    def get_recent_logs(self, limit: int = 50) -> List[LogEntry]:
+        """Get recent logs."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = LOG_ROWS
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, timestamp, website_id, website_url, action, success, error_message FROM logs
+                    ORDER BY id DESC 
+                    LIMIT ?
+                ''', (limit,))
+                return cursor.fetchall()
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting recent logs: %s", e)
+            return []
+    
+    def _rebuild_log_rollups(self, conn) -> int:
+        """Recompute rollups for every day still covered by raw logs."""
+        conn.execute('''
+            DELETE FROM log_rollups WHERE day >= (SELECT date(MIN(ts), 'unixepoch') FROM log_entries)
+        ''')
+        cursor = conn.execute('''
+            INSERT INTO log_rollups (day, domain, action, succeeded, failed, pending, last_error)
+            SELECT date(g.day * 86400, 'unixepoch'), d.name, a.name, g.succeeded, g.failed, g.pending,
+                   last_failed.error_message
+            FROM (
+                SELECT ts / 86400 AS day, domain_id, action_id,
+                       SUM(success IS 1) AS succeeded, SUM(success IS 0) AS failed,
+                       SUM(success IS NULL) AS pending,
+                       MAX(CASE WHEN success IS 0 AND error_message IS NOT NULL THEN id END) AS last_failed_id
+                FROM log_entries
+                GROUP BY day, domain_id, action_id
+            ) AS g
+            JOIN domains AS d ON d.id = g.domain_id
+            JOIN log_actions AS a ON a.id = g.action_id
+            LEFT JOIN log_entries AS last_failed ON last_failed.id = g.last_failed_id
+        ''')
+        return cursor.rowcount
+    
+    def rebuild_log_rollups(self) -> int:
+        """Rebuild the history rollups from the raw logs. Returns the number of rollup rows written."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = self._rebuild_log_rollups(conn)
+                conn.commit()
+                logger.info("Rebuilt %s log rollup rows", rows)
+                return rows
+                
+        except sqlite3.Error as e:
+            logger.error("Error rebuilding log rollups: %s", e)
+            raise
+    
+    def get_history_summary(self, days: int = 30) -> Dict[str, Any]:
+        """
+        Summarize the last N days of actions per day, per domain and per schedule.
+        
+        Reads only the rollup tables, never the raw logs. Rollups are keyed
+        by the domain actions are logged under, so websites are matched on
+        their domain_key. A domain in several schedules is blocked once for
+        all of them, so its actions count toward each of those schedules;
+        shared_domains says how many of a schedule's domains that applies to.
+        """
+        since = f'-{max(days - 1, 0)} days'
+        totals = 'SUM(r.succeeded) AS succeeded, SUM(r.failed) AS failed, SUM(r.pending) AS pending'
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = self._dict_factory
+                conn.create_function('domain_key', 1, domain_key, deterministic=True)
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT r.day, {totals},
+                           SUM(CASE WHEN r.action IN ('block', 'manual_block') THEN r.succeeded ELSE 0 END) AS blocks
+                    FROM log_rollups AS r
+                    WHERE r.day >= date('now', ?)
+                    GROUP BY r.day ORDER BY r.day DESC
+                ''', (since,))
+                by_day = cursor.fetchall()
+                
+                cursor.execute(f'''
+                    SELECT r.domain, {totals},
+                           SUM(CASE WHEN r.action IN ('block', 'manual_block') THEN r.succeeded ELSE 0 END) AS blocks,
+                           (SELECT last.last_error FROM log_rollups AS last
+                            WHERE last.domain = r.domain AND last.last_error IS NOT NULL AND last.day >= date('now', ?)
+                            ORDER BY last.day DESC LIMIT 1) AS last_error
+                    FROM log_rollups AS r
+                    WHERE r.day >= date('now', ?)
+                    GROUP BY r.domain ORDER BY r.domain
+                ''', (since, since))
+                by_domain = cursor.fetchall()
+                
+                cursor.execute(f'''
+                    WITH members AS (
+                        SELECT DISTINCT schedule_id, domain_key(url) AS domain FROM websites
+                    ), sharing AS (
+                        SELECT domain, COUNT(*) AS schedules FROM members GROUP BY domain
+                    )
+                    SELECT s.id AS schedule_id, s.name, {totals},
+                           COUNT(DISTINCT CASE WHEN sharing.schedules > 1 THEN m.domain END) AS shared_domains
+                    FROM schedules AS s
+                    JOIN members AS m ON m.schedule_id = s.id
+                    JOIN sharing ON sharing.domain = m.domain
+                    JOIN log_rollups AS r ON r.domain = m.domain
+                    WHERE r.day >= date('now', ?)
+                    GROUP BY s.id ORDER BY s.name
+                ''', (since,))
+                by_schedule = cursor.fetchall()
+                
+            for row in by_day + by_domain + by_schedule:
+                finished = row['succeeded'] + row['failed']
+                row['success_rate'] = round(row['succeeded'] / finished * 100, 1) if finished else None
+            
+            return {'days': days, 'by_day': by_day, 'by_domain': by_domain, 'by_schedule': by_schedule}
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting history summary: %s", e)
+            return {'days': days, 'by_day': [], 'by_domain': [], 'by_schedule': []}
+    
+    def iter_logs(self, since: int = None, until: int = None, domain: str = None, action: str = None,
+                  success=None, batch_size: int = 1000, after_id: int = 0):
+        """
+        Stream log rows oldest first, optionally filtered.
+
+        Rows are read in fixed-size chunks keyed on the last ID seen, so
+        memory stays constant and no read transaction stays open between
+        chunks to hold up the scheduler's writes for the whole download.
+        since and until are epoch seconds; domain also matches its
+        subdomains; success may be True, False or 'pending'. Only rows with
+        IDs above after_id are returned.
+        """
+        conditions, params = [], []
+        if since:
+            conditions.append('e.ts >= ?')
+            params.append(since)
+        if until:
+            conditions.append('e.ts < ?')
+            params.append(until)
+        if domain:
+            conditions.append('(d.name = ? OR d.name GLOB ?)')
+            params.extend([domain, '*.' + domain])
+        if action:
+            conditions.append('a.name = ?')
+            params.append(action)
+        if success == 'pending':
+            conditions.append('e.success IS NULL')
+        elif success is not None:
+            conditions.append('e.success = ?')
+            params.append(1 if success else 0)
+        where = ' AND '.join(['e.id > ?'] + conditions)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = LOG_ROWS
+            last_id = after_id
+            while True:
+                rows = conn.execute(f'''
+                    SELECT e.id, datetime(e.ts, 'unixepoch') AS timestamp, e.website_id,
+                           d.name AS website_url, a.name AS action, e.success, e.error_message
+                    FROM log_entries AS e
+                    JOIN domains AS d ON d.id = e.domain_id
+                    JOIN log_actions AS a ON a.id = e.action_id
+                    WHERE {where}
+                    ORDER BY e.id
+                    LIMIT ?
+                ''', [last_id] + params + [batch_size]).fetchall()
+                if not rows:
+                    return
+                yield from rows
+                last_id = rows[-1].id
+
+    def search(self, text: str, limit: int = 20, failed_only: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Full-text search schedules, websites and logs.
+        
+        Schedules and websites are ranked by relevance (bm25); logs come
+        newest first, which needs no ranking pass over millions of matches.
+        failed_only restricts log hits to failed actions.
+        """
+        results = {'schedules': [], 'websites': [], 'logs': []}
+        query = fts_query(text)
+        if query is None:
+            return results
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = self._dict_factory
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO logs (website_id, website_url, action, success, error_message)
+                    SELECT s.id, s.name, s.start_time, s.end_time, s.enabled
+                    FROM schedules_search
+                    JOIN schedules AS s ON s.id = schedules_search.rowid
+                    WHERE schedules_search MATCH ?
+                    ORDER BY schedules_search.rank
+                    LIMIT ?
+                ''', (query, limit))
+                results['schedules'] = cursor.fetchall()
+                
+                cursor.execute('''
+                    SELECT w.id, w.url, w.enabled, w.schedule_id, s.name AS schedule_name,
+                           s.start_time, s.end_time
+                    FROM websites_search
+                    JOIN websites AS w ON w.id = websites_search.rowid
+                    LEFT JOIN schedules AS s ON s.id = w.schedule_id
+                    WHERE websites_search MATCH ?
+                    ORDER BY websites_search.rank
+                    LIMIT ?
+                ''', (query, limit))
+                results['websites'] = cursor.fetchall()
+                
+                cursor.execute(f'''
+                    SELECT l.id, l.timestamp, l.website_url, l.action, l.success, l.error_message
+                    FROM logs_search
+                    JOIN logs AS l ON l.id = logs_search.rowid
+                    WHERE logs_search MATCH ?{' AND l.success = 0' if failed_only else ''}
+                    ORDER BY logs_search.rowid DESC
+                    LIMIT ?
+                ''', (query, limit))
+                results['logs'] = cursor.fetchall()
+                return results
+                
+        except sqlite3.Error as e:
+            logger.error("Error searching for %r: %s", text, e)
+            return results
+    
+    def get_transition_history(self, since: int) -> List[Tuple[str, int, int]]:
+        """
+        Get successful block/unblock transitions as (website_url, epoch, is_block) tuples.
+        
+        Covers everything from since (epoch seconds) onwards plus each
+        website's last transition before it, so the state at since is known.
+        Rows are ordered by website and then time.
+        """
+        # Action codes 1-4 are block, unblock, manual_block and manual_unblock
+        transition = '''
+            SELECT d.name AS website_url, e.ts AS at, e.action_id IN (1, 3) AS is_block, e.id
+            FROM log_entries AS e
+            JOIN domains AS d ON d.id = e.domain_id
+            WHERE e.success = 1 AND e.action_id IN (1, 2, 3, 4)
+        '''
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT website_url, at, is_block FROM (
+                        {transition} AND e.ts >= ?
+                        UNION ALL
+                        SELECT * FROM ({transition} AND e.id IN (
+                            SELECT MAX(id) FROM log_entries
+                            WHERE success = 1 AND ts < ? AND action_id IN (1, 2, 3, 4)
+                            GROUP BY domain_id
+                        ))
+                    )
+                    ORDER BY website_url, at, id
+                ''', (since, since))
+                return cursor.fetchall()
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting transition history: %s", e)
+            return []
+    
+    def enqueue_action(self, website_id: Optional[int], domain: str, action: str,
+                       keep_blocked: Optional[List[str]] = None, timing: Optional[tuple] = None) -> int:
+        """
+        Record a block/unblock intent in the outbox.
+        
+        The outbox row and its log entry are written in one transaction. Any
+        older pending intent for the same domain is superseded, so a block
+        followed by an unblock collapses into the unblock. The log entry stays
+        pending (success NULL) until the action completes. timing is the
+        (scheduled_at, started_at) epoch pair of a scheduled transition, whose
+        latency is then tracked until AdGuard acknowledges it. Returns the
+        outbox ID.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                
+                # Supersede older pending intents for this domain
+                cursor.execute('''
+                    UPDATE log_entries SET success = 0, error_message = 'Superseded by a later action'
+                    WHERE id IN (SELECT log_id FROM outbox WHERE domain = ? AND status = 'pending')
+                ''', (domain,))
+                cursor.execute('''
+                    UPDATE outbox SET status = 'superseded', updated_at = CURRENT_TIMESTAMP
+                    WHERE domain = ? AND status = 'pending'
+                ''', (domain,))
+                
+                log_id = self._insert_log(cursor, website_id, domain, action, None)
+                
+                cursor.execute('''
+                    INSERT INTO outbox (website_id, domain, action, keep_blocked, log_id)
                     VALUES (?, ?, ?, ?, ?)
-                ''', (website_id, website_url, action, success, error_message))
+                ''', (website_id, domain, action, json.dumps(keep_blocked) if keep_blocked else None, log_id))
+                outbox_id = cursor.lastrowid
+                
+                if timing is not None:
+                    cursor.execute('''
+                        INSERT INTO transition_latency (outbox_id, is_block, scheduled_at, started_at)
+                        VALUES (?, ?, ?, ?)
+                    ''', (outbox_id, int(action in ('block', 'manual_block')), *timing))
                 
                 conn.commit()
-                logger.info(f"Logged action: {action} for {website_url} (success: {success})")
+                logger.debug("Queued %s for %s (outbox ID: %s)", action, domain, outbox_id)
+                return outbox_id
                 
         except sqlite3.Error as e:
-            logger.error(f"Error logging action: {e}")
+            logger.error("Error queueing %s for %s: %s", action, domain, e)
+            raise
     
-    def get_recent_logs(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get recent logs."""
+    def get_ready_actions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get pending outbox actions whose next attempt is due, oldest first."""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 conn.row_factory = self._dict_factory
                 cursor = conn.cursor()
                 cursor.execute('''
-                    SELECT * FROM logs 
-                    ORDER BY timestamp DESC 
+                    SELECT * FROM outbox
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY id
                     LIMIT ?
-                ''', (limit,))
+                ''', (time.time(), limit))
+                actions = cursor.fetchall()
+                for action in actions:
+                    action['keep_blocked'] = json.loads(action['keep_blocked']) if action['keep_blocked'] else []
+                return actions
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting ready outbox actions: %s", e)
+            return []
+    
+    def get_action(self, outbox_id: int) -> Optional[Dict[str, Any]]:
+        """Get an outbox action by ID."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = self._dict_factory
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM outbox WHERE id = ?', (outbox_id,))
+                return cursor.fetchone()
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting outbox action %s: %s", outbox_id, e)
+            return None
+    
+    def complete_actions(self, outbox_ids: List[int]) -> int:
+        """
+        Mark pending outbox actions and their log entries as succeeded.
+        
+        Completion is idempotent: rows already completed or superseded are
+        left alone. Returns the number of actions completed.
+        """
+        if not outbox_ids:
+            return 0
+        placeholders = ','.join('?' * len(outbox_ids))
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    UPDATE log_entries SET success = 1, error_message = NULL
+                    WHERE id IN (SELECT log_id FROM outbox WHERE id IN ({placeholders}) AND status = 'pending')
+                ''', outbox_ids)
+                cursor.execute(f'''
+                    UPDATE transition_latency SET acked_at = ?
+                    WHERE outbox_id IN ({placeholders}) AND acked_at IS NULL
+                ''', [time.time()] + list(outbox_ids))
+                cursor.execute(f'''
+                    UPDATE outbox SET status = 'done', attempts = attempts + 1, last_error = NULL,
+                                      updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders}) AND status = 'pending'
+                ''', outbox_ids)
+                completed = cursor.rowcount
+                conn.commit()
+                return completed
+                
+        except sqlite3.Error as e:
+            logger.error("Error completing outbox actions: %s", e)
+            return 0
+    
+    def retry_actions_later(self, outbox_ids: List[int], error_message: str,
+                            base_delay: float = 5.0, max_delay: float = 300.0, max_attempts: int = None) -> int:
+        """
+        Record a failed attempt and push the next one back with exponential backoff.
+        
+        Actions that have used up max_attempts (if set) stop retrying: they are
+        marked 'failed' and their log entries recorded as failed. Returns the
+        number of actions given up on.
+        """
+        if not outbox_ids:
+            return 0
+        placeholders = ','.join('?' * len(outbox_ids))
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    UPDATE outbox
+                    SET attempts = attempts + 1,
+                        next_attempt_at = ? + min(? * (1 << min(attempts, 16)), ?),
+                        last_error = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders}) AND status = 'pending'
+                ''', [time.time(), base_delay, max_delay, error_message] + list(outbox_ids))
+                
+                failed = 0
+                if max_attempts:
+                    exhausted = f"id IN ({placeholders}) AND status = 'pending' AND attempts >= ?"
+                    cursor.execute(f'''
+                        UPDATE log_entries SET success = 0, error_message = ?
+                        WHERE id IN (SELECT log_id FROM outbox WHERE {exhausted})
+                    ''', [f"Failed after {max_attempts} attempts: {error_message}"] + list(outbox_ids) + [max_attempts])
+                    cursor.execute(f'''
+                        UPDATE outbox SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+                        WHERE {exhausted}
+                    ''', list(outbox_ids) + [max_attempts])
+                    failed = cursor.rowcount
+                
+                cursor.execute(f'''
+                    UPDATE log_entries SET error_message = ?
+                    WHERE id IN (SELECT log_id FROM outbox WHERE id IN ({placeholders}) AND status = 'pending')
+                ''', [f"Retrying: {error_message}"] + list(outbox_ids))
+                conn.commit()
+                return failed
+                
+        except sqlite3.Error as e:
+            logger.error("Error rescheduling outbox actions: %s", e)
+            return 0
+    
+    def postpone_actions(self, outbox_ids: List[int], error_message: str, delay: float) -> int:
+        """
+        Push pending actions back by a delay without counting an attempt.
+        
+        Used while AdGuard is unreachable: the actions were never tried, so
+        they keep their attempts and stay pending. Returns the number postponed.
+        """
+        if not outbox_ids:
+            return 0
+        placeholders = ','.join('?' * len(outbox_ids))
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    UPDATE outbox
+                    SET next_attempt_at = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders}) AND status = 'pending'
+                ''', [time.time() + delay, error_message] + list(outbox_ids))
+                postponed = cursor.rowcount
+                cursor.execute(f'''
+                    UPDATE log_entries SET error_message = ?
+                    WHERE id IN (SELECT log_id FROM outbox WHERE id IN ({placeholders}) AND status = 'pending')
+                ''', [f"Retrying: {error_message}"] + list(outbox_ids))
+                conn.commit()
+                return postponed
+                
+        except sqlite3.Error as e:
+            logger.error("Error postponing outbox actions: %s", e)
+            return 0
+    
+    def get_transition_timings(self, since: float) -> List[Dict[str, Any]]:
+        """Get latency rows for transitions scheduled at or after an epoch time."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = self._dict_factory
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT is_block, scheduled_at, started_at, acked_at
+                    FROM transition_latency
+                    WHERE scheduled_at >= ?
+                ''', (since,))
+                return cursor.fetchall()
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting transition timings: %s", e)
+            return []
+    
+    def get_ingest_cursor(self, name: str) -> Optional[str]:
+        """Get the saved position of an ingestion job."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT value FROM ingest_cursors WHERE name = ?', (name,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+                
+        except sqlite3.Error as e:
+            logger.error("Error getting ingest cursor %s: %s", name, e)
+            return None
+    
+    def add_query_buckets(self, buckets: Dict[Tuple[str, int], List[int]], cursor_name: str, cursor_value: str) -> bool:
+        """
+        Add per-minute query counts and move the ingest cursor in one transaction.
+        
+        buckets maps (domain, minute) to [queries, blocked]; counts are added
+        to any already stored for that minute.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT INTO query_buckets (domain, minute, queries, blocked)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (domain, minute) DO UPDATE SET
+                        queries = queries + excluded.queries,
+                        blocked = blocked + excluded.blocked
+                ''', ((domain, minute, queries, blocked)
+                      for (domain, minute), (queries, blocked) in buckets.items()))
+                cursor.execute('''
+                    INSERT INTO ingest_cursors (name, value) VALUES (?, ?)
+                    ON CONFLICT (name) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+                ''', (cursor_name, cursor_value))
+                conn.commit()
+                return True
+                
+        except sqlite3.Error as e:
+            logger.error("Error saving query buckets: %s", e)
+            return False
+    
+    def get_query_buckets(self, since_minute: int, until_minute: int, domain: str = None) -> List[Dict[str, Any]]:
+        """Get per-minute query counts in [since_minute, until_minute), optionally for one domain."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = self._dict_factory
+                cursor = conn.cursor()
+                query = '''
+                    SELECT domain, minute, queries, blocked FROM query_buckets
+                    WHERE minute >= ? AND minute < ?
+                '''
+                params = [since_minute, until_minute]
+                if domain:
+                    query += ' AND domain = ?'
+                    params.append(domain)
+                cursor.execute(query + ' ORDER BY domain, minute', params)
                 return cursor.fetchall()
                 
         except sqlite3.Error as e:
-            logger.error(f"Error getting recent logs: {e}")
+            logger.error("Error getting query buckets: %s", e)
             return []
     
-    def cleanup_old_logs(self, days: int = 30):
-        """Clean up logs older than specified days."""
+    def count_pending_actions(self) -> int:
+        """Count outbox actions still waiting to reach AdGuard."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'")
+                return cursor.fetchone()[0]
+                
+        except sqlite3.Error as e:
+            logger.error("Error counting pending outbox actions: %s", e)
+            return 0
+    
+    def delete_archived_logs(self, max_id: int, before: int) -> int:
+        """Delete settled log rows up to an ID that are older than an epoch time, once archived."""
+        if not max_id:
+            return 0
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
+                # Pending rows still get their outcome from the outbox
                 cursor.execute('''
-                    DELETE FROM logs 
-                    WHERE timestamp < datetime('now', '-{} days')
-                '''.format(days))
+                    DELETE FROM log_entries WHERE id <= ? AND ts < ? AND success IS NOT NULL
+                ''', (max_id, before))
+                conn.commit()
+                return cursor.rowcount
+                
+        except sqlite3.Error as e:
+            logger.error("Error deleting archived logs: %s", e)
+            return 0
+    
+    def cleanup_old_logs(self, days: int = 30, archived_through: Optional[int] = None):
+        """
+        Clean up logs older than specified days.
+        
+        Rows still pending in the outbox are kept until they settle. When
+        logs are archived, pass the archive's highest ID as archived_through
+        so rows that never made it into the archive are kept too.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                if archived_through is None:
+                    cursor.execute('''
+                        DELETE FROM log_entries WHERE ts < ? AND success IS NOT NULL
+                    ''', (int(time.time()) - days * 86400,))
+                else:
+                    cursor.execute('''
+                        DELETE FROM log_entries WHERE ts < ? AND success IS NOT NULL AND id <= ?
+                    ''', (int(time.time()) - days * 86400, archived_through))
                 
                 deleted_count = cursor.rowcount
+                
+                # Finished outbox rows are only kept as long as their logs
+                cursor.execute('''
+                    DELETE FROM outbox
+                    WHERE status != 'pending' AND updated_at < datetime('now', '-{} days')
+                '''.format(days))
+                cursor.execute('''
+                    DELETE FROM transition_latency WHERE scheduled_at < ?
+                ''', (time.time() - days * 86400,))
+                cursor.execute('''
+                    DELETE FROM query_buckets WHERE minute < ?
+                ''', (int(time.time() // 60) - days * 1440,))
+                
                 conn.commit()
-                logger.info(f"Cleaned up {deleted_count} old log entries")
+                logger.info("Cleaned up %s old log entries", deleted_count)
                 
         except sqlite3.Error as e:
-            logger.error(f"Error cleaning up old logs: {e}")
+            logger.error("Error cleaning up old logs: %s", e)
@@ -0,0 +1,62 @@
+"""
+Domain helpers for FunTime Scheduler.
+Normalizes and validates the website entries users type or import.
+"""
+
+import re
+from typing import Optional
+
+# One DNS label: alphanumerics and hyphens, not starting/ending with a hyphen
+_LABEL_RE = re.compile(r'^(?!-)[a-z0-9-]{1,63}(?<!-)$')
+
+def normalize_domain(url: str) -> Optional[str]:
+    """
+    Reduce a user-supplied URL to a bare lowercase domain.
+
+    Strips the scheme, path, port, leading "*." wildcard and trailing dot.
+    Returns None if what is left is not a valid domain name.
+    """
+    if not url:
+        return None
+
+    domain = url.strip().lower()
+
+    # Remove protocol if present
+    if '://' in domain:
+        domain = domain.split('://', 1)[1]
+
+    # Drop path, query, credentials and port
+    domain = re.split(r'[/?#]', domain, 1)[0]
+    domain = domain.rsplit('@', 1)[-1]
+    domain = domain.split(':', 1)[0]
+
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    domain = domain.rstrip('.')
+
+    if not is_valid_domain(domain):
+        return None
+    return domain
+
+def domain_key(url: str) -> str:
+    """
+    Get the domain a website entry is blocked and logged under.
+
+    Its normalized domain, or the lowercased entry itself if it does not
+    normalize, matching what the scheduler sends to AdGuard.
+    """
+    return normalize_domain(url) or url.strip().lower()
+
+def is_valid_domain(domain: str) -> bool:
+    """Check that a normalized domain is a syntactically valid host name."""
+    if not domain or len(domain) > 253:
+        return False
+    return all(_LABEL_RE.match(label) for label in domain.split('.'))
+
+def is_valid_time(value: str) -> bool:
+    """Check that a schedule time is in 24-hour HH:MM format."""
+    try:
+        hour, minute = value.split(':')
+        return len(minute) == 2 and 0 <= int(hour) <= 23 and 0 <= int(minute) <= 59
+    except (ValueError, AttributeError):
+        return False
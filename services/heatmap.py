@@ -0,0 +1,154 @@
+"""
+Blocked-minutes heatmap analytics for FunTime Scheduler.
+Compares when each domain was actually blocked against its schedule, per minute of the week.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.domain_utils import domain_key
+from services.intervals import MINUTES_PER_DAY, merge_windows
+
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Longest gaps (scheduled but not blocked) reported per domain
+MAX_GAPS = 10
+
+def scheduled_occupancy(windows: Iterable[Tuple[str, str]]) -> np.ndarray:
+    """Build the minute-of-week occupancy of daily (start_time, end_time) windows."""
+    day = np.zeros(MINUTES_PER_DAY + 1, dtype=np.int32)
+    for start, end in merge_windows(windows):
+        if start < end:
+            day[start] += 1
+            day[end] -= 1
+        else:
+            # Wraps midnight: runs to the end of the day and on from 00:00
+            day[start] += 1
+            day[0] += 1
+            day[end] -= 1
+    return np.tile(np.cumsum(day[:-1]) > 0, 7)
+
+def actual_occupancy(minutes: np.ndarray, is_block: np.ndarray, length: int) -> np.ndarray:
+    """
+    Build the occupancy of one domain from its ordered transitions.
+
+    minutes are transition times relative to the start of the period
+    (earlier ones clipped to 0), is_block their direction. Repeated
+    transitions in the same direction are collapsed into one run.
+    """
+    occupancy = np.zeros(length + 1, dtype=np.int32)
+    if not len(minutes):
+        return occupancy[:-1] > 0
+
+    minutes = np.clip(minutes, 0, length)
+    changed = np.concatenate(([True], is_block[1:] != is_block[:-1]))
+    minutes, is_block = minutes[changed], is_block[changed]
+
+    starts = minutes[is_block == 1]
+    ends = minutes[is_block == 0]
+    if not is_block[0]:
+        ends = ends[1:]  # the first run was already closed before the period
+    if len(ends) < len(starts):
+        ends = np.append(ends, length)  # still blocked now
+
+    np.add.at(occupancy, starts, 1)
+    np.add.at(occupancy, ends, -1)
+    return np.cumsum(occupancy[:-1]) > 0
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the start indexes and lengths of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+def _bucketize(weekly: np.ndarray, weights: np.ndarray, resolution: int) -> List[Optional[float]]:
+    """Average (weeks, minutes) occupancy into buckets of resolution minutes."""
+    blocked = (weekly * weights).sum(axis=0).reshape(-1, resolution).sum(axis=1)
+    observed = weights.sum(axis=0).reshape(-1, resolution).sum(axis=1)
+    share = np.divide(blocked, observed, out=np.zeros(len(blocked)), where=observed > 0)
+    return [round(float(value), 3) if seen else None for value, seen in zip(share, observed)]
+
+def weekly_heatmap(db_manager, weeks: int = 4, resolution: int = 60, domain: str = None) -> Dict[str, Any]:
+    """
+    Compare actual and scheduled blocking per minute of the week over the last N weeks.
+
+    The period starts on the Monday weeks - 1 weeks before this one and ends
+    now. Minutes are in the scheduler's clock, which is UTC for both
+    engines. Scheduled occupancy comes from today's enabled schedules. Each
+    heatmap bucket is the share of its observed minutes that were blocked;
+    missed minutes were scheduled but not blocked, extra minutes blocked
+    without a schedule. Domains are keyed by domain_key, the name
+    transitions are logged under.
+    """
+    if MINUTES_PER_WEEK % resolution:
+        raise ValueError(f"Resolution must divide {MINUTES_PER_WEEK} minutes")
+
+    now = time.time()
+    clock_now = datetime.fromtimestamp(now, timezone.utc)
+    week_start = (clock_now - timedelta(days=clock_now.weekday())).replace(hour=0, minute=0, second=0,
+                                                                           microsecond=0)
+    period_start = week_start - timedelta(weeks=weeks - 1)
+    start_epoch = period_start.timestamp()
+    length = weeks * MINUTES_PER_WEEK
+    elapsed = int((now - start_epoch) // 60)
+
+    # Minutes of the period that have already happened
+    weights = (np.arange(length) < elapsed).reshape(weeks, MINUTES_PER_WEEK)
+
+    windows: Dict[str, List[Tuple[str, str]]] = {}
+    for schedule in db_manager.get_enabled_schedules():
+        for website in schedule['websites']:
+            windows.setdefault(domain_key(website['url']), []).append((schedule['start_time'], schedule['end_time']))
+
+    rows = db_manager.get_transition_history(int(start_epoch))
+    transitions: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    if rows:
+        urls, epochs, blocks = zip(*rows)
+        urls = np.array(urls, dtype=object)
+        minutes = (np.array(epochs, dtype=np.int64) - int(start_epoch)) // 60
+        blocks = np.array(blocks, dtype=np.int8)
+        # Rows arrive grouped by website, so each group is one contiguous slice
+        bounds = np.flatnonzero(np.concatenate(([True], urls[1:] != urls[:-1]))).tolist() + [len(urls)]
+        for first, last in zip(bounds, bounds[1:]):
+            transitions[urls[first]] = (minutes[first:last], blocks[first:last])
+
+    domains = sorted(set(windows) | set(transitions))
+    if domain:
+        domains = [name for name in domains if name == domain_key(domain)]
+
+    results = []
+    for name in domains:
+        scheduled = np.tile(scheduled_occupancy(windows.get(name, ())), weeks).reshape(weeks, MINUTES_PER_WEEK)
+        actual = actual_occupancy(*transitions.get(name, (np.array([], np.int64), np.array([], np.int8))),
+                                  length).reshape(weeks, MINUTES_PER_WEEK)
+        missed = scheduled & ~actual & weights
+        extra = actual & ~scheduled & weights
+
+        gap_starts, gap_lengths = _runs(missed.ravel())
+        longest = np.argsort(gap_lengths, kind='stable')[::-1][:MAX_GAPS]
+        gaps = [{
+            'start': (period_start + timedelta(minutes=int(gap_starts[i]))).strftime('%Y-%m-%dT%H:%M'),
+            'minutes': int(gap_lengths[i]),
+        } for i in sorted(longest, key=lambda i: gap_starts[i])]
+
+        results.append({
+            'domain': name,
+            'scheduled_minutes': int((scheduled & weights).sum()),
+            'actual_minutes': int((actual & weights).sum()),
+            'missed_minutes': int(missed.sum()),
+            'extra_minutes': int(extra.sum()),
+            'gaps': gaps,
+            'actual': _bucketize(actual, weights, resolution),
+            'scheduled': _bucketize(scheduled, weights, resolution),
+        })
+
+    return {
+        'weeks': weeks,
+        'resolution': resolution,
+        'period_start': period_start.strftime('%Y-%m-%dT%H:%M'),
+        'clock': 'UTC',
+        'domains': results,
+    }
@@ -0,0 +1,75 @@
+"""
+Daily interval helpers for FunTime Scheduler.
+Merges overlapping block windows into disjoint minute-of-day intervals.
+"""
+
+from typing import Iterable, List, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+def to_minutes(hhmm: str) -> int:
+    """Convert an HH:MM string to minutes since midnight."""
+    hour, minute = map(int, hhmm.split(':'))
+    return hour * 60 + minute
+
+def to_hhmm(minutes: int) -> str:
+    """Convert minutes since midnight to an HH:MM string."""
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def split_window(start_time: str, end_time: str) -> List[Tuple[int, int]]:
+    """
+    Turn a daily block window into half-open minute intervals.
+
+    Windows that cross midnight (e.g. 21:00-07:00) are split in two. A window
+    whose start equals its end never fires a net change and is empty.
+    """
+    start = to_minutes(start_time)
+    end = to_minutes(end_time)
+    if start == end:
+        return []
+    if start < end:
+        return [(start, end)]
+    return [(start, MINUTES_PER_DAY), (0, end)]
+
+def merge_windows(windows: Iterable[Tuple[str, str]]) -> List[Tuple[int, int]]:
+    """
+    Merge daily (start_time, end_time) windows into disjoint intervals.
+
+    Returns sorted (block_minute, unblock_minute) pairs. An interval that
+    wraps midnight is returned as a single pair with block > unblock, so each
+    pair is exactly one block and one unblock transition. A day that is fully
+    covered is returned as [(0, MINUTES_PER_DAY)].
+    """
+    intervals = []
+    for start_time, end_time in windows:
+        intervals.extend(split_window(start_time, end_time))
+    if not intervals:
+        return []
+
+    intervals.sort()
+    merged = [list(intervals[0])]
+    for start, end in intervals[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    if merged[0][0] == 0 and merged[-1][1] == MINUTES_PER_DAY:
+        if len(merged) == 1:
+            return [(0, MINUTES_PER_DAY)]
+        # Join the interval running into midnight with the one leaving it
+        first = merged.pop(0)
+        merged[-1][1] = first[1]
+
+    return [(start, end) for start, end in merged]
+
+def is_active(intervals: Iterable[Tuple[int, int]], minute: int) -> bool:
+    """Check whether a minute of the day falls inside any merged interval."""
+    for start, end in intervals:
+        if start < end:
+            if start <= minute < end:
+                return True
+        elif minute >= start or minute < end:
+            return True
+    return False
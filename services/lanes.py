@@ -0,0 +1,91 @@
+"""
+Execution lanes for FunTime Scheduler.
+Separate thread pools per job type, with queue-depth and wait-time stats.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+LANE_TRANSITIONS = 'transitions'
+LANE_MAINTENANCE = 'maintenance'
+LANE_PROBE = 'probe'
+
+class InstrumentedPool:
+    """
+    Thread pool that tracks how long submitted work waits for a worker.
+
+    Exposes the submit/shutdown interface of concurrent.futures executors so
+    it can back both APScheduler executors and the timeline engine.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        """Initialize pool."""
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"lane-{name}")
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """Queue work on this lane."""
+        enqueued_at = time.monotonic()
+        with self._lock:
+            self._queued += 1
+
+        def run():
+            waited = time.monotonic() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+                self._last_wait = waited
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                self.record_failure()
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        try:
+            return self._pool.submit(run)
+        except RuntimeError:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    def record_failure(self):
+        """Count a unit of work that raised, for callers that catch errors before the pool sees them."""
+        with self._lock:
+            self._failed += 1
+
+    def shutdown(self, wait: bool = True):
+        """Shut the underlying pool down."""
+        self._pool.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, failure and wait-time statistics."""
+        with self._lock:
+            started = self._running + self._completed
+            return {
+                'workers': self.max_workers,
+                'queued': self._queued,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'avg_wait_ms': round(self._total_wait / started * 1000, 1) if started else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 1),
+                'last_wait_ms': round(self._last_wait * 1000, 1),
+            }
@@ -0,0 +1,221 @@
+"""
+Cold log archive for FunTime Scheduler.
+Moves old log rows into monthly gzip NDJSON segments that stay queryable.
+"""
+
+import glob
+import gzip
+import json
+import logging
+import mmap
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.models import LogEntry
+
+logger = logging.getLogger(__name__)
+
+# Fields stored per archived row, in LogEntry field order
+ARCHIVE_FIELDS = list(LogEntry.__slots__)
+
+# Compressed bytes handed to the decompressor at a time when reading
+READ_CHUNK = 64 * 1024
+
+def _timestamp(epoch: int) -> str:
+    """Format epoch seconds like the logs' timestamp column."""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class LogArchive:
+    """
+    Append-only monthly segments of archived log rows.
+
+    Each month is a logs-YYYY-MM.ndjson.gz file made of one gzip member per
+    archive batch, so appending never rewrites earlier data and the file is
+    still a plain gzip stream. Next to it, logs-YYYY-MM.idx.json records
+    the byte range, row count, ID range and time range of every member;
+    readers use it to decompress only the members a query needs. A segment
+    is committed by atomically replacing its index, and appending first
+    truncates the file to the committed size, so a crash mid-write leaves
+    nothing behind.
+    """
+
+    def __init__(self, directory: str):
+        """Initialize archive in the given directory."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, month: str) -> str:
+        return os.path.join(self.directory, f"logs-{month}.ndjson.gz")
+
+    def _index_path(self, month: str) -> str:
+        return os.path.join(self.directory, f"logs-{month}.idx.json")
+
+    def _load_index(self, month: str) -> Dict[str, Any]:
+        """Load a segment's index, or an empty one for a new month."""
+        try:
+            with open(self._index_path(month)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'month': month, 'size': 0, 'rows': 0, 'members': []}
+
+    def _save_index(self, month: str, index: Dict[str, Any]):
+        """Commit a segment index by atomically replacing it."""
+        path = self._index_path(month)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _months(self) -> List[str]:
+        """List archived months, oldest first."""
+        pattern = os.path.join(self.directory, 'logs-*.idx.json')
+        return sorted(os.path.basename(path)[5:12] for path in glob.glob(pattern))
+
+    def _append(self, month: str, rows: List[Dict[str, Any]]):
+        """Append rows to a month's segment as one gzip member."""
+        index = self._load_index(month)
+        payload = ''.join(json.dumps([row[field] for field in ARCHIVE_FIELDS]) + '\n' for row in rows)
+        member = gzip.compress(payload.encode('utf-8'))
+
+        path = self._segment_path(month)
+        with open(path, 'ab') as f:
+            # Drop any tail left by a write that was never committed
+            f.truncate(index['size'])
+            f.seek(index['size'])
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+
+        index['members'].append({
+            'offset': index['size'],
+            'length': len(member),
+            'rows': len(rows),
+            'min_id': rows[0]['id'],
+            'max_id': rows[-1]['id'],
+            'first': min(row['timestamp'] for row in rows),
+            'last': max(row['timestamp'] for row in rows),
+        })
+        index['size'] += len(member)
+        index['rows'] += len(rows)
+        self._save_index(month, index)
+
+    def get_max_id(self) -> int:
+        """Get the highest log ID in the archive (0 if empty)."""
+        return max((member['max_id'] for month in self._months()
+                    for member in self._load_index(month)['members']), default=0)
+
+    def archive(self, db_manager, older_than_days: int, batch_size: int = 10000) -> int:
+        """
+        Move log rows older than the given number of days into the archive.
+
+        Rows are appended in ID order, one batch at a time, and deleted from
+        the database only after their segment index is committed. A row
+        whose action is still pending in the outbox has no outcome yet, so
+        archiving stops just before it and resumes there once it settles.
+        Returns the number of rows archived.
+        """
+        cutoff = int(datetime.now(timezone.utc).timestamp()) - older_than_days * 86400
+        archived_through = self.get_max_id()
+        archived = 0
+
+        batch = []
+        for row in db_manager.iter_logs(until=cutoff, after_id=archived_through, batch_size=batch_size):
+            if row.success is None:
+                break
+            batch.append(row)
+            if len(batch) >= batch_size:
+                archived += self._archive_batch(batch)
+                batch = []
+        if batch:
+            archived += self._archive_batch(batch)
+
+        # Also clears rows archived by a run that stopped before deleting them
+        deleted = db_manager.delete_archived_logs(self.get_max_id(), cutoff)
+        if archived:
+            logger.info("Archived %s log rows older than %s days (%s removed from the database)",
+                        archived, older_than_days, deleted)
+        return archived
+
+    def _archive_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """Append one batch, split by month."""
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_month.setdefault(row['timestamp'][:7], []).append(row)
+        for month, month_rows in sorted(by_month.items()):
+            self._append(month, month_rows)
+        return len(rows)
+
+    def iter_logs(self, since: int = None, until: int = None, domain: str = None, action: str = None,
+                  success=None) -> Iterator[LogEntry]:
+        """
+        Stream archived log rows oldest first, with the filters of DatabaseManager.iter_logs.
+
+        Only members whose time range overlaps [since, until) are read. Each
+        is decompressed incrementally from a memory map of its segment, so
+        memory use does not grow with the archive.
+        """
+        since_text = _timestamp(since) if since else None
+        until_text = _timestamp(until) if until else None
+
+        for month in self._months():
+            if until_text and month > until_text[:7]:
+                break
+            if since_text and month < since_text[:7]:
+                continue
+            members = [
+                member for member in self._load_index(month)['members']
+                if not (since_text and member['last'] < since_text)
+                and not (until_text and member['first'] >= until_text)
+            ]
+            if not members:
+                continue
+
+            with open(self._segment_path(month), 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for member in members:
+                    for values in self._read_member(mapped, member):
+                        row = LogEntry(*values)
+                        if since_text and row.timestamp < since_text:
+                            continue
+                        if until_text and row.timestamp >= until_text:
+                            continue
+                        if domain and row.website_url != domain and not row.website_url.endswith('.' + domain):
+                            continue
+                        if action and row.action != action:
+                            continue
+                        if success == 'pending':
+                            if row.success is not None:
+                                continue
+                        elif success is not None and row.success != (1 if success else 0):
+                            continue
+                        yield row
+
+    def _read_member(self, mapped: mmap.mmap, member: Dict[str, Any]) -> Iterator[list]:
+        """Decompress one gzip member chunk by chunk and yield its rows."""
+        decompressor = zlib.decompressobj(wbits=31)
+        pending = b''
+        end = member['offset'] + member['length']
+        for start in range(member['offset'], end, READ_CHUNK):
+            pending += decompressor.decompress(mapped[start:min(start + READ_CHUNK, end)])
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield json.loads(line)
+        pending += decompressor.flush()
+        if pending.strip():
+            yield json.loads(pending)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get segment count, archived rows, bytes on disk and the archived time range."""
+        indexes = [self._load_index(month) for month in self._months()]
+        members = [member for index in indexes for member in index['members']]
+        return {
+            'segments': len(indexes),
+            'rows': sum(index['rows'] for index in indexes),
+            'bytes': sum(index['size'] for index in indexes),
+            'oldest': min((member['first'] for member in members), default=None),
+            'newest': max((member['last'] for member in members), default=None),
+        }
@@ -0,0 +1,100 @@
+"""
+Action log export for FunTime Scheduler.
+Streams log rows as CSV or NDJSON without holding them in memory.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, Mapping
+
+LOG_FIELDS = ['id', 'timestamp', 'website_id', 'website_url', 'action', 'success', 'error_message']
+
+# Flush output once this many characters are buffered
+CHUNK_SIZE = 8192
+
+def _parse_timestamp(value: str) -> int:
+    """Convert a date or ISO datetime (UTC unless it has an offset) to epoch seconds."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def parse_filters(args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Turn export query arguments into DatabaseManager.iter_logs filters.
+
+    Supports since/until (date or ISO datetime, UTC), domain (matches
+    subdomains too), action and success (true, false or pending).
+    Raises ValueError for invalid values.
+    """
+    filters = {}
+    for key in ('since', 'until'):
+        if args.get(key):
+            filters[key] = _parse_timestamp(args[key])
+    if args.get('domain'):
+        filters['domain'] = args['domain'].strip().lower().rstrip('.')
+    if args.get('action'):
+        filters['action'] = args['action'].strip()
+
+    success = args.get('success', '').strip().lower()
+    if success:
+        if success not in ('true', 'false', 'pending'):
+            raise ValueError(f"Invalid success filter: {success}")
+        filters['success'] = {'true': True, 'false': False}.get(success, 'pending')
+    return filters
+
+def _success(value) -> Any:
+    """Map the success column (1, 0 or NULL while pending) to True/False/None."""
+    return None if value is None else bool(value)
+
+def export_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Stream log rows as CSV."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(LOG_FIELDS)
+    for row in rows:
+        success = _success(row['success'])
+        writer.writerow([
+            row['id'],
+            row['timestamp'],
+            row['website_id'] if row['website_id'] is not None else '',
+            row['website_url'],
+            row['action'],
+            '' if success is None else int(success),
+            row['error_message'] or '',
+        ])
+        if buffer.tell() > CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def export_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Stream log rows as newline-delimited JSON, one object per row."""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'website_id': row['website_id'],
+            'website_url': row['website_url'],
+            'action': row['action'],
+            'success': _success(row['success']),
+            'error_message': row['error_message'],
+        }) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size > CHUNK_SIZE:
+            yield ''.join(lines)
+            lines, size = [], 0
+
+    if lines:
+        yield ''.join(lines)
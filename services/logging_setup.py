@@ -0,0 +1,201 @@
+"""
+Logging setup for FunTime Scheduler.
+Routes all records through a queue so callers never block on file or console I/O.
+"""
+
+import atexit
+import copy
+import fcntl
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import time
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+_exception_formatter = logging.Formatter()
+
+class _DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that only merges %-style args in the calling thread.
+
+    The stock handler runs the full formatter (timestamps, tracebacks) before
+    enqueueing; here that work is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Make the record safe to hand to another thread."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class _SharedFileRotation:
+    """
+    Mixin making a rotating file handler safe to share between processes.
+
+    Gunicorn workers each run their own handler on the same file, and the
+    stock handlers assume they are its only writer. Here every write and
+    rotation happens under an exclusive flock on LOG_FILE.lock, and a
+    process whose open file was rotated away by another one reopens the
+    new file before writing, instead of writing to (or rotating again)
+    the old one.
+    """
+
+    _lock_file = None
+    _lock_pid = None
+
+    def emit(self, record: logging.LogRecord):
+        """Write a record, rotating first if needed, while holding the file lock."""
+        # flock is per open file, so each process needs its own lock handle
+        if self._lock_pid != os.getpid():
+            self._lock_file = open(self.baseFilename + '.lock', 'a')
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        """Reopen the log file if another process rotated it."""
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = self._open()
+            self._rotated_elsewhere()
+
+    def _rotated_elsewhere(self):
+        """Hook run after reopening a file rotated by another process."""
+
+class _SharedRotatingFileHandler(_SharedFileRotation, logging.handlers.RotatingFileHandler):
+    """Size-based rotating file handler shared between processes."""
+
+class _SharedTimedRotatingFileHandler(_SharedFileRotation, logging.handlers.TimedRotatingFileHandler):
+    """Time-based rotating file handler shared between processes."""
+
+    def _rotated_elsewhere(self):
+        # This period's rollover already happened; wait for the next one
+        self.rolloverAt = self.computeRollover(int(time.time()))
+
+def _gzip_namer(name: str) -> str:
+    """Name rotated files with a .gz suffix."""
+    return name + '.gz'
+
+def _gzip_rotator(source: str, dest: str):
+    """Compress a rotated log file (runs on the listener thread)."""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+def _build_file_handler(log_file: str) -> logging.Handler:
+    """
+    Create the rotating file handler.
+
+    LOG_ROTATE_WHEN (e.g. 'midnight', 'H') selects time-based rotation,
+    otherwise files rotate at LOG_MAX_BYTES. LOG_COMPRESS gzips rotated files.
+    Several processes (gunicorn workers) may write the same file.
+    """
+    backup_count = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    rotate_when = os.getenv('LOG_ROTATE_WHEN')
+
+    if rotate_when:
+        handler = _SharedTimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8'
+        )
+    else:
+        handler = _SharedRotatingFileHandler(
+            log_file, maxBytes=int(os.getenv('LOG_MAX_BYTES', str(5 * 1024 * 1024))),
+            backupCount=backup_count, encoding='utf-8'
+        )
+
+    if os.getenv('LOG_COMPRESS', 'False').lower() == 'true':
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    return handler
+
+def _start_listener(handlers):
+    """Install a fresh queue on the root handler and start a listener draining it."""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def _restart_after_fork():
+    """
+    Restart the listener thread in a forked child.
+
+    Gunicorn's preload_app forks workers after the app module configured
+    logging; threads do not survive fork, so without this the child's
+    records would pile up in a queue nobody drains.
+    """
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def configure_logging(level: Optional[str] = None, log_file: Optional[str] = None):
+    """
+    Configure non-blocking logging for the application.
+
+    The root logger only gets a QueueHandler; a QueueListener thread writes
+    records to a rotating file and stdout. Settings come from LOG_LEVEL and
+    LOG_FILE unless given explicitly.
+    """
+    global _queue_handler
+
+    level_name = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_level = getattr(logging, level_name, logging.INFO)
+    log_file = log_file or os.getenv('LOG_FILE', 'logs/app.log')
+
+    # Create logs directory if it doesn't exist
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = _build_file_handler(log_file)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    _queue_handler = _DeferredFormatQueueHandler(queue.SimpleQueue())
+    root.addHandler(_queue_handler)
+    root.setLevel(log_level)
+    _start_listener([file_handler, stream_handler])
+
+    # APScheduler logs every job add/run at INFO; keep that out of the hot path
+    if log_level > logging.DEBUG:
+        logging.getLogger('apscheduler').setLevel(logging.WARNING)
+
+    atexit.register(stop_logging)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
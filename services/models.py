@@ -0,0 +1,156 @@
+"""
+Row models for FunTime Scheduler.
+Slotted classes for the rows DatabaseManager returns, with dict-style access
+so existing callers and Jinja templates keep working unchanged.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+class Row:
+    """
+    Base for slotted row models.
+
+    Fields are the class's __slots__, in column order. Rows support both
+    attribute access and the mapping protocol (row['url'], row.get(),
+    keys(), dict(row)); fields a query did not select are None.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a field, or default if the model has no such field."""
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self) -> Tuple[str, ...]:
+        """Get the field names."""
+        return self.__slots__
+
+    def values(self) -> List[Any]:
+        """Get the field values in field order."""
+        return [getattr(self, name) for name in self.__slots__]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Get (field, value) pairs in field order."""
+        return [(name, getattr(self, name)) for name in self.__slots__]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dict (for JSON responses)."""
+        return dict(self.items())
+
+class Schedule(Row):
+    """A schedule row; websites is filled in by the queries that load them."""
+
+    __slots__ = ('id', 'name', 'start_time', 'end_time', 'enabled', 'created_at', 'updated_at', 'websites')
+
+    def __init__(self, id=None, name=None, start_time=None, end_time=None, enabled=None,
+                 created_at=None, updated_at=None, websites=None):
+        """Initialize schedule."""
+        self.id = id
+        self.name = name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.enabled = enabled
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.websites = [] if websites is None else websites
+
+class Website(Row):
+    """A website row, optionally joined with its schedule's name, times and enabled flag."""
+
+    __slots__ = ('id', 'schedule_id', 'url', 'enabled', 'created_at', 'updated_at',
+                 'schedule_name', 'start_time', 'end_time', 'schedule_enabled')
+
+    def __init__(self, id=None, schedule_id=None, url=None, enabled=None, created_at=None, updated_at=None,
+                 schedule_name=None, start_time=None, end_time=None, schedule_enabled=None):
+        """Initialize website."""
+        self.id = id
+        self.schedule_id = schedule_id
+        self.url = url
+        self.enabled = enabled
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.schedule_name = schedule_name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.schedule_enabled = schedule_enabled
+
+class LogEntry(Row):
+    """A log row as exposed by the logs view and the log archive."""
+
+    __slots__ = ('id', 'timestamp', 'website_id', 'website_url', 'action', 'success', 'error_message')
+
+    def __init__(self, id=None, timestamp=None, website_id=None, website_url=None, action=None,
+                 success=None, error_message=None):
+        """Initialize log entry."""
+        self.id = id
+        self.timestamp = timestamp
+        self.website_id = website_id
+        self.website_url = website_url
+        self.action = action
+        self.success = success
+        self.error_message = error_message
+
+def _compile(model, description) -> Callable[[tuple], Row]:
+    """Build the constructor for one query shape (cursor.description) of a model."""
+    columns = [column[0] for column in description]
+    unknown = [name for name in columns if name not in model.__slots__]
+    if unknown:
+        raise ValueError(f"{model.__name__} has no field(s) {', '.join(unknown)}")
+
+    if list(model.__slots__[:len(columns)]) == columns:
+        # Columns are the model's leading fields in order: pass the row straight through
+        return lambda row: model(*row)
+
+    positions = {name: index for index, name in enumerate(columns)}
+    order = [positions.get(name) for name in model.__slots__]
+    return lambda row: model(*[None if index is None else row[index] for index in order])
+
+def row_factory(model) -> Callable[[Any, tuple], Row]:
+    """
+    Make a sqlite3 row_factory that returns instances of a row model.
+
+    The column-to-field mapping is worked out once per query shape, the
+    first time a cursor's description is seen, instead of for every row.
+    Queries that select the model's fields in order take the fast path.
+    """
+    state: List[Optional[tuple]] = [None]
+
+    def factory(cursor, row):
+        description = cursor.description
+        current = state[0]
+        if current is None or current[0] is not description:
+            current = (description, _compile(model, description))
+            state[0] = current
+        return current[1](row)
+
+    return factory
@@ -0,0 +1,123 @@
+"""
+AdGuard rule compiler for FunTime Scheduler.
+Minimizes ||domain^ blocking rules with a reversed-label domain trie.
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# Comment rules delimiting the section of the user rules this app owns
+SECTION_BEGIN = '! funtime:begin'
+SECTION_END = '! funtime:end'
+
+# Plain domain blocking rule without modifiers, e.g. ||example.com^
+_BLOCK_RULE_RE = re.compile(r'^\|\|([A-Za-z0-9.-]+)\^$')
+
+_TERMINAL = ''
+
+def block_rule(domain: str) -> str:
+    """Build the AdGuard blocking rule for a domain."""
+    return f"||{domain}^"
+
+def parse_block_rule(rule: str) -> Optional[str]:
+    """
+    Extract the normalized domain from a plain ||domain^ rule.
+
+    Returns None for comments, allowlist rules and rules with modifiers,
+    which the compiler always passes through untouched.
+    """
+    match = _BLOCK_RULE_RE.match(rule.strip())
+    if not match:
+        return None
+    domain = match.group(1).lower().rstrip('.')
+    return domain or None
+
+class DomainTrie:
+    """
+    Set of domains stored by reversed labels (com -> example -> www).
+
+    A blocked node covers every domain below it, so coverage checks walk at
+    most one path from the TLD down.
+    """
+
+    def __init__(self, domains: Iterable[str] = ()):
+        """Initialize the trie with an optional set of domains."""
+        self._root = {}
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain: str):
+        """Add a normalized domain."""
+        node = self._root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        node[_TERMINAL] = True
+
+    def covering_domain(self, domain: str) -> Optional[str]:
+        """Return the shortest stored domain equal to or above this one, if any."""
+        node = self._root
+        labels = domain.split('.')
+        for depth, label in enumerate(reversed(labels), start=1):
+            node = node.get(label)
+            if node is None:
+                return None
+            if _TERMINAL in node:
+                return '.'.join(labels[-depth:])
+        return None
+
+    def covers(self, domain: str) -> bool:
+        """Check whether the domain or one of its parents is stored."""
+        return self.covering_domain(domain) is not None
+
+    def has_parent(self, domain: str) -> bool:
+        """Check whether a strict parent of the domain is stored."""
+        covering = self.covering_domain(domain)
+        return covering is not None and covering != domain
+
+def compile_rules(rules: Iterable[str]) -> Tuple[List[str], int]:
+    """
+    Minimize a user rule list.
+
+    Plain ||domain^ rules are normalized (case, trailing dot), deduplicated
+    and dropped when a parent domain is already blocked. Every other rule is
+    kept in its original position. Returns the compiled rules and the number
+    of rules removed.
+    """
+    rules = list(rules)
+    parsed = [parse_block_rule(rule) for rule in rules]
+    trie = DomainTrie(domain for domain in parsed if domain)
+
+    compiled = []
+    seen = set()
+    removed = 0
+    for rule, domain in zip(rules, parsed):
+        if domain is None:
+            compiled.append(rule)
+        elif domain in seen or trie.has_parent(domain):
+            removed += 1
+        else:
+            seen.add(domain)
+            compiled.append(block_rule(domain))
+
+    return compiled, removed
+
+def split_managed_section(rules: List[str]) -> Optional[Tuple[List[str], List[str], List[str]]]:
+    """
+    Split user rules into (before, managed, after) around the managed section.
+
+    Returns None if the section does not exist yet. A begin marker without an
+    end marker claims the rest of the list.
+    """
+    try:
+        begin = rules.index(SECTION_BEGIN)
+    except ValueError:
+        return None
+    try:
+        end = rules.index(SECTION_END, begin + 1)
+    except ValueError:
+        end = len(rules)
+    return rules[:begin], rules[begin + 1:end], rules[end + 1:]
+
+def join_managed_section(before: List[str], managed: List[str], after: List[str]) -> List[str]:
+    """Rebuild the full user rule list around a managed section."""
+    return before + [SECTION_BEGIN] + managed + [SECTION_END] + after
@@ -0,0 +1,165 @@
+"""
+Bulk schedule import/export for FunTime Scheduler.
+Parses and produces JSON and CSV schedule documents.
+"""
+
+import csv
+import io
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from services.domain_utils import normalize_domain, is_valid_time
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ['name', 'start_time', 'end_time', 'enabled', 'url']
+
+def _parse_bool(value: Any) -> bool:
+    """Interpret the enabled flag from JSON or CSV input."""
+    if isinstance(value, bool):
+        return value
+    if value is None or value == '':
+        return True
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _validate_schedules(raw_schedules: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate raw schedules and normalize their domains."""
+    schedules = []
+    errors = []
+
+    for index, raw in enumerate(raw_schedules, start=1):
+        name = str(raw.get('name') or '').strip()
+        start_time = str(raw.get('start_time') or '').strip()
+        end_time = str(raw.get('end_time') or '').strip()
+
+        if not name:
+            errors.append(f"Schedule {index}: name is required")
+            continue
+        if not is_valid_time(start_time) or not is_valid_time(end_time):
+            errors.append(f"Schedule '{name}': start_time and end_time must be HH:MM")
+            continue
+
+        websites = []
+        seen = set()
+        for url in raw.get('websites') or []:
+            domain = normalize_domain(str(url))
+            if domain is None:
+                errors.append(f"Schedule '{name}': invalid website '{url}'")
+            elif domain not in seen:
+                seen.add(domain)
+                websites.append(domain)
+
+        if not websites:
+            errors.append(f"Schedule '{name}': at least one valid website is required")
+            continue
+
+        schedules.append({
+            'name': name,
+            'start_time': start_time,
+            'end_time': end_time,
+            'enabled': _parse_bool(raw.get('enabled')),
+            'websites': websites,
+        })
+
+    return schedules, errors
+
+def parse_json(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Parse a JSON schedule document.
+
+    Accepts either a list of schedules or an object with a "schedules" list.
+    Returns the valid, normalized schedules and a list of error messages.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        return [], [f"Invalid JSON: {e}"]
+
+    if isinstance(data, dict):
+        data = data.get('schedules', [])
+    if not isinstance(data, list):
+        return [], ["JSON document must be a list of schedules"]
+
+    return _validate_schedules(item for item in data if isinstance(item, dict))
+
+def parse_csv(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Parse a CSV schedule document with one website per row.
+
+    Rows sharing the same name, start_time and end_time are grouped into one
+    schedule. Returns the valid, normalized schedules and a list of errors.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [field for field in ('name', 'start_time', 'end_time', 'url') if field not in (reader.fieldnames or [])]
+    if missing:
+        return [], [f"CSV is missing columns: {', '.join(missing)}"]
+
+    grouped: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for row in reader:
+        key = ((row.get('name') or '').strip(), (row.get('start_time') or '').strip(), (row.get('end_time') or '').strip())
+        schedule = grouped.setdefault(key, {
+            'name': key[0],
+            'start_time': key[1],
+            'end_time': key[2],
+            'enabled': row.get('enabled'),
+            'websites': [],
+        })
+        if row.get('url'):
+            schedule['websites'].append(row['url'])
+
+    return _validate_schedules(grouped.values())
+
+def export_json(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Stream schedules as a JSON document.
+
+    Expects rows ordered by schedule_id (see DatabaseManager.iter_schedule_rows)
+    and yields one chunk per schedule.
+    """
+    yield '{"schedules": ['
+    current = None
+    first = True
+    for row in rows:
+        if current is None or current['id'] != row['schedule_id']:
+            if current is not None:
+                yield ('' if first else ',') + json.dumps(_public_schedule(current))
+                first = False
+            current = {
+                'id': row['schedule_id'],
+                'name': row['name'],
+                'start_time': row['start_time'],
+                'end_time': row['end_time'],
+                'enabled': bool(row['enabled']),
+                'websites': [],
+            }
+        if row['url']:
+            current['websites'].append(row['url'])
+    if current is not None:
+        yield ('' if first else ',') + json.dumps(_public_schedule(current))
+    yield ']}'
+
+def _public_schedule(schedule: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop internal fields so exports can be re-imported as-is."""
+    return {key: value for key, value in schedule.items() if key != 'id'}
+
+def export_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Stream schedules as CSV with one website per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(CSV_FIELDS)
+    for row in rows:
+        writer.writerow([
+            row['name'],
+            row['start_time'],
+            row['end_time'],
+            1 if row['enabled'] else 0,
+            row['url'] or '',
+        ])
+        if buffer.tell() > 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
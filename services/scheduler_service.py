@@ -4,41 +4,145 @@ Manages APScheduler jobs for website blocking/unblocking.
 """
 
 import logging
-from datetime import datetime, time
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.executors.pool import BasePoolExecutor
 from apscheduler.jobstores.memory import MemoryJobStore
 
+from services.circuit_breaker import CircuitOpenError, STATE_CLOSED
+from services.domain_utils import domain_key, normalize_domain
+from services.intervals import MINUTES_PER_DAY, is_active, merge_windows, split_window, to_hhmm
+from services.log_archive import LogArchive
+from services.lanes import InstrumentedPool, LANE_MAINTENANCE, LANE_PROBE, LANE_TRANSITIONS
+from services.timer_engine import DailyTrigger, TimelineScheduler
+from services.timer_engine import IntervalTrigger as TimelineIntervalTrigger
+from services.write_behind import FlushTicket, WriteBehindBuffer
+
 logger = logging.getLogger(__name__)
 
+# Executor alias per lane; transitions run on the engine's default executor
+LANE_EXECUTORS = {
+    LANE_TRANSITIONS: 'default',
+    LANE_MAINTENANCE: LANE_MAINTENANCE,
+    LANE_PROBE: LANE_PROBE,
+}
+
+class _LaneExecutor(BasePoolExecutor):
+    """
+    APScheduler executor backed by an instrumented lane pool.
+    
+    APScheduler's run_job catches job exceptions and reports them as
+    events, so the pool never sees them raise; count them here instead.
+    """
+    
+    def __init__(self, pool: InstrumentedPool):
+        """Initialize executor."""
+        super().__init__(pool)
+    
+    def _run_job_success(self, job_id, events):
+        for event in events:
+            if event.exception is not None:
+                self._pool.record_failure()
+        super()._run_job_success(job_id, events)
+    
+    def _run_job_error(self, job_id, exc, traceback=None):
+        self._pool.record_failure()
+        super()._run_job_error(job_id, exc, traceback)
+
 class SchedulerService:
     """Manages scheduled website blocking/unblocking."""
     
-    def __init__(self, database_manager, adguard_api):
-        """Initialize scheduler service."""
+    def __init__(self, database_manager, adguard_api, engine: str = None):
+        """
+        Initialize scheduler service.
+        
+        engine selects the job engine: 'apscheduler' (default) or 'timeline'
+        for the lightweight minute-of-day timer in services/timer_engine.py.
+        Both fire schedule times in UTC.
+        """
         self.db_manager = database_manager
         self.adguard_api = adguard_api
+        self.engine = (engine or os.getenv('SCHEDULER_ENGINE', 'apscheduler')).lower()
         
-        # Configure scheduler
-        jobstores = {
-            'default': MemoryJobStore()
-        }
-        executors = {
-            'default': ThreadPoolExecutor(max_workers=2)
-        }
-        job_defaults = {
-            'coalesce': True,
-            'max_instances': 1,
-            'misfire_grace_time': 30
+        # Separate pools so block/unblock transitions never queue behind
+        # housekeeping or slow health checks
+        self.lanes = {
+            LANE_TRANSITIONS: InstrumentedPool(LANE_TRANSITIONS, int(os.getenv('SCHEDULER_TRANSITION_WORKERS', '2'))),
+            LANE_MAINTENANCE: InstrumentedPool(LANE_MAINTENANCE, int(os.getenv('SCHEDULER_MAINTENANCE_WORKERS', '1'))),
+            LANE_PROBE: InstrumentedPool(LANE_PROBE, int(os.getenv('SCHEDULER_PROBE_WORKERS', '1'))),
         }
         
-        self.scheduler = BackgroundScheduler(
-            jobstores=jobstores,
-            executors=executors,
-            job_defaults=job_defaults,
-            timezone='UTC'  # Use UTC for consistency
+        if self.engine == 'timeline':
+            self.scheduler = TimelineScheduler(
+                misfire_grace_time=30,
+                executors={LANE_EXECUTORS[lane]: pool for lane, pool in self.lanes.items()}
+            )
+        else:
+            # Configure scheduler
+            jobstores = {
+                'default': MemoryJobStore()
+            }
+            executors = {LANE_EXECUTORS[lane]: _LaneExecutor(pool) for lane, pool in self.lanes.items()}
+            job_defaults = {
+                'coalesce': True,
+                'max_instances': 1,
+                'misfire_grace_time': 30
+            }
+            
+            self.scheduler = BackgroundScheduler(
+                jobstores=jobstores,
+                executors=executors,
+                job_defaults=job_defaults,
+                timezone='UTC'  # Use UTC for consistency
+            )
+        
+        # Shared daily triggers keyed by HH:MM
+        self._triggers = {}
+        
+        # Registered windows and their per-domain merged intervals
+        self._lock = threading.RLock()
+        self._websites = {}          # website_id -> (domain, start_time, end_time)
+        self._domain_sites = {}      # domain -> set of website_ids
+        self._domain_intervals = {}  # domain -> merged [(block_minute, unblock_minute)]
+        
+        # Outbox dispatcher state
+        self.outbox_batch_size = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+        self.outbox_interval = int(os.getenv('OUTBOX_DISPATCH_INTERVAL', '15'))
+        self.outbox_max_attempts = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+        self.log_retention_days = int(os.getenv('LOG_RETENTION_DAYS', '30'))
+        
+        # Archive log rows older than this many days instead of dropping them (0 = off)
+        self.log_archive_days = min(int(os.getenv('LOG_ARCHIVE_DAYS', '0')), self.log_retention_days)
+        self.log_archive = None
+        if self.log_archive_days > 0:
+            self.log_archive = LogArchive(os.getenv(
+                'LOG_ARCHIVE_DIR', os.path.join(os.path.dirname(self.db_manager.db_path) or '.', 'archive')
+            ))
+        self.health_interval = int(os.getenv('ADGUARD_HEALTH_INTERVAL', '30'))
+        self.health_jitter = int(os.getenv('ADGUARD_HEALTH_JITTER', '5'))
+        
+        # Pre-warm AdGuard this many seconds before each transition minute
+        self.prewarm_seconds = int(os.getenv('ADGUARD_PREWARM_SECONDS', '5'))
+        self._transition_counts = {}  # minute of day -> transition jobs firing then
+        self._dispatch_lock = threading.Lock()
+        self._dispatch_requested = threading.Event()
+        self._unavailable_passes = 0  # consecutive dispatch passes that found AdGuard down
+        self.adguard_api.circuit.add_listener(self._on_adguard_circuit_change)
+        
+        # Write-behind buffers coalescing rapid admin changes
+        write_behind_delay = int(os.getenv('WRITE_BEHIND_DELAY_MS', '500')) / 1000
+        self._schedule_buffer = WriteBehindBuffer(
+            self._apply_schedule_changes, write_behind_delay, name='schedule-write-behind'
+        )
+        # The timer thread only hands the drain over; AdGuard calls stay on the transitions lane
+        self._dispatch_buffer = WriteBehindBuffer(
+            lambda actions: self._dispatch_in_background(), write_behind_delay, name='adguard-write-behind'
         )
         
         self._running = False
@@ -48,23 +152,76 @@ class SchedulerService:
         """Start the scheduler and load existing schedules."""
         try:
             if not self._running:
+                # Load existing enabled websites before starting so the engine
+                # registers them as one batch instead of waking the scheduler
+                # thread for every add_job call
+                self._load_existing_schedules()
+                
+                # One-time move of rules for known websites into the managed
+                # AdGuard rule section; runs off the startup path
+                self.adguard_api.set_legacy_domains(
+                    normalize_domain(website['url']) for website in self.db_manager.get_all_websites()
+                )
+                self.scheduler.add_job(
+                    func=self.adguard_api.migrate_managed_rules,
+                    id='managed_rules_migration',
+                    name='Migrate AdGuard rules into the managed section',
+                    executor=LANE_EXECUTORS[LANE_PROBE],
+                    replace_existing=True
+                )
+                
+                # Periodically retry outbox actions that could not be delivered
+                self.scheduler.add_job(
+                    func=self._dispatch_outbox,
+                    trigger=self._interval_trigger(self.outbox_interval),
+                    id='outbox_dispatch',
+                    name='Dispatch AdGuard outbox',
+                    executor=LANE_EXECUTORS[LANE_MAINTENANCE],
+                    replace_existing=True
+                )
+                
+                # Background AdGuard health checks: once now, then every interval
+                self.scheduler.add_job(
+                    func=self.adguard_api.probe_health,
+                    id='adguard_health_now',
+                    name='Check AdGuard health',
+                    executor=LANE_EXECUTORS[LANE_PROBE],
+                    replace_existing=True
+                )
+                self.scheduler.add_job(
+                    func=self.adguard_api.probe_health,
+                    trigger=self._interval_trigger(self.health_interval, self.health_jitter),
+                    id='adguard_health',
+                    name='Check AdGuard health',
+                    executor=LANE_EXECUTORS[LANE_PROBE],
+                    replace_existing=True
+                )
+                
+                # Nightly log archival and retention
+                self.scheduler.add_job(
+                    func=self._maintain_logs,
+                    trigger=self._get_trigger('03:30'),
+                    id='log_cleanup',
+                    name='Clean up old logs',
+                    executor=LANE_EXECUTORS[LANE_MAINTENANCE],
+                    replace_existing=True
+                )
+                
                 self.scheduler.start()
                 self._running = True
                 logger.info("Scheduler started")
-                
-                # Load existing enabled websites
-                self._load_existing_schedules()
             else:
                 logger.warning("Scheduler is already running")
                 
         except Exception as e:
-            logger.error(f"Error starting scheduler: {e}")
+            logger.error("Error starting scheduler: %s", e)
             raise
     
     def stop(self):
         """Stop the scheduler."""
         try:
             if self._running:
+                self.flush_pending()
                 self.scheduler.shutdown(wait=False)
                 self._running = False
                 logger.info("Scheduler stopped")
@@ -72,7 +229,7 @@ class SchedulerService:
                 logger.warning("Scheduler is not running")
                 
         except Exception as e:
-            logger.error(f"Error stopping scheduler: {e}")
+            logger.error("Error stopping scheduler: %s", e)
     
     def is_running(self) -> bool:
         """Check if scheduler is running."""
@@ -82,149 +239,608 @@ class SchedulerService:
         """Load and schedule all enabled websites from database."""
         try:
             websites = self.db_manager.get_enabled_websites()
-            for website in websites:
-                self.schedule_website(
-                    website['id'],
-                    website['url'],
-                    website['start_time'],
-                    website['end_time']
-                )
-            logger.info(f"Loaded {len(websites)} existing schedules")
+            scheduled = self.schedule_many(websites)
+            logger.info("Loaded %s existing schedules", scheduled)
             
         except Exception as e:
-            logger.error(f"Error loading existing schedules: {e}")
+            logger.error("Error loading existing schedules: %s", e)
     
-    def schedule_website(self, website_id: int, url: str, start_time: str, end_time: str):
-        """Schedule blocking and unblocking for a website."""
-        try:
-            # Parse time strings (expected format: HH:MM)
-            start_hour, start_minute = map(int, start_time.split(':'))
-            end_hour, end_minute = map(int, end_time.split(':'))
+    def _get_trigger(self, hhmm: str):
+        """
+        Get the daily trigger for an HH:MM (or HH:MM:SS) time.
+        
+        Triggers are stateless once built, so one instance is shared by
+        every job firing at the same time instead of building one per job.
+        """
+        trigger = self._triggers.get(hhmm)
+        if trigger is None:
+            hour, minute, second = (list(map(int, hhmm.split(':'))) + [0])[:3]
+            if self.engine == 'timeline':
+                trigger = DailyTrigger(hour, minute, second)
+            else:
+                # Without an explicit zone CronTrigger uses the host's, not the scheduler's
+                trigger = CronTrigger(hour=hour, minute=minute, second=second, timezone=timezone.utc)
+            self._triggers[hhmm] = trigger
+        return trigger
+    
+    def _interval_trigger(self, seconds: int, jitter: int = 0):
+        """Get a trigger that fires every given number of seconds, give or take jitter."""
+        if self.engine == 'timeline':
+            return TimelineIntervalTrigger(seconds, jitter)
+        return IntervalTrigger(seconds=seconds, jitter=jitter or None)
+    
+    def _register_website(self, website_id: int, url: str, start_time: str, end_time: str) -> set:
+        """Record a website's window and return the domains whose jobs must be recompiled."""
+        domain = domain_key(url)
+        affected = self._unregister_website(website_id)
+        
+        # Validate times up front so a bad row never reaches the compiler
+        split_window(start_time, end_time)
+        
+        self._websites[website_id] = (domain, start_time, end_time)
+        self._domain_sites.setdefault(domain, set()).add(website_id)
+        affected.add(domain)
+        return affected
+    
+    def _unregister_website(self, website_id: int) -> set:
+        """Forget a website's window and return the domain it belonged to."""
+        entry = self._websites.pop(website_id, None)
+        if entry is None:
+            return set()
+        
+        domain = entry[0]
+        sites = self._domain_sites.get(domain)
+        if sites is not None:
+            sites.discard(website_id)
+            if not sites:
+                del self._domain_sites[domain]
+        return {domain}
+    
+    def _compile_domain(self, domain: str) -> int:
+        """
+        Merge every registered window for a domain and sync its jobs.
+        
+        Only the merged block/unblock boundaries are scheduled, so a domain
+        listed in several overlapping schedules gets one transition pair per
+        disjoint interval. Returns the number of jobs added, moved or removed.
+        """
+        windows = [self._websites[website_id][1:] for website_id in self._domain_sites.get(domain, ())]
+        merged = merge_windows(windows)
+        previous = self._domain_intervals.get(domain, [])
+        if merged == previous:
+            return 0
+        
+        changes = 0
+        for index, (block_minute, unblock_minute) in enumerate(merged):
+            old_block, old_unblock = previous[index] if index < len(previous) else (None, None)
+            if old_block is not None and old_unblock - old_block == MINUTES_PER_DAY:
+                old_unblock = None  # a fully covered day had no unblock job
             
-            # Create job IDs
-            block_job_id = f"block_{website_id}"
-            unblock_job_id = f"unblock_{website_id}"
+            changes += self._sync_transition_job(
+                f"block_{domain}_{index}", self._block_domain, domain, block_minute, old_block, f"Block {domain}"
+            )
             
-            # Remove existing jobs if they exist
-            self.remove_website_schedule(website_id)
+            # A fully covered day has no unblock boundary
+            unblock_job_id = f"unblock_{domain}_{index}"
+            if unblock_minute - block_minute == MINUTES_PER_DAY:
+                if old_unblock is not None:
+                    self.scheduler.remove_job(unblock_job_id)
+                    changes += 1
+                continue
             
-            # Schedule blocking job
-            self.scheduler.add_job(
-                func=self._block_website,
-                trigger=CronTrigger(hour=start_hour, minute=start_minute),
-                args=[website_id, url],
-                id=block_job_id,
-                name=f"Block {url}",
-                replace_existing=True
+            changes += self._sync_transition_job(
+                unblock_job_id, self._unblock_domain, domain, unblock_minute, old_unblock, f"Unblock {domain}"
             )
-            
-            # Schedule unblocking job
+        
+        # Drop jobs for intervals that no longer exist
+        for index in range(len(merged), len(previous)):
+            for job_id in (f"block_{domain}_{index}", f"unblock_{domain}_{index}"):
+                if self.scheduler.get_job(job_id) is not None:
+                    self.scheduler.remove_job(job_id)
+                    changes += 1
+        
+        self._track_transitions(previous, merged)
+        if merged:
+            self._domain_intervals[domain] = merged
+        else:
+            self._domain_intervals.pop(domain, None)
+        return changes
+    
+    def _sync_transition_job(self, job_id: str, func, domain: str, minute: int, old_minute, name: str) -> int:
+        """
+        Point a transition job at a minute, touching it only if it moved.
+        
+        An existing job is moved in place with reschedule_job/modify_job
+        rather than being replaced. Returns the number of jobs changed.
+        """
+        if minute == old_minute:
+            return 0
+        
+        trigger = self._get_trigger(to_hhmm(minute))
+        if old_minute is not None:
+            self.scheduler.reschedule_job(job_id, trigger=trigger)
+            self.scheduler.modify_job(job_id, args=[domain, minute])
+        else:
             self.scheduler.add_job(
-                func=self._unblock_website,
-                trigger=CronTrigger(hour=end_hour, minute=end_minute),
-                args=[website_id, url],
-                id=unblock_job_id,
-                name=f"Unblock {url}",
+                func=func,
+                trigger=trigger,
+                args=[domain, minute],
+                id=job_id,
+                name=name,
+                executor=LANE_EXECUTORS[LANE_TRANSITIONS],
                 replace_existing=True
             )
-            
-            logger.info(f"Scheduled {url}: block at {start_time}, unblock at {end_time}")
+        return 1
+    
+    @staticmethod
+    def _transition_minutes(intervals: list) -> list:
+        """Get the minutes of day at which a domain's merged intervals have jobs."""
+        minutes = []
+        for block_minute, unblock_minute in intervals:
+            minutes.append(block_minute)
+            if unblock_minute - block_minute != MINUTES_PER_DAY:
+                minutes.append(unblock_minute)
+        return minutes
+    
+    def _track_transitions(self, previous: list, merged: list):
+        """
+        Keep one pre-warm job per minute that has transitions (lock held).
+        
+        Transition jobs are reference-counted per minute; the pre-warm job for
+        a minute is added with its first transition and removed with its last.
+        """
+        if self.prewarm_seconds <= 0:
+            return
+        
+        for minute in self._transition_minutes(previous):
+            self._transition_counts[minute] -= 1
+            if not self._transition_counts[minute]:
+                del self._transition_counts[minute]
+                job_id = f"prewarm_{to_hhmm(minute)}"
+                if self.scheduler.get_job(job_id) is not None:
+                    self.scheduler.remove_job(job_id)
+        
+        for minute in self._transition_minutes(merged):
+            self._transition_counts[minute] = self._transition_counts.get(minute, 0) + 1
+            if self._transition_counts[minute] == 1:
+                offset = (minute * 60 - self.prewarm_seconds) % (MINUTES_PER_DAY * 60)
+                self.scheduler.add_job(
+                    func=self._prewarm,
+                    trigger=self._get_trigger(f"{offset // 3600:02d}:{offset // 60 % 60:02d}:{offset % 60:02d}"),
+                    id=f"prewarm_{to_hhmm(minute)}",
+                    name=f"Pre-warm AdGuard for {to_hhmm(minute)}",
+                    executor=LANE_EXECUTORS[LANE_PROBE],
+                    replace_existing=True
+                )
+    
+    def _maintain_logs(self):
+        """Archive old log rows if archiving is on, then apply retention (called by scheduler)."""
+        if self.log_archive is None:
+            self.db_manager.cleanup_old_logs(self.log_retention_days)
+            return
+        archived_through = 0
+        try:
+            self.log_archive.archive(self.db_manager, self.log_archive_days)
+            archived_through = self.log_archive.get_max_id()
+        except (OSError, ValueError) as e:
+            logger.error("Error archiving logs: %s", e)
+        # Retention never removes rows the archive does not hold
+        self.db_manager.cleanup_old_logs(self.log_retention_days, archived_through=archived_through)
+    
+    def _prewarm(self):
+        """Open the AdGuard connection ahead of a transition."""
+        if not self.adguard_api.prewarm():
+            logger.debug("AdGuard pre-warm skipped or failed")
+    
+    def schedule_website(self, website_id: int, url: str, start_time: str, end_time: str):
+        """Schedule blocking and unblocking for a website."""
+        try:
+            with self._lock:
+                for domain in self._register_website(website_id, url, start_time, end_time):
+                    self._compile_domain(domain)
+            logger.info("Scheduled %s: block at %s, unblock at %s", url, start_time, end_time)
             
         except Exception as e:
-            logger.error(f"Error scheduling website {url}: {e}")
+            logger.error("Error scheduling website %s: %s", url, e)
             raise
     
-    def remove_website_schedule(self, website_id: int):
-        """Remove all scheduled jobs for a website."""
-        try:
-            block_job_id = f"block_{website_id}"
-            unblock_job_id = f"unblock_{website_id}"
-            
-            # Remove jobs if they exist
-            for job_id in [block_job_id, unblock_job_id]:
+    def schedule_many(self, websites: list) -> int:
+        """
+        Schedule blocking and unblocking for many websites in one call.
+        
+        Each website is a dict with id, url, start_time and end_time. Windows
+        are registered first and every affected domain is compiled once.
+        Returns the number of websites scheduled.
+        """
+        scheduled = 0
+        failed = []
+        with self._lock:
+            affected = set()
+            for website in websites:
                 try:
-                    self.scheduler.remove_job(job_id)
-                    logger.debug(f"Removed job: {job_id}")
-                except Exception:
-                    # Job doesn't exist, ignore
-                    pass
-            
-            logger.info(f"Removed schedule for website ID: {website_id}")
+                    affected |= self._register_website(
+                        website['id'], website['url'], website['start_time'], website['end_time']
+                    )
+                    scheduled += 1
+                except Exception as e:
+                    failed.append(f"{website.get('url')} ({e})")
             
-        except Exception as e:
-            logger.error(f"Error removing schedule for website {website_id}: {e}")
+            changes = sum(self._compile_domain(domain) for domain in affected)
+        
+        if failed:
+            logger.error("Failed to schedule %s websites: %s", len(failed), ', '.join(failed[:10]))
+        logger.info("Scheduled %s of %s websites (%s domains, %s job changes)",
+                    scheduled, len(websites), len(affected), changes)
+        return scheduled
     
-    def _block_website(self, website_id: int, url: str):
-        """Block a website (called by scheduler)."""
+    def unschedule_many(self, website_ids: list) -> int:
+        """
+        Remove many websites from the schedule in one call.
+        
+        Domains still covered by other websites keep their (recompiled) jobs.
+        Returns the number of jobs added or removed.
+        """
+        changes = 0
         try:
-            logger.info(f"Attempting to block website: {url}")
-            
-            success = self.adguard_api.block_domain(url)
+            with self._lock:
+                affected = set()
+                for website_id in website_ids:
+                    affected |= self._unregister_website(website_id)
+                changes = sum(self._compile_domain(domain) for domain in affected)
             
-            # Log the action
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='block',
-                success=success,
-                error_message=None if success else "Failed to block domain"
-            )
+            logger.debug("Unscheduled %s websites (%s job changes)", len(website_ids), changes)
             
-            if success:
-                logger.info(f"Successfully blocked website: {url}")
-            else:
-                logger.error(f"Failed to block website: {url}")
-                
         except Exception as e:
-            error_msg = f"Error blocking website {url}: {e}"
-            logger.error(error_msg)
+            logger.error("Error removing schedules for websites %s: %s", website_ids, e)
+        
+        return changes
+    
+    def remove_website_schedule(self, website_id: int):
+        """Remove all scheduled jobs for a website."""
+        self.unschedule_many([website_id])
+        logger.info("Removed schedule for website ID: %s", website_id)
+    
+    def queue_schedule_website(self, website_id: int, url: str, start_time: str, end_time: str) -> FlushTicket:
+        """
+        Buffer a (re)schedule of a website for the write-behind window.
+        
+        Changes to the same website within the window are merged, the latest
+        winning. Wait on the returned ticket when read-your-writes matters.
+        """
+        website = {'id': website_id, 'url': url, 'start_time': start_time, 'end_time': end_time}
+        return self._schedule_buffer.submit(website_id, website)
+    
+    def queue_remove_website_schedule(self, website_id: int) -> FlushTicket:
+        """Buffer removal of a website's jobs for the write-behind window."""
+        return self._schedule_buffer.submit(website_id, None)
+    
+    def queue_schedule_diff(self, diff: Dict[str, Any]):
+        """
+        Buffer the job changes for an edited schedule (see update_schedule).
+        
+        Only websites the edit affected are touched: removed websites lose
+        their jobs, added ones gain theirs, and kept websites are rescheduled
+        only when the schedule's times or enabled flag changed. Returns the
+        ticket of the last change, or None if nothing needed to change.
+        """
+        ticket = None
+        for website_id in diff['removed']:
+            ticket = self.queue_remove_website_schedule(website_id)
+        
+        changed = list(diff['added'])
+        if diff['times_changed'] or diff['enabled_changed']:
+            changed += diff['kept']
+        for website in changed:
+            if diff['enabled'] and website['enabled']:
+                ticket = self.queue_schedule_website(
+                    website['id'], website['url'], diff['start_time'], diff['end_time']
+                )
+            else:
+                ticket = self.queue_remove_website_schedule(website['id'])
+        return ticket
+    
+    def flush_pending(self):
+        """Apply buffered schedule changes and hand buffered manual actions to the transitions lane now."""
+        self._schedule_buffer.flush()
+        self._dispatch_buffer.flush()
+    
+    def _apply_schedule_changes(self, changes: Dict[int, Any]):
+        """Apply one coalesced batch of buffered schedule changes."""
+        removed = [website_id for website_id, website in changes.items() if website is None]
+        scheduled = [website for website in changes.values() if website is not None]
+        if removed:
+            self.unschedule_many(removed)
+        if scheduled:
+            self.schedule_many(scheduled)
+    
+    def get_domain_intervals(self) -> Dict[str, list]:
+        """Get the merged block intervals per domain as (start, end) HH:MM pairs."""
+        with self._lock:
+            return {
+                domain: [(to_hhmm(start), to_hhmm(end)) for start, end in intervals]
+                for domain, intervals in self._domain_intervals.items()
+            }
+    
+    def _domain_website_id(self, domain: str):
+        """Pick the website ID that transition logs for a domain are recorded against."""
+        with self._lock:
+            sites = self._domain_sites.get(domain)
+            return min(sites) if sites else None
+    
+    def _engine_now(self, timestamp: float = None) -> datetime:
+        """Get the current time in the engine's clock (UTC for both engines)."""
+        if timestamp is None:
+            timestamp = time.time()
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+    
+    def _transition_timing(self, minute: int):
+        """
+        Get the (scheduled_at, started_at) epoch pair for a transition job.
+        
+        minute is the minute of day the job was scheduled for, in the
+        engine's clock (UTC).
+        """
+        started_at = time.time()
+        if minute is None:
+            return None
+        
+        now = self._engine_now(started_at)
+        scheduled = now.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+        if scheduled > now + timedelta(minutes=1):
+            scheduled -= timedelta(days=1)  # a late run of yesterday's slot just after midnight
+        return scheduled.timestamp(), started_at
+    
+    def _block_domain(self, domain: str, minute: int = None):
+        """Block a domain at the start of a merged interval (called by scheduler)."""
+        timing = self._transition_timing(minute)
+        self._block_website(self._domain_website_id(domain), domain, timing=timing)
+    
+    def _unblock_domain(self, domain: str, minute: int = None):
+        """
+        Unblock a domain at the end of a merged interval (called by scheduler).
+        
+        minute is the job's scheduled minute of day in the engine's clock,
+        the same clock as the merged intervals; without it the engine's
+        current minute is used.
+        """
+        timing = self._transition_timing(minute)
+        if minute is None:
+            now = self._engine_now()
+            minute = now.hour * 60 + now.minute
+        suffix = '.' + domain
+        with self._lock:
+            intervals = self._domain_intervals.get(domain, [])
+            still_active = is_active(intervals, minute)
             
-            # Log the error
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='block',
-                success=False,
-                error_message=str(e)
-            )
+            # Subdomains in their own window may only be covered by this rule
+            keep_blocked = [
+                other for other, other_intervals in self._domain_intervals.items()
+                if other.endswith(suffix) and is_active(other_intervals, minute)
+            ]
+        
+        # Another window may have been added since this job was compiled
+        if still_active:
+            logger.info("Skipping unblock of %s: still inside a scheduled window", domain)
+            return
+        
+        self._unblock_website(self._domain_website_id(domain), domain, keep_blocked=keep_blocked, timing=timing)
     
-    def _unblock_website(self, website_id: int, url: str):
-        """Unblock a website (called by scheduler)."""
+    def _apply_action(self, website_id: int, url: str, action: str, keep_blocked: list = None,
+                      timing: tuple = None) -> bool:
+        """
+        Queue one block/unblock action in the outbox and dispatch it.
+        
+        The intent is durable once queued: if AdGuard is down or rejects the
+        change, the dispatcher keeps retrying it with backoff. Returns True if
+        the action reached AdGuard during this call.
+        """
+        outbox_id = self._enqueue_action(website_id, url, action, keep_blocked, timing)
+        if outbox_id is None:
+            return False
+        
+        self._dispatch_outbox()
+        queued = self.db_manager.get_action(outbox_id)
+        return queued is not None and queued['status'] == 'done'
+    
+    def _enqueue_action(self, website_id: int, url: str, action: str, keep_blocked: list = None,
+                        timing: tuple = None):
+        """Record an action in the outbox, returning its ID or None on error."""
+        try:
+            return self.db_manager.enqueue_action(website_id, url, action, keep_blocked, timing)
+        except Exception as e:
+            logger.error("Error queueing %s for %s: %s", action, url, e)
+            return None
+    
+    def _dispatch_in_background(self):
+        """Run an outbox dispatch on the transitions lane."""
         try:
-            logger.info(f"Attempting to unblock website: {url}")
+            self.lanes[LANE_TRANSITIONS].submit(self._dispatch_outbox)
+        except RuntimeError:
+            # Lane already shut down; the periodic dispatcher will pick it up
+            logger.warning("Transitions lane is shut down, leaving dispatch to the outbox retry job")
+    
+    def _dispatch_outbox(self) -> int:
+        """
+        Drain due outbox actions to AdGuard in batches.
+        
+        Each batch becomes a single AdGuard rule update. Only one thread
+        dispatches at a time; a caller that finds the dispatcher busy leaves a
+        request behind so the active dispatcher makes another pass. Returns
+        the number of actions completed.
+        """
+        completed = 0
+        self._dispatch_requested.set()
+        while self._dispatch_requested.is_set():
+            if not self._dispatch_lock.acquire(blocking=False):
+                return completed
+            try:
+                while self._dispatch_requested.is_set():
+                    self._dispatch_requested.clear()
+                    completed += self._drain_outbox()
+            finally:
+                self._dispatch_lock.release()
+        return completed
+    
+    def _drain_outbox(self) -> int:
+        """
+        Send due outbox batches until none are left or AdGuard fails (dispatch lock held).
+        
+        If AdGuard rejects a batch while reachable, its actions are retried
+        one at a time so a single bad action cannot hold back the others;
+        only the ones that fail on their own are deferred. While AdGuard is
+        unreachable actions are only postponed, never charged an attempt.
+        """
+        completed = 0
+        while True:
+            actions = self.db_manager.get_ready_actions(limit=self.outbox_batch_size)
+            if not actions:
+                return completed
             
-            success = self.adguard_api.unblock_domain(url)
+            success, error_message, unavailable = self._send_actions(actions)
+            if unavailable:
+                self._postpone_actions(actions, error_message)
+                return completed
+            self._unavailable_passes = 0
+            if success:
+                completed += self.db_manager.complete_actions([action['id'] for action in actions])
+                continue
             
-            # Log the action
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='unblock',
-                success=success,
-                error_message=None if success else "Failed to unblock domain"
-            )
+            if len(actions) == 1:
+                self._defer_actions(actions, error_message)
+                return completed
             
-            if success:
-                logger.info(f"Successfully unblocked website: {url}")
-            else:
-                logger.error(f"Failed to unblock website: {url}")
-                
+            logger.warning("AdGuard rejected a batch of %s actions, retrying them one at a time", len(actions))
+            for index, action in enumerate(actions):
+                success, error_message, unavailable = self._send_actions([action])
+                if success:
+                    completed += self.db_manager.complete_actions([action['id']])
+                elif unavailable:
+                    self._postpone_actions(actions[index:], error_message)
+                    return completed
+                else:
+                    self._defer_actions([action], error_message)
+    
+    def _send_actions(self, actions: list):
+        """
+        Apply outbox actions to AdGuard as one rule update.
+        
+        Returns (success, error_message, unavailable), where unavailable
+        means AdGuard could not be reached at all.
+        """
+        block = [a['domain'] for a in actions if a['action'] in ('block', 'manual_block')]
+        unblock = [a['domain'] for a in actions if a['action'] in ('unblock', 'manual_unblock')]
+        keep_blocked = [domain for a in actions for domain in a['keep_blocked']]
+        
+        try:
+            success = self.adguard_api.apply_domain_changes(block=block, unblock=unblock, keep_blocked=keep_blocked)
+        except CircuitOpenError as e:
+            return False, f"AdGuard unavailable: {e}", True
         except Exception as e:
-            error_msg = f"Error unblocking website {url}: {e}"
-            logger.error(error_msg)
-            
-            # Log the error
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='unblock',
-                success=False,
-                error_message=str(e)
+            return False, str(e), False
+        
+        if success:
+            logger.info("Dispatched %s AdGuard actions (%s block, %s unblock)", len(actions), len(block), len(unblock))
+            return True, None, False
+        return False, "AdGuard rule update failed", self.adguard_api.circuit.is_open()
+    
+    def _postpone_actions(self, actions: list, error_message: str):
+        """Push actions back while AdGuard is unreachable, backing off over consecutive passes."""
+        delay = min(5.0 * (1 << min(self._unavailable_passes, 16)), 300.0)
+        self._unavailable_passes += 1
+        self.db_manager.postpone_actions([action['id'] for action in actions], error_message, delay)
+        logger.warning("Postponed %s AdGuard actions by %.0fs: %s", len(actions), delay, error_message)
+    
+    def _defer_actions(self, actions: list, error_message: str):
+        """Schedule another attempt for actions AdGuard rejected, giving up on those out of attempts."""
+        failed = self.db_manager.retry_actions_later(
+            [action['id'] for action in actions], error_message, max_attempts=self.outbox_max_attempts
+        )
+        logger.warning("Deferred %s AdGuard actions: %s", len(actions) - failed, error_message)
+        if failed:
+            logger.error("Gave up on %s AdGuard actions after %s attempts: %s",
+                         failed, self.outbox_max_attempts, error_message)
+    
+    def _block_website(self, website_id: int, url: str, timing: tuple = None):
+        """Block a website (called by scheduler)."""
+        self._apply_action(website_id, url, 'block', timing=timing)
+    
+    def _unblock_website(self, website_id: int, url: str, keep_blocked: list = None, timing: tuple = None):
+        """Unblock a website (called by scheduler)."""
+        self._apply_action(website_id, url, 'unblock', keep_blocked=keep_blocked, timing=timing)
+    
+    def _on_adguard_circuit_change(self, old_state: str, new_state: str):
+        """Drain the outbox as soon as AdGuard is reachable again."""
+        if new_state == STATE_CLOSED and self.is_running():
+            self.scheduler.add_job(
+                func=self._dispatch_outbox,
+                id='outbox_dispatch_now',
+                name='Dispatch AdGuard outbox',
+                executor=LANE_EXECUTORS[LANE_TRANSITIONS],
+                replace_existing=True
+            )
+    
+    def add_maintenance_job(self, func, seconds: int, job_id: str, name: str, run_now: bool = False):
+        """
+        Run a housekeeping function every given number of seconds on the maintenance lane.
+        
+        With run_now it also runs once as soon as the scheduler is running.
+        """
+        self.scheduler.add_job(
+            func=func,
+            trigger=self._interval_trigger(seconds),
+            id=job_id,
+            name=name,
+            executor=LANE_EXECUTORS[LANE_MAINTENANCE],
+            replace_existing=True
+        )
+        if run_now:
+            self.scheduler.add_job(
+                func=func,
+                id=f"{job_id}_now",
+                name=name,
+                executor=LANE_EXECUTORS[LANE_MAINTENANCE],
+                replace_existing=True
             )
     
+    def get_latency_report(self, days: int = 7) -> Dict[str, Any]:
+        """
+        Summarize transition lag over the last few days.
+        
+        start_lag is scheduled time to job start, ack_lag scheduled time to
+        AdGuard acknowledging the change (seconds, p50/p95/max). Transitions
+        not yet acknowledged are only counted.
+        """
+        timings = self.db_manager.get_transition_timings(time.time() - days * 86400)
+        acked = [row for row in timings if row['acked_at'] is not None]
+        
+        def summarize(lags):
+            lags = sorted(lags)
+            if not lags:
+                return {'p50': None, 'p95': None, 'max': None}
+            # Nearest-rank percentiles
+            rank = lambda pct: lags[max(0, -(-pct * len(lags) // 100) - 1)]
+            return {'p50': round(rank(50), 3), 'p95': round(rank(95), 3), 'max': round(lags[-1], 3)}
+        
+        return {
+            'days': days,
+            'transitions': len(timings),
+            'unacknowledged': len(timings) - len(acked),
+            'start_lag': summarize(row['started_at'] - row['scheduled_at'] for row in timings),
+            'ack_lag': summarize(row['acked_at'] - row['scheduled_at'] for row in acked),
+            'block_ack_lag': summarize(row['acked_at'] - row['scheduled_at'] for row in acked if row['is_block']),
+            'unblock_ack_lag': summarize(row['acked_at'] - row['scheduled_at'] for row in acked if not row['is_block']),
+        }
+    
+    def get_lane_stats(self) -> Dict[str, Any]:
+        """Get queue depth, failure and wait-time statistics per execution lane."""
+        return {lane: pool.get_stats() for lane, pool in self.lanes.items()}
+    
     def get_scheduled_jobs(self) -> list:
         """Get list of currently scheduled jobs."""
         try:
+            # Read-your-writes: apply any buffered schedule changes first
+            self._schedule_buffer.flush()
+            
             jobs = []
             for job in self.scheduler.get_jobs():
                 jobs.append({
@@ -236,61 +852,63 @@ class SchedulerService:
             return jobs
             
         except Exception as e:
-            logger.error(f"Error getting scheduled jobs: {e}")
+            logger.error("Error getting scheduled jobs: %s", e)
             return []
     
-    def force_block_website(self, website_id: int, url: str) -> bool:
-        """Manually block a website immediately."""
-        try:
-            logger.info(f"Force blocking website: {url}")
-            success = self.adguard_api.block_domain(url)
-            
-            # Log the action
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='manual_block',
-                success=success,
-                error_message=None if success else "Failed to block domain"
-            )
-            
-            return success
-            
-        except Exception as e:
-            logger.error(f"Error force blocking website {url}: {e}")
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='manual_block',
-                success=False,
-                error_message=str(e)
-            )
-            return False
+    def submit_manual_action(self, website_id: int, url: str, action: str):
+        """
+        Queue a manual block/unblock without waiting for AdGuard.
+        
+        The AdGuard round-trip runs on the transitions lane, after the
+        write-behind window so rapid clicks on the same domain collapse into
+        one AdGuard write; the calling web worker returns immediately.
+        Returns the action ID to poll with get_action_status, or None.
+        """
+        if action not in ('manual_block', 'manual_unblock'):
+            raise ValueError(f"Unsupported manual action: {action}")
+        
+        logger.info("Queueing %s for %s", action, url)
+        outbox_id = self._enqueue_action(website_id, url, action)
+        if outbox_id is None:
+            return None
+        
+        if self._dispatch_buffer.delay > 0:
+            self._dispatch_buffer.submit(url, outbox_id)
+        else:
+            self._dispatch_in_background()
+        return outbox_id
     
-    def force_unblock_website(self, website_id: int, url: str) -> bool:
-        """Manually unblock a website immediately."""
-        try:
-            logger.info(f"Force unblocking website: {url}")
-            success = self.adguard_api.unblock_domain(url)
-            
-            # Log the action
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='manual_unblock',
-                success=success,
-                error_message=None if success else "Failed to unblock domain"
-            )
-            
-            return success
-            
-        except Exception as e:
-            logger.error(f"Error force unblocking website {url}: {e}")
-            self.db_manager.log_action(
-                website_id=website_id,
-                website_url=url,
-                action='manual_unblock',
-                success=False,
-                error_message=str(e)
-            )
-            return False
+    def get_action_status(self, action_id: int):
+        """
+        Get the delivery status of a queued action.
+        
+        Status is 'pending' until AdGuard acknowledges the change (failed
+        attempts are retried with backoff and reported in error), then
+        'succeeded'. An action that used up OUTBOX_MAX_ATTEMPTS, or was
+        replaced by a later one for the same domain, is never applied and
+        reports 'failed'.
+        """
+        action = self.db_manager.get_action(action_id)
+        if action is None:
+            return None
+        
+        status = {'pending': 'pending', 'done': 'succeeded'}.get(action['status'], 'failed')
+        error = action['last_error']
+        if action['status'] == 'superseded':
+            error = 'Superseded by a later action'
+        
+        next_attempt = None
+        if status == 'pending' and action['attempts']:
+            next_attempt = datetime.fromtimestamp(action['next_attempt_at']).isoformat()
+        
+        return {
+            'id': action['id'],
+            'website_id': action['website_id'],
+            'domain': action['domain'],
+            'action': action['action'],
+            'status': status,
+            'attempts': action['attempts'],
+            'error': error,
+            'next_attempt_at': next_attempt,
+            'updated_at': action['updated_at'],
+        }
@@ -0,0 +1,224 @@
+"""
+Shared schedule snapshot for FunTime Scheduler.
+Publishes schedules, websites and merged block intervals as one binary file
+in shared memory, so every web worker can read them without touching SQLite.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from typing import Dict, List, Optional
+
+from services.domain_utils import domain_key
+from services.intervals import MINUTES_PER_DAY, is_active, merge_windows, to_minutes
+from services.models import Schedule, Website
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FTSS'
+VERSION = 1
+
+# magic, version, generation, payload length, payload CRC32
+HEADER = struct.Struct('<4sHQII')
+COUNTS = struct.Struct('<IIIII')           # schedules, websites, domains, intervals, strings
+SCHEDULE = struct.Struct('<IIHHBII')       # id, name, start, end, enabled, created_at, updated_at
+WEBSITE = struct.Struct('<IIIBII')         # id, schedule_id, url, enabled, created_at, updated_at
+DOMAIN = struct.Struct('<III')             # name, first interval, interval count
+INTERVAL = struct.Struct('<HH')            # block minute, unblock minute
+OFFSET = struct.Struct('<I')
+
+def default_path() -> str:
+    """Snapshot location: SNAPSHOT_PATH, else /dev/shm, else the temp directory."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.getenv('SNAPSHOT_PATH', os.path.join(base, 'funtime-scheduler.snapshot'))
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _encode(schedules: List[Schedule]) -> bytes:
+    """Encode schedules (with their websites) and their merged intervals."""
+    strings: List[bytes] = []
+    string_ids: Dict[str, int] = {}
+
+    def ref(value) -> int:
+        value = '' if value is None else str(value)
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value.encode('utf-8'))
+        return string_ids[value]
+
+    schedule_rows, website_rows = [], []
+    windows: Dict[str, list] = {}
+    for schedule in schedules:
+        try:
+            start, end = to_minutes(schedule['start_time']), to_minutes(schedule['end_time'])
+            if not (0 <= start < MINUTES_PER_DAY and 0 <= end < MINUTES_PER_DAY):
+                raise ValueError(f"time out of range: {schedule['start_time']}-{schedule['end_time']}")
+        except (AttributeError, TypeError, ValueError) as e:
+            # One malformed row must not take the snapshot (or startup) down with it
+            logger.warning("Leaving schedule %s out of the snapshot: %s", schedule['id'], e)
+            continue
+        schedule_rows.append(SCHEDULE.pack(
+            schedule['id'], ref(schedule['name']), start, end, int(bool(schedule['enabled'])),
+            ref(schedule.get('created_at')), ref(schedule.get('updated_at'))
+        ))
+        for website in schedule['websites']:
+            website_rows.append(WEBSITE.pack(
+                website['id'], schedule['id'], ref(website['url']), int(bool(website['enabled'])),
+                ref(website.get('created_at')), ref(website.get('updated_at'))
+            ))
+            if schedule['enabled'] and website['enabled']:
+                domain = domain_key(website['url'])
+                windows.setdefault(domain, []).append((schedule['start_time'], schedule['end_time']))
+
+    domain_rows, interval_rows = [], []
+    for domain in sorted(windows):
+        merged = merge_windows(windows[domain])
+        domain_rows.append(DOMAIN.pack(ref(domain), len(interval_rows), len(merged)))
+        interval_rows.extend(INTERVAL.pack(start, end) for start, end in merged)
+
+    ends, total = [], 0
+    for value in strings:
+        total += len(value)
+        ends.append(OFFSET.pack(total))
+
+    return b''.join([
+        COUNTS.pack(len(schedule_rows), len(website_rows), len(domain_rows), len(interval_rows), len(strings)),
+        *schedule_rows, *website_rows, *domain_rows, *interval_rows, *ends, *strings,
+    ])
+
+def publish(db_manager, path: Optional[str] = None) -> Optional[int]:
+    """
+    Write a new snapshot from the database and return its generation.
+
+    Publishers serialize on a lock file and bump the generation of the
+    current snapshot; the new file replaces the old one atomically, so a
+    reader always maps a complete snapshot. Failures are logged and return
+    None; readers then keep the previous snapshot.
+    """
+    path = path or default_path()
+    try:
+        payload = _encode(db_manager.get_all_schedules())
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            generation = 1
+            try:
+                with open(path, 'rb') as f:
+                    magic, version, previous, _, _ = HEADER.unpack(f.read(HEADER.size))
+                    if magic == MAGIC:
+                        generation = previous + 1
+            except (OSError, struct.error):
+                pass
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, generation, len(payload), zlib.crc32(payload)))
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+        logger.debug("Published schedule snapshot generation %s (%s bytes)", generation, len(payload))
+        return generation
+
+    except (OSError, ValueError, struct.error) as e:
+        logger.error("Error publishing schedule snapshot: %s", e)
+        return None
+
+class SnapshotView:
+    """Decoded contents of one snapshot generation."""
+
+    __slots__ = ('generation', 'schedules', 'domain_intervals')
+
+    def __init__(self, generation: int, buffer):
+        """Initialize view by decoding a snapshot payload."""
+        self.generation = generation
+        n_schedules, n_websites, n_domains, n_intervals, n_strings = COUNTS.unpack_from(buffer, 0)
+        pos = COUNTS.size
+
+        def records(layout, count):
+            nonlocal pos
+            start, pos = pos, pos + layout.size * count
+            return layout.iter_unpack(buffer[start:pos])
+
+        schedule_rows = list(records(SCHEDULE, n_schedules))
+        website_rows = list(records(WEBSITE, n_websites))
+        domain_rows = list(records(DOMAIN, n_domains))
+        interval_rows = list(records(INTERVAL, n_intervals))
+        ends = [end for end, in records(OFFSET, n_strings)]
+        blob = bytes(buffer[pos:pos + (ends[-1] if ends else 0)])
+        strings = [blob[start:end].decode('utf-8') for start, end in zip([0] + ends, ends)]
+
+        websites: Dict[int, List[Website]] = {}
+        for website_id, schedule_id, url, enabled, created_at, updated_at in website_rows:
+            websites.setdefault(schedule_id, []).append(
+                Website(website_id, schedule_id, strings[url], enabled, strings[created_at], strings[updated_at])
+            )
+        self.schedules = [
+            Schedule(schedule_id, strings[name], _hhmm(start), _hhmm(end), enabled,
+                     strings[created_at], strings[updated_at], websites.get(schedule_id, []))
+            for schedule_id, name, start, end, enabled, created_at, updated_at in schedule_rows
+        ]
+
+        self.domain_intervals = {
+            strings[name]: interval_rows[first:first + count]
+            for name, first, count in domain_rows
+        }
+
+    def count_active_websites(self) -> int:
+        """Count enabled websites in enabled schedules."""
+        return sum(
+            1 for schedule in self.schedules if schedule['enabled']
+            for website in schedule['websites'] if website['enabled']
+        )
+
+    def blocked_domains(self, minute: int) -> List[str]:
+        """Get the domains whose merged intervals cover a minute of the day."""
+        return [domain for domain, intervals in self.domain_intervals.items() if is_active(intervals, minute)]
+
+class SnapshotReader:
+    """
+    Per-process reader of the shared snapshot.
+
+    get() costs one stat() while the file is unchanged; when a new file has
+    been published it is memory-mapped, checked and decoded once, and the
+    view is reused until the next generation.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize reader."""
+        self.path = path or default_path()
+        self._key = None
+        self._view: Optional[SnapshotView] = None
+
+    def get(self) -> Optional[SnapshotView]:
+        """Get the current snapshot view, or None if none has been published."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._key:
+            return self._view
+
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, version, generation, length, crc = HEADER.unpack_from(mapped, 0)
+                with memoryview(mapped) as buffer:
+                    payload = buffer[HEADER.size:HEADER.size + length]
+                    if magic != MAGIC or version != VERSION or zlib.crc32(payload) != crc:
+                        payload.release()
+                        logger.warning("Ignoring invalid schedule snapshot %s", self.path)
+                        self._key = key
+                        return self._view
+                    if self._view is None or generation != self._view.generation:
+                        self._view = SnapshotView(generation, payload)
+                    payload.release()
+        except (OSError, ValueError, struct.error) as e:
+            logger.error("Error reading schedule snapshot: %s", e)
+            return self._view
+
+        self._key = key
+        return self._view
@@ -0,0 +1,101 @@
+"""
+AdGuard statistics cache for FunTime Scheduler.
+Keeps a compact per-domain view of /control/stats, refreshed in the background.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from services.rule_compiler import DomainTrie
+
+logger = logging.getLogger(__name__)
+
+class StatsService:
+    """
+    Background-refreshed AdGuard stats for the domains we manage.
+
+    refresh() fetches the full stats payload, keeps only the totals and the
+    top-domain counters that fall under our domains (subdomain hits count
+    towards the managed domain covering them), and swaps the result in.
+    Readers only ever see the last complete snapshot.
+    """
+
+    def __init__(self, adguard_api, domains_fn: Callable[[], Iterable[str]], ttl: Optional[int] = None):
+        """
+        Initialize stats service.
+
+        domains_fn returns the normalized domains to extract counters for;
+        ttl is the refresh interval in seconds (STATS_REFRESH_INTERVAL).
+        """
+        self.adguard_api = adguard_api
+        self.domains_fn = domains_fn
+        self.ttl = ttl or int(os.getenv('STATS_REFRESH_INTERVAL', '60'))
+
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, Any] = {
+            'updated_at': None,
+            'stale': True,
+            'error': None,
+            'totals': {},
+            'domains': {},
+        }
+        self._refreshed_at: Optional[float] = None
+
+    def refresh(self) -> bool:
+        """Fetch AdGuard stats and rebuild the snapshot. Keeps the old one on failure."""
+        stats = self.adguard_api.get_stats()
+        if stats is None:
+            with self._lock:
+                self._snapshot = dict(self._snapshot, error='Failed to fetch AdGuard stats')
+            logger.warning("AdGuard stats refresh failed, serving last snapshot")
+            return False
+
+        snapshot = self._extract(stats, set(self.domains_fn()))
+        with self._lock:
+            self._snapshot = snapshot
+            self._refreshed_at = time.monotonic()
+        logger.debug("Refreshed AdGuard stats for %s domains", len(snapshot['domains']))
+        return True
+
+    def _extract(self, stats: Dict[str, Any], domains: set) -> Dict[str, Any]:
+        """Reduce a /control/stats payload to totals plus per-domain counters."""
+        trie = DomainTrie(domains)
+        counters = {domain: {'queried': 0, 'blocked': 0} for domain in domains}
+
+        for key, counter in (('top_queried_domains', 'queried'), ('top_blocked_domains', 'blocked')):
+            # AdGuard reports these as a list of single-entry {domain: count} objects
+            for entry in stats.get(key) or ():
+                for domain, count in entry.items():
+                    covering = trie.covering_domain(domain.lower().rstrip('.'))
+                    if covering is not None:
+                        counters[covering][counter] += count
+
+        return {
+            'updated_at': datetime.now().isoformat(),
+            'stale': False,
+            'error': None,
+            'totals': {
+                'time_units': stats.get('time_units'),
+                'dns_queries': stats.get('num_dns_queries'),
+                'blocked_filtering': stats.get('num_blocked_filtering'),
+                'avg_processing_time': stats.get('avg_processing_time'),
+            },
+            'domains': counters,
+        }
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Get the cached stats; stale once two refresh intervals pass without an update."""
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            refreshed_at = self._refreshed_at
+        snapshot['stale'] = refreshed_at is None or time.monotonic() - refreshed_at > 2 * self.ttl
+        return snapshot
+
+    def get_domain_counts(self, domain: str) -> Optional[Dict[str, int]]:
+        """Get the cached counters for one managed domain."""
+        with self._lock:
+            return self._snapshot['domains'].get(domain)
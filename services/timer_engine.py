@@ -0,0 +1,316 @@
+"""
+Timeline timer engine for FunTime Scheduler.
+A lightweight alternative to APScheduler for fixed daily HH:MM transitions.
+
+Daily jobs live on a timeline keyed by second of day: a dict of job sets per
+offset plus a sorted list of the occupied offsets (one per distinct fire
+time), so adding, moving or removing a job is a set update and at most one
+bisect insert. Interval and run-once jobs sit in a small heap. A single thread sleeps
+until the earliest due time and is woken early whenever the timeline changes.
+
+Like the APScheduler engine, the timeline runs in UTC on aware datetimes, so
+switching engines never moves a transition and DST changes never skip or
+repeat a minute.
+"""
+
+import bisect
+import heapq
+import itertools
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class JobLookupError(KeyError):
+    """Raised when a job ID is not scheduled."""
+
+def _now() -> datetime:
+    """Get the current time in the engine's clock (aware UTC)."""
+    return datetime.now(timezone.utc)
+
+class DailyTrigger:
+    """Fire every day at a fixed time of day (UTC)."""
+
+    __slots__ = ('offset',)
+
+    def __init__(self, hour: int, minute: int, second: int = 0):
+        """Initialize trigger."""
+        self.offset = hour * 3600 + minute * 60 + second
+
+    def next_fire_time(self, now: datetime) -> datetime:
+        """Get the next fire time strictly after now."""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        fire_time = midnight + timedelta(seconds=self.offset)
+        if fire_time <= now:
+            fire_time += timedelta(days=1)
+        return fire_time
+
+    def __str__(self):
+        hour, rest = divmod(self.offset, 3600)
+        minute, second = divmod(rest, 60)
+        if second:
+            return f"daily[{hour:02d}:{minute:02d}:{second:02d}]"
+        return f"daily[{hour:02d}:{minute:02d}]"
+
+class IntervalTrigger:
+    """Fire every fixed number of seconds, optionally shifted by up to jitter seconds either way."""
+
+    __slots__ = ('seconds', 'jitter')
+
+    def __init__(self, seconds: float, jitter: float = 0):
+        """Initialize trigger."""
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def next_fire_time(self, now: datetime) -> datetime:
+        """Get the next fire time after now."""
+        delay = self.seconds
+        if self.jitter:
+            delay = max(delay + random.uniform(-self.jitter, self.jitter), 0.001)
+        return now + timedelta(seconds=delay)
+
+    def __str__(self):
+        return f"interval[{timedelta(seconds=self.seconds)}]"
+
+class TimelineJob:
+    """A job registered on the timeline."""
+
+    __slots__ = ('id', 'name', 'func', 'args', 'trigger', 'run_at', 'executor', 'version')
+
+    def __init__(self, id: str, name: str, func: Callable, args: List[Any], trigger, run_at: Optional[datetime],
+                 executor: str = 'default'):
+        """Initialize job."""
+        self.id = id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.trigger = trigger
+        self.run_at = run_at
+        self.executor = executor
+        self.version = 0
+
+    @property
+    def next_run_time(self) -> Optional[datetime]:
+        """Next time the job fires."""
+        if isinstance(self.trigger, DailyTrigger):
+            return self.trigger.next_fire_time(_now() - timedelta(microseconds=1))
+        return self.run_at
+
+class TimelineScheduler:
+    """
+    Background scheduler built on a time-of-day timeline.
+
+    Implements the subset of APScheduler's BackgroundScheduler interface that
+    SchedulerService uses (add_job, get_job, get_jobs, remove_job,
+    reschedule_job, start, shutdown, running). Like APScheduler, jobs name
+    the executor they run on; executors maps names to objects with
+    submit/shutdown and must contain 'default'.
+    """
+
+    def __init__(self, max_workers: int = 2, misfire_grace_time: int = 30, executors: Optional[Dict[str, Any]] = None):
+        """Initialize timeline scheduler."""
+        self.misfire_grace_time = misfire_grace_time
+        self._executors = executors or {
+            'default': ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='timeline')
+        }
+
+        self._jobs: Dict[str, TimelineJob] = {}
+        self._by_offset: Dict[int, set] = {}
+        self._offsets: List[int] = []
+        self._heap: list = []
+        self._counter = itertools.count()
+        self._running_jobs = set()
+
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = True
+
+    @property
+    def running(self) -> bool:
+        """Whether the timer thread is running."""
+        return not self._stopped
+
+    def start(self):
+        """Start the timer thread."""
+        with self._condition:
+            if not self._stopped:
+                return
+            self._stopped = False
+            self._last_tick = _now()
+        self._thread = threading.Thread(target=self._run, name='timeline-scheduler', daemon=True)
+        self._thread.start()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the timer thread and the executor."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if wait and self._thread is not None:
+            self._thread.join()
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+
+    def add_job(self, func: Callable, trigger=None, args: Optional[List[Any]] = None, id: Optional[str] = None,
+                name: Optional[str] = None, replace_existing: bool = False, executor: str = 'default',
+                **kwargs) -> TimelineJob:
+        """Add a daily, interval or run-once (trigger=None) job."""
+        job_id = id or f"job_{next(self._counter)}"
+        if executor not in self._executors:
+            raise KeyError(f"No executor named {executor}")
+        with self._condition:
+            if job_id in self._jobs:
+                if not replace_existing:
+                    raise ValueError(f"Job {job_id} already exists")
+                self._unlink(self._jobs[job_id])
+
+            run_at = None if isinstance(trigger, DailyTrigger) else (
+                trigger.next_fire_time(_now()) if trigger is not None else _now()
+            )
+            job = TimelineJob(job_id, name or job_id, func, list(args or []), trigger, run_at, executor)
+            self._jobs[job_id] = job
+            self._link(job)
+            self._condition.notify()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[TimelineJob]:
+        """Get a job by ID, or None."""
+        return self._jobs.get(job_id)
+
+    def get_jobs(self) -> List[TimelineJob]:
+        """Get all scheduled jobs."""
+        with self._condition:
+            return list(self._jobs.values())
+
+    def remove_job(self, job_id: str):
+        """Remove a job, raising JobLookupError if it does not exist."""
+        with self._condition:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                raise JobLookupError(job_id)
+            self._unlink(job)
+            self._condition.notify()
+
+    def reschedule_job(self, job_id: str, trigger=None, **kwargs) -> TimelineJob:
+        """Move an existing job to a new trigger."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobLookupError(job_id)
+            self._unlink(job)
+            job.trigger = trigger
+            job.run_at = None if isinstance(trigger, DailyTrigger) else trigger.next_fire_time(_now())
+            self._link(job)
+            self._condition.notify()
+        return job
+
+    def modify_job(self, job_id: str, **changes) -> TimelineJob:
+        """Change a job's name, func, args or executor in place."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobLookupError(job_id)
+            for attr in ('name', 'func', 'args', 'executor'):
+                if attr in changes:
+                    setattr(job, attr, changes[attr])
+        return job
+
+    def _link(self, job: TimelineJob):
+        """Put a job on the timeline or heap (condition held)."""
+        job.version += 1
+        if isinstance(job.trigger, DailyTrigger):
+            offset = job.trigger.offset
+            jobs = self._by_offset.get(offset)
+            if jobs is None:
+                jobs = self._by_offset[offset] = set()
+                bisect.insort(self._offsets, offset)
+            jobs.add(job.id)
+        else:
+            heapq.heappush(self._heap, (job.run_at, next(self._counter), job.id, job.version))
+
+    def _unlink(self, job: TimelineJob):
+        """Take a job off the timeline (condition held). Heap entries are dropped lazily."""
+        job.version += 1
+        if isinstance(job.trigger, DailyTrigger):
+            offset = job.trigger.offset
+            jobs = self._by_offset.get(offset)
+            if jobs is not None:
+                jobs.discard(job.id)
+                if not jobs:
+                    del self._by_offset[offset]
+                    del self._offsets[bisect.bisect_left(self._offsets, offset)]
+
+    def _next_daily(self, after: datetime) -> Optional[datetime]:
+        """Get the first occupied timeline offset strictly after a time (condition held)."""
+        if not self._offsets:
+            return None
+        midnight = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        current = (after - midnight).total_seconds()
+        index = bisect.bisect_right(self._offsets, int(current))
+        if index < len(self._offsets):
+            return midnight + timedelta(seconds=self._offsets[index])
+        return midnight + timedelta(days=1, seconds=self._offsets[0])
+
+    def _run(self):
+        """Timer thread: sleep until the next due time, then dispatch due jobs."""
+        with self._condition:
+            while not self._stopped:
+                now = _now()
+                self._fire_daily(self._last_tick, now)
+                self._fire_heap(now)
+                self._last_tick = now
+
+                candidates = [t for t in (self._next_daily(now), self._heap[0][0] if self._heap else None) if t]
+                timeout = (min(candidates) - now).total_seconds() if candidates else None
+                if timeout is None or timeout > 0:
+                    self._condition.wait(timeout)
+
+    def _fire_daily(self, since: datetime, now: datetime):
+        """Submit daily jobs whose fire time passed in (since, now] (condition held)."""
+        fire_time = self._next_daily(since)
+        while fire_time is not None and fire_time <= now:
+            if (now - fire_time).total_seconds() <= self.misfire_grace_time:
+                offset = fire_time.hour * 3600 + fire_time.minute * 60 + fire_time.second
+                for job_id in self._by_offset.get(offset, ()):
+                    self._submit(self._jobs[job_id])
+            fire_time = self._next_daily(fire_time)
+
+    def _fire_heap(self, now: datetime):
+        """Submit interval and run-once jobs that are due (condition held)."""
+        while self._heap and self._heap[0][0] <= now:
+            _, _, job_id, version = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if job is None or job.version != version:
+                continue  # removed or rescheduled since it was pushed
+
+            self._submit(job)
+            if job.trigger is None:
+                del self._jobs[job_id]
+            else:
+                job.run_at = job.trigger.next_fire_time(now)
+                self._link(job)
+
+    def _submit(self, job: TimelineJob):
+        """Run a job on its executor, skipping it if the previous run is still going (condition held)."""
+        if job.id in self._running_jobs:
+            logger.warning("Skipping run of %s: previous run still in progress", job.name)
+            return
+        self._running_jobs.add(job.id)
+        try:
+            self._executors[job.executor].submit(self._execute, job.id, job.func, job.args)
+        except RuntimeError:
+            self._running_jobs.discard(job.id)  # executor already shut down
+
+    def _execute(self, job_id: str, func: Callable, args: List[Any]):
+        """Executor thread: run one job."""
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error("Job %s raised an exception: %s", job_id, e)
+            raise  # counted by an instrumented lane; nothing else reads the future
+        finally:
+            with self._condition:
+                self._running_jobs.discard(job_id)
@@ -0,0 +1,87 @@
+"""
+Write-behind buffer for FunTime Scheduler.
+Coalesces rapid changes per key and applies them as one batch after a short delay.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class FlushTicket:
+    """Handle for the batch a change was merged into."""
+
+    def __init__(self):
+        """Initialize ticket."""
+        self._done = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the batch is applied. Returns False on timeout or error."""
+        return self._done.wait(timeout) and self.error is None
+
+    @property
+    def done(self) -> bool:
+        """Whether the batch has been applied."""
+        return self._done.is_set()
+
+class WriteBehindBuffer:
+    """
+    Debounce buffer keyed by entity (website ID, domain, ...).
+
+    The first change after a flush starts a timer; every change submitted
+    before it fires is merged into the same batch, the latest value per key
+    winning. flush_fn receives the merged {key: value} dict once per batch.
+    A delay of 0 applies every change immediately.
+    """
+
+    def __init__(self, flush_fn: Callable[[Dict[Hashable, Any]], Any], delay: float, name: str = 'write-behind'):
+        """Initialize buffer."""
+        self.name = name
+        self.delay = delay
+        self._flush_fn = flush_fn
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, Any] = {}
+        self._ticket = FlushTicket()
+        self._timer: Optional[threading.Timer] = None
+
+    def submit(self, key: Hashable, value: Any) -> FlushTicket:
+        """Merge a change into the current batch and return its ticket."""
+        with self._lock:
+            self._pending[key] = value
+            ticket = self._ticket
+            if self.delay > 0 and self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.name = self.name
+                self._timer.start()
+
+        if self.delay <= 0:
+            self.flush()
+        return ticket
+
+    def flush(self) -> FlushTicket:
+        """Apply the current batch now (also called by the timer)."""
+        with self._lock:
+            pending, ticket = self._pending, self._ticket
+            self._pending, self._ticket = {}, FlushTicket()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        try:
+            if pending:
+                self._flush_fn(pending)
+                logger.debug("%s flushed %s coalesced changes", self.name, len(pending))
+        except Exception as e:
+            ticket.error = e
+            logger.error("%s flush failed: %s", self.name, e)
+        finally:
+            ticket._done.set()
+        return ticket
+
+    def pending_count(self) -> int:
+        """Number of keys waiting for the next flush."""
+        with self._lock:
+            return len(self._pending)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for AdGuard user rule updates against an in-memory AdGuard.
+"""
+
+import os
+import sys
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.rule_compiler import SECTION_BEGIN, SECTION_END, join_managed_section, split_managed_section
+
+# Hand-written rules the admin owns, including duplicates the compiler would merge
+ADMIN_RULES = ['||Example.org^', '||example.org^', '||ads.example.org^', '@@||ok.example.com^']
+
+class FakeAdGuard(AdGuardAPI):
+    """AdGuardAPI whose user rules live in memory instead of on a server."""
+
+    def __init__(self, rules=None):
+        """Initialize fake with the given user rules."""
+        super().__init__('http://adguard.invalid', 'admin', 'secret')
+        self.rules = list(rules or [])
+        self.reads = 0
+
+    def _make_request(self, method, endpoint, data=None):
+        if endpoint == '/control/filtering/status':
+            self.reads += 1
+            return {'user_rules': list(self.rules)}
+        if endpoint == '/control/filtering/set_rules':
+            self.rules = list(data['rules'])
+            return {}
+        return None
+
+def test_managed_section_round_trip():
+    """Splitting and re-joining the user rules reproduces them exactly."""
+    rules = ['||admin.example^', SECTION_BEGIN, '||youtube.com^', '||reddit.com^', SECTION_END, '@@||ok.example^']
+    before, managed, after = split_managed_section(rules)
+    assert (before, managed, after) == (['||admin.example^'], ['||youtube.com^', '||reddit.com^'],
+                                        ['@@||ok.example^'])
+    assert join_managed_section(before, managed, after) == rules
+
+    empty = [SECTION_BEGIN, SECTION_END]
+    assert split_managed_section(empty) == ([], [], [])
+    assert join_managed_section(*split_managed_section(empty)) == empty
+
+    # No section yet, and a begin marker whose end marker was deleted
+    assert split_managed_section(['||admin.example^']) is None
+    assert split_managed_section(['||admin.example^', SECTION_BEGIN, '||youtube.com^']) == \
+        (['||admin.example^'], ['||youtube.com^'], [])
+
+def test_legacy_rules_are_adopted_once():
+    """Rules this app wrote before the section existed move into it; admin rules stay put."""
+    adguard = FakeAdGuard(['||admin.example^', '||youtube.com^'])
+    adguard.set_legacy_domains(['youtube.com'])
+    assert adguard.migrate_managed_rules()
+    assert adguard.rules == ['||admin.example^', SECTION_BEGIN, '||youtube.com^', SECTION_END]
+
+    # Later admin rules for the same domain are outside the section and never adopted
+    adguard.rules.append('||youtube.com^')
+    assert adguard.unblock_domain('youtube.com')
+    assert adguard.rules == ['||admin.example^', SECTION_BEGIN, SECTION_END, '||youtube.com^']
+
+def test_updates_leave_admin_rules_alone():
+    """Block, unblock and minimize only rewrite the managed section."""
+    adguard = FakeAdGuard(ADMIN_RULES)
+
+    assert adguard.block_domain('www.youtube.com')
+    assert adguard.block_domain('YouTube.com')
+    assert adguard.rules == ADMIN_RULES + [SECTION_BEGIN, '||youtube.com^', SECTION_END]
+
+    # Duplicates inside the section are compiled out, the admin's are not
+    adguard.rules = ADMIN_RULES + [SECTION_BEGIN, '||youtube.com^', '||m.youtube.com^', '||YouTube.com^',
+                                   SECTION_END] + ['||ADS.example.org^']
+    assert adguard.minimize_user_rules() == 2
+    assert adguard.rules == ADMIN_RULES + [SECTION_BEGIN, '||youtube.com^', SECTION_END, '||ADS.example.org^']
+
+    assert adguard.unblock_domain('youtube.com')
+    assert adguard.rules == ADMIN_RULES + [SECTION_BEGIN, SECTION_END, '||ADS.example.org^']
+
+def test_update_after_prewarm_keeps_new_admin_rules():
+    """A rule added in the AdGuard UI after a pre-warm survives the next write."""
+    adguard = FakeAdGuard(ADMIN_RULES)
+    assert adguard.prewarm()
+
+    adguard.rules = ['||added-in-ui.example^'] + adguard.rules
+    assert adguard.block_domain('youtube.com')
+    assert adguard.rules[0] == '||added-in-ui.example^'
+    assert adguard.reads == 2
+
+if __name__ == '__main__':
+    test_managed_section_round_trip()
+    test_legacy_rules_are_adopted_once()
+    test_updates_leave_admin_rules_alone()
+    test_update_after_prewarm_keeps_new_admin_rules()
+    print("All AdGuard rule tests passed")
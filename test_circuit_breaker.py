@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the circuit breaker and how the AdGuard client fails fast behind it.
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+
+class FakeResponse:
+    """Minimal requests.Response stand-in."""
+
+    def __init__(self, status_code=200, payload=None):
+        """Initialize response."""
+        self.status_code = status_code
+        self.content = b'{}' if payload is not None else b''
+        self._payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self._payload
+
+def test_threshold_opens_and_rejects():
+    """Consecutive failures up to the threshold open the circuit; a success in between resets the count."""
+    transitions = []
+    circuit = CircuitBreaker('test', failure_threshold=3, recovery_timeout=3600)
+    circuit.add_listener(lambda old, new: transitions.append((old, new)))
+
+    circuit.record_failure('down')
+    circuit.record_failure('down')
+    circuit.record_success()
+    circuit.record_failure('down')
+    circuit.record_failure('down')
+    assert circuit.state == STATE_CLOSED and circuit.allow_request()
+
+    circuit.record_failure('still down')
+    assert circuit.state == STATE_OPEN and transitions == [(STATE_CLOSED, STATE_OPEN)]
+    assert not circuit.allow_request()
+    try:
+        circuit.check()
+        assert False, "open circuit let a call through"
+    except CircuitOpenError:
+        pass
+    status = circuit.get_status()
+    assert status['rejected_calls'] == 2 and status['last_error'] == 'still down'
+    assert circuit.seconds_until_retry() > 3500
+
+def test_half_open_trial():
+    """After the timeout one trial call is let through; its outcome closes or reopens the circuit."""
+    circuit = CircuitBreaker('test', failure_threshold=1, recovery_timeout=0.05)
+    circuit.record_failure('down')
+    assert circuit.state == STATE_OPEN
+    time.sleep(0.06)
+
+    assert circuit.state == STATE_HALF_OPEN
+    assert circuit.allow_request()
+    assert not circuit.allow_request()  # only one trial at a time
+    circuit.record_failure('still down')
+    assert circuit.state == STATE_OPEN
+
+    time.sleep(0.06)
+    assert circuit.allow_request()
+    circuit.record_success()
+    assert circuit.state == STATE_CLOSED and circuit.allow_request() and circuit.allow_request()
+
+def test_adguard_fails_fast_and_recovers():
+    """Once AdGuard is down block_domain raises without a network call, and the prober closes the circuit."""
+    adguard = AdGuardAPI('http://adguard.invalid', 'admin', 'secret')
+    adguard.circuit.failure_threshold = 2
+    adguard.circuit.recovery_timeout = 0.05
+    calls = []
+
+    def refuse(**kwargs):
+        calls.append(kwargs['url'])
+        raise requests.exceptions.ConnectionError('connection refused')
+    adguard._probe_session.get = lambda url, **kwargs: FakeResponse(payload={'version': 'v0.107', 'running': True})
+
+    # A 4xx is AdGuard answering, not AdGuard being down
+    adguard.session.request = lambda **kwargs: FakeResponse(400)
+    for _ in range(3):
+        assert not adguard.block_domain('youtube.com')
+    assert adguard.circuit.state == STATE_CLOSED
+
+    adguard.session.request = refuse
+    assert not adguard.block_domain('youtube.com')
+    try:
+        adguard.block_domain('youtube.com')  # the second failed read opens the circuit
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert len(calls) == 2
+
+    # Rejected outright without touching the network
+    adguard.circuit.recovery_timeout = 3600
+    try:
+        adguard.block_domain('youtube.com')
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert len(calls) == 2
+
+    # The background prober's half-open trial succeeds and closes the circuit
+    adguard.circuit.recovery_timeout = 0.05
+    adguard._probe_thread.join(5)
+    assert adguard.circuit.state == STATE_CLOSED
+    assert adguard.get_health()['healthy'] and adguard.get_health()['version'] == 'v0.107'
+
+if __name__ == '__main__':
+    test_threshold_opens_and_rejects()
+    test_half_open_trial()
+    test_adguard_fails_fast_and_recovers()
+    print("All circuit breaker tests passed")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the actual vs. scheduled blocking heatmap.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+from services.heatmap import (MINUTES_PER_WEEK, _bucketize, _runs, actual_occupancy, scheduled_occupancy,
+                              weekly_heatmap)
+
+def test_scheduled_occupancy_wraps_midnight():
+    """A 22:00-02:00 window covers the end of each day and the start of the next."""
+    week = scheduled_occupancy([('22:00', '02:00')])
+    assert week.shape == (MINUTES_PER_WEEK,)
+    assert week.sum() == 7 * 240
+    assert week[0] and week[119] and not week[120]
+    assert not week[1319] and week[1320] and week[1439]
+
+def test_actual_occupancy_runs():
+    """Transitions become blocked runs; repeats collapse and an open run lasts until now."""
+    minutes = np.array([-30, 10, 20, 40, 90])
+    is_block = np.array([1, 0, 0, 1, 1], dtype=np.int8)
+    occupancy = actual_occupancy(minutes, is_block, 100)
+    # Blocked from before the period until 10, then again from 40 to the end
+    assert occupancy[:10].all() and not occupancy[10:40].any() and occupancy[40:].all()
+
+    # A period that opens unblocked ignores the earlier unblock
+    occupancy = actual_occupancy(np.array([-5, 50, 60]), np.array([0, 1, 0], dtype=np.int8), 100)
+    assert occupancy.sum() == 10 and occupancy[50:60].all()
+
+    assert not actual_occupancy(np.array([], np.int64), np.array([], np.int8), 10).any()
+
+def test_runs_and_buckets():
+    """Runs are found in boolean arrays; buckets average only observed minutes."""
+    starts, lengths = _runs(np.array([0, 1, 1, 0, 1, 0, 0, 1], dtype=bool))
+    assert starts.tolist() == [1, 4, 7] and lengths.tolist() == [2, 1, 1]
+
+    weekly = np.zeros((1, MINUTES_PER_WEEK), dtype=bool)
+    weekly[0, :30] = True
+    weights = np.zeros((1, MINUTES_PER_WEEK), dtype=bool)
+    weights[0, :90] = True
+    buckets = _bucketize(weekly, weights, 60)
+    assert buckets[:3] == [0.5, 0.0, None]
+
+def test_heatmap_keys_domains_like_the_logs():
+    """A website saved as "YouTube.com" is one domain with its logged transitions."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    db_manager.add_schedule('Videos', '08:00', '12:00', ['YouTube.com'])
+    db_manager.add_schedule('Evening', '18:00', '22:00', ['https://YouTube.com/watch'])
+
+    # Blocked before the period began and never unblocked
+    db_manager.log_action(1, 'youtube.com', 'block', True)
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute('UPDATE log_entries SET ts = ?', (int(time.time()) - 15 * 86400,))
+
+    # Two weeks so at least one full week has already happened
+    result = weekly_heatmap(db_manager, weeks=2)
+    assert [row['domain'] for row in result['domains']] == ['youtube.com']
+    row = result['domains'][0]
+    assert row['scheduled_minutes'] >= 7 * 8 * 60
+    assert row['missed_minutes'] == 0
+    assert row['actual_minutes'] == row['scheduled_minutes'] + row['extra_minutes']
+
+    assert [row['domain'] for row in weekly_heatmap(db_manager, weeks=2, domain='YouTube.com')['domains']] == \
+        ['youtube.com']
+
+if __name__ == '__main__':
+    test_scheduled_occupancy_wraps_midnight()
+    test_actual_occupancy_runs()
+    test_runs_and_buckets()
+    test_heatmap_keys_domains_like_the_logs()
+    print("All heatmap tests passed")
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for the history rollups and the summary served from them.
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+
+def test_summary_matches_websites_by_domain():
+    """Mixed-case and path-bearing entries find their domain's rollups, each counted once per schedule."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    videos = db_manager.add_schedule('Videos', '08:00', '20:00', ['YouTube.com', 'https://youtube.com/watch'])
+    evening = db_manager.add_schedule('Evening', '18:00', '22:00', ['youtube.com', 'reddit.com'])
+
+    db_manager.log_action(1, 'youtube.com', 'block', True)
+    db_manager.log_action(1, 'youtube.com', 'unblock', False, 'timeout')
+    db_manager.log_action(4, 'reddit.com', 'block', True)
+
+    summary = db_manager.get_history_summary(days=1)
+    by_schedule = {row['schedule_id']: row for row in summary['by_schedule']}
+
+    assert (by_schedule[videos]['succeeded'], by_schedule[videos]['failed']) == (1, 1)
+    assert by_schedule[videos]['shared_domains'] == 1
+    assert (by_schedule[evening]['succeeded'], by_schedule[evening]['failed']) == (2, 1)
+    assert by_schedule[evening]['shared_domains'] == 1
+
+    assert db_manager.rebuild_log_rollups() > 0
+    assert db_manager.get_history_summary(days=1) == summary
+
+if __name__ == '__main__':
+    test_summary_matches_websites_by_domain()
+    print("All history tests passed")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for merged block intervals and the unblock check that uses them.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.database import DatabaseManager
+from services.intervals import MINUTES_PER_DAY, is_active, merge_windows, split_window
+from services.scheduler_service import SchedulerService
+
+def test_merge_windows_wraparound():
+    """Windows crossing midnight merge into one wrapping interval."""
+    assert split_window('21:00', '07:00') == [(1260, MINUTES_PER_DAY), (0, 420)]
+    assert split_window('09:00', '09:00') == []
+
+    # 21:00-07:00 and 06:00-08:00 overlap across midnight
+    assert merge_windows([('21:00', '07:00'), ('06:00', '08:00')]) == [(1260, 480)]
+    # Touching windows join; disjoint ones stay apart
+    assert merge_windows([('08:00', '12:00'), ('12:00', '13:00'), ('15:00', '16:00')]) == [(480, 780), (900, 960)]
+    # Two halves that cover the whole day
+    assert merge_windows([('00:00', '12:00'), ('12:00', '00:00')]) == [(0, MINUTES_PER_DAY)]
+
+def test_is_active_wraparound():
+    """Intervals are half-open and wrapping intervals cover both sides of midnight."""
+    wrapping = [(1260, 420)]
+    assert is_active(wrapping, 1260)
+    assert is_active(wrapping, 1439)
+    assert is_active(wrapping, 0)
+    assert is_active(wrapping, 419)
+    assert not is_active(wrapping, 420)
+    assert not is_active(wrapping, 1259)
+
+    assert is_active([(480, 1200)], 480)
+    assert not is_active([(480, 1200)], 1200)
+    assert is_active([(0, MINUTES_PER_DAY)], 720)
+
+def test_unblock_uses_engine_clock_off_utc():
+    """An unblock job judges its window by its scheduled minute, not the host's local time."""
+    original_tz = os.environ.get('TZ')
+    os.environ['TZ'] = 'America/New_York'
+    time.tzset()
+    workdir = tempfile.mkdtemp()
+    try:
+        scheduler = SchedulerService(DatabaseManager(os.path.join(workdir, 'test.db')), AdGuardAPI(),
+                                     engine='apscheduler')
+        unblocked = []
+        scheduler._unblock_website = lambda website_id, url, keep_blocked=None, timing=None: \
+            unblocked.append((url, keep_blocked))
+
+        # 08:00-20:00 UTC, with a subdomain blocked 19:00-21:00 UTC
+        scheduler._domain_intervals = {
+            'example.com': merge_windows([('08:00', '20:00')]),
+            'games.example.com': merge_windows([('19:00', '21:00')]),
+        }
+        scheduler._unblock_domain('example.com', 20 * 60)
+        assert unblocked == [('example.com', ['games.example.com'])]
+
+        # Still inside the window at 12:00 UTC
+        unblocked.clear()
+        scheduler._unblock_domain('example.com', 12 * 60)
+        assert unblocked == []
+    finally:
+        if original_tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = original_tz
+        time.tzset()
+
+if __name__ == '__main__':
+    test_merge_windows_wraparound()
+    test_is_active_wraparound()
+    test_unblock_uses_engine_clock_off_utc()
+    print("All interval tests passed")
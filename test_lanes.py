@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the instrumented execution lanes behind both scheduler engines.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.database import DatabaseManager
+from services.lanes import LANE_MAINTENANCE, InstrumentedPool
+from services.scheduler_service import LANE_EXECUTORS, SchedulerService
+
+def fail():
+    raise RuntimeError('disk full')
+
+def test_pool_counts_work_that_raises():
+    """Work that raises is counted as failed and still re-raised to its future."""
+    pool = InstrumentedPool('test', 1)
+    try:
+        assert pool.submit(lambda: 42).result(5) == 42
+        future = pool.submit(fail)
+        assert isinstance(future.exception(5), RuntimeError)
+        stats = pool.get_stats()
+        assert (stats['completed'], stats['failed'], stats['queued'], stats['running']) == (2, 1, 0, 0)
+    finally:
+        pool.shutdown()
+
+def check_job_failures_reach_lane_stats(engine):
+    """A job that raises shows up as failed in its lane's stats."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    scheduler = SchedulerService(db_manager, AdGuardAPI('http://127.0.0.1:9'), engine=engine)
+    ran = threading.Event()
+    scheduler.scheduler.start()
+    try:
+        scheduler.scheduler.add_job(fail, executor=LANE_EXECUTORS[LANE_MAINTENANCE])
+        scheduler.scheduler.add_job(ran.set, executor=LANE_EXECUTORS[LANE_MAINTENANCE])
+        assert ran.wait(5)
+        deadline = time.monotonic() + 5
+        stats = scheduler.get_lane_stats()[LANE_MAINTENANCE]
+        while (stats['completed'], stats['failed']) != (2, 1) and time.monotonic() < deadline:
+            time.sleep(0.01)
+            stats = scheduler.get_lane_stats()[LANE_MAINTENANCE]
+        assert (stats['completed'], stats['failed']) == (2, 1)
+    finally:
+        scheduler.scheduler.shutdown()
+
+def test_job_failures_apscheduler():
+    """Failed jobs are counted on the APScheduler engine."""
+    check_job_failures_reach_lane_stats('apscheduler')
+
+def test_job_failures_timeline():
+    """Failed jobs are counted on the timeline engine."""
+    check_job_failures_reach_lane_stats('timeline')
+
+if __name__ == '__main__':
+    test_pool_counts_work_that_raises()
+    test_job_failures_apscheduler()
+    test_job_failures_timeline()
+    print("All lane tests passed")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the cold log archive: appending, crash recovery and reading back.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+from services.log_archive import LogArchive
+
+def make_archive():
+    """Build a scratch database and an empty archive next to it."""
+    workdir = tempfile.mkdtemp()
+    return DatabaseManager(os.path.join(workdir, 'test.db')), LogArchive(os.path.join(workdir, 'archive'))
+
+def age_logs(db_manager, days):
+    """Move every log row the given number of days into the past."""
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute('UPDATE log_entries SET ts = ?', (int(time.time()) - days * 86400,))
+
+def test_archive_round_trip_and_crash_tail():
+    """Archived rows read back unchanged, and a torn write is dropped by the next append."""
+    db_manager, archive = make_archive()
+    for i in range(5):
+        db_manager.log_action(1, f'site{i}.com', 'block', i % 2 == 0, None if i % 2 == 0 else 'timeout')
+    age_logs(db_manager, 40)
+    first = list(db_manager.iter_logs())
+
+    assert archive.archive(db_manager, older_than_days=30, batch_size=2) == 5
+    assert list(db_manager.iter_logs()) == []
+    assert list(archive.iter_logs()) == first
+    month = archive._months()[0]
+    assert len(archive._load_index(month)['members']) == 3
+
+    # A run that crashed after writing but before committing its index
+    with open(archive._segment_path(month), 'ab') as f:
+        f.write(b'\x1f\x8b half a gzip member')
+
+    db_manager.log_action(2, 'late.com', 'unblock', True)
+    age_logs(db_manager, 40)
+    second = list(db_manager.iter_logs())
+    assert archive.archive(db_manager, older_than_days=30) == 1
+    assert os.path.getsize(archive._segment_path(month)) == archive._load_index(month)['size']
+    assert list(archive.iter_logs()) == first + second
+    assert list(archive.iter_logs(domain='late.com')) == second
+    assert archive.get_stats()['rows'] == 6
+
+def test_pending_rows_are_not_archived():
+    """Archiving stops at a row still waiting on the outbox and picks it up once settled."""
+    db_manager, archive = make_archive()
+    db_manager.log_action(1, 'before.com', 'block', True)
+    outbox_id = db_manager.enqueue_action(1, 'pending.com', 'block')
+    db_manager.log_action(1, 'after.com', 'block', True)
+    age_logs(db_manager, 40)
+
+    assert archive.archive(db_manager, older_than_days=30) == 1
+    assert [row.website_url for row in archive.iter_logs()] == ['before.com']
+    assert [row.website_url for row in db_manager.iter_logs()] == ['pending.com', 'after.com']
+
+    assert db_manager.complete_actions([outbox_id]) == 1
+    assert archive.archive(db_manager, older_than_days=30) == 2
+    assert [(row.website_url, row.success) for row in archive.iter_logs()] == \
+        [('before.com', 1), ('pending.com', 1), ('after.com', 1)]
+    assert list(db_manager.iter_logs()) == []
+
+def test_delete_skips_pending_rows():
+    """Deleting archived rows leaves any that are still pending."""
+    db_manager, _ = make_archive()
+    db_manager.enqueue_action(1, 'pending.com', 'block')
+    db_manager.log_action(1, 'done.com', 'block', True)
+    age_logs(db_manager, 40)
+
+    assert db_manager.delete_archived_logs(2, int(time.time())) == 1
+    assert [row.website_url for row in db_manager.iter_logs()] == ['pending.com']
+
+def test_retention_keeps_pending_and_unarchived_rows():
+    """Retention skips pending rows and, with archiving on, rows past the archive boundary."""
+    db_manager, archive = make_archive()
+    db_manager.log_action(1, 'archived.com', 'block', True)
+    db_manager.enqueue_action(1, 'pending.com', 'block')
+    db_manager.log_action(1, 'unarchived.com', 'block', True)
+    age_logs(db_manager, 40)
+
+    # Archiving stops at the pending row; retention must not drop what lies past it
+    assert archive.archive(db_manager, older_than_days=30) == 1
+    db_manager.cleanup_old_logs(30, archived_through=archive.get_max_id())
+    assert [row.website_url for row in db_manager.iter_logs()] == ['pending.com', 'unarchived.com']
+
+    # Without an archive only the pending row survives
+    db_manager.cleanup_old_logs(30)
+    assert [row.website_url for row in db_manager.iter_logs()] == ['pending.com']
+
+if __name__ == '__main__':
+    test_archive_round_trip_and_crash_tail()
+    test_pending_rows_are_not_archived()
+    test_delete_skips_pending_rows()
+    test_retention_keeps_pending_and_unarchived_rows()
+    print("All log archive tests passed")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for migrating the old text-based logs table to the compact log schema.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+
+# Tables as the previous release created them
+OLD_SCHEMA = '''
+    CREATE TABLE schedules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        enabled BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE websites (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        schedule_id INTEGER,
+        url TEXT NOT NULL,
+        enabled BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (schedule_id) REFERENCES schedules (id) ON DELETE CASCADE
+    );
+    CREATE TABLE logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        website_id INTEGER,
+        website_url TEXT NOT NULL,
+        action TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        success BOOLEAN DEFAULT 1,
+        error_message TEXT,
+        FOREIGN KEY (website_id) REFERENCES websites (id)
+    );
+    CREATE INDEX idx_logs_timestamp ON logs(timestamp DESC);
+    CREATE TABLE outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        website_id INTEGER,
+        domain TEXT NOT NULL,
+        action TEXT NOT NULL,
+        keep_blocked TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL DEFAULT 0,
+        last_error TEXT,
+        log_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (log_id) REFERENCES logs (id)
+    );
+'''
+
+def make_old_database():
+    """Write a database in the old schema and return its path and log rows."""
+    path = os.path.join(tempfile.mkdtemp(), 'old.db')
+    today = datetime.now(timezone.utc).replace(microsecond=0)
+    stamp = lambda hours: (today - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
+    rows = [
+        (1, 1, 'youtube.com', 'block', stamp(3), 1, None),
+        (2, 1, 'youtube.com', 'unblock', stamp(2), 0, 'Connection timeout'),
+        (4, 2, 'reddit.com', 'manual_block', stamp(1), None, None),
+        (5, 2, 'reddit.com', 'block', stamp(1), 1, None),
+    ]
+    with sqlite3.connect(path) as conn:
+        conn.executescript(OLD_SCHEMA)
+        conn.execute("INSERT INTO schedules (name, start_time, end_time) VALUES ('Focus', '09:00', '17:00')")
+        conn.executemany('INSERT INTO websites (schedule_id, url) VALUES (1, ?)', [('youtube.com',), ('reddit.com',)])
+        conn.executemany('INSERT INTO logs VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        # Two finished actions were cleaned up, one is still waiting on log 4
+        conn.execute('''
+            INSERT INTO outbox (id, website_id, domain, action, log_id) VALUES (3, 2, 'reddit.com', 'manual_block', 4)
+        ''')
+        conn.execute("UPDATE sqlite_sequence SET seq = 7 WHERE name = 'outbox'")
+    return path, rows
+
+def test_old_logs_migrate_intact():
+    """IDs, outbox links, rollups and search all survive the move to log_entries."""
+    path, rows = make_old_database()
+    db_manager = DatabaseManager(path)
+
+    assert [tuple(row[field] for field in ('id', 'website_id', 'website_url', 'action', 'timestamp', 'success',
+                                            'error_message')) for row in db_manager.iter_logs()] == rows
+    with sqlite3.connect(path) as conn:
+        kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name IN ('logs', 'outbox')"))
+        outbox_sql, = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'outbox'").fetchone()
+        rollups = conn.execute('''
+            SELECT domain, action, succeeded, failed, pending FROM log_rollups ORDER BY domain, action
+        ''').fetchall()
+    assert kinds == {'logs': 'view', 'outbox': 'table'}
+    assert 'REFERENCES log_entries' in outbox_sql and 'REFERENCES logs' not in outbox_sql
+    assert rollups == [
+        ('reddit.com', 'block', 1, 0, 0),
+        ('reddit.com', 'manual_block', 0, 0, 1),
+        ('youtube.com', 'block', 1, 0, 0),
+        ('youtube.com', 'unblock', 0, 1, 0),
+    ]
+
+    assert [hit['id'] for hit in db_manager.search('timeout')['logs']] == [2]
+    assert [hit['id'] for hit in db_manager.search('reddit')['logs']] == [5, 4]
+
+    # The pending action still completes its migrated log entry
+    assert db_manager.get_action(3)['log_id'] == 4
+    assert db_manager.complete_actions([3]) == 1
+    assert [row.success for row in db_manager.iter_logs() if row.id == 4] == [1]
+    assert db_manager.get_history_summary(days=1)['by_schedule'][0]['succeeded'] == 3
+
+    # New rows continue after the old IDs
+    assert db_manager.enqueue_action(1, 'youtube.com', 'block') == 8
+    assert max(row.id for row in db_manager.iter_logs()) == 6
+
+    # Opening the migrated database again changes nothing
+    before = list(db_manager.iter_logs())
+    assert list(DatabaseManager(path).iter_logs()) == before
+
+if __name__ == '__main__':
+    test_old_logs_migrate_intact()
+    print("All log migration tests passed")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the slotted row models and their sqlite3 row factory.
+"""
+
+import os
+import sqlite3
+import sys
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.models import Website, row_factory
+
+def make_connection():
+    """Build an in-memory database with one website row."""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE websites (id INTEGER, schedule_id INTEGER, url TEXT, enabled BOOLEAN)')
+    conn.execute("INSERT INTO websites VALUES (3, 1, 'youtube.com', 1)")
+    conn.row_factory = row_factory(Website)
+    return conn
+
+def test_row_factory_column_sets():
+    """Leading, partial and reordered column sets all fill the right fields."""
+    conn = make_connection()
+
+    leading = conn.execute('SELECT id, schedule_id, url FROM websites').fetchone()
+    assert (leading.id, leading.schedule_id, leading.url, leading.enabled) == (3, 1, 'youtube.com', None)
+
+    reordered = conn.execute('SELECT url, id, enabled AS schedule_enabled FROM websites').fetchone()
+    assert reordered == Website(id=3, url='youtube.com', schedule_enabled=1)
+
+    # A second query shape on the same connection gets its own mapping
+    assert conn.execute('SELECT url FROM websites').fetchone() == Website(url='youtube.com')
+    assert conn.execute('SELECT enabled, id FROM websites').fetchone() == Website(id=3, enabled=1)
+
+    try:
+        conn.execute('SELECT id, url AS address FROM websites').fetchone()
+        assert False, "unknown column accepted"
+    except ValueError as e:
+        assert 'address' in str(e)
+
+def test_rows_behave_like_mappings():
+    """Rows support item access, get(), keys() and dict() alongside attributes."""
+    row = make_connection().execute('SELECT url, id FROM websites').fetchone()
+
+    assert row['url'] == 'youtube.com' and row.get('schedule_name') is None
+    assert row.get('missing', 'default') == 'default'
+    assert 'url' in row and 'missing' not in row
+    assert row.keys() == Website.__slots__
+    assert dict(row) == dict(Website(id=3, url='youtube.com').items())
+    assert row.to_dict() == dict(row)
+
+    row['enabled'] = 0
+    assert row.enabled == 0
+    for bad in (lambda: row['missing'], lambda: row.__setitem__('missing', 1)):
+        try:
+            bad()
+            assert False, "unknown field accepted"
+        except KeyError:
+            pass
+
+if __name__ == '__main__':
+    test_row_factory_column_sets()
+    test_rows_behave_like_mappings()
+    print("All model tests passed")
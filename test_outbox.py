@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the AdGuard action outbox: superseding, retries and dead-lettering.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.database import DatabaseManager
+from services.rule_compiler import SECTION_BEGIN, SECTION_END
+from services.scheduler_service import SchedulerService
+
+class RejectingAdGuard(AdGuardAPI):
+    """In-memory AdGuard that rejects any rule list containing an invalid rule."""
+
+    def __init__(self):
+        """Initialize fake with no user rules."""
+        super().__init__('http://adguard.invalid', 'admin', 'secret')
+        self.rules = []
+
+    def _make_request(self, method, endpoint, data=None):
+        if endpoint == '/control/filtering/status':
+            return {'user_rules': list(self.rules)}
+        if endpoint == '/control/filtering/set_rules':
+            if any(' ' in rule and not rule.startswith('!') for rule in data['rules']):
+                return None  # AdGuard answers 400 for a rule it cannot parse
+            self.rules = list(data['rules'])
+            return {}
+        return None
+
+def make_scheduler():
+    """Build a scheduler service on a scratch database and a rejecting AdGuard."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    return SchedulerService(db_manager, RejectingAdGuard(), engine='apscheduler')
+
+def log_entry(db_manager, log_id):
+    """Get (success, error_message) of a log entry."""
+    with sqlite3.connect(db_manager.db_path) as conn:
+        return conn.execute('SELECT success, error_message FROM log_entries WHERE id = ?', (log_id,)).fetchone()
+
+def test_later_action_supersedes_pending_one():
+    """A block followed by an unblock of the same domain collapses into the unblock."""
+    db_manager = make_scheduler().db_manager
+    first = db_manager.enqueue_action(1, 'example.com', 'block')
+    second = db_manager.enqueue_action(1, 'example.com', 'unblock')
+
+    assert db_manager.get_action(first)['status'] == 'superseded'
+    assert log_entry(db_manager, db_manager.get_action(first)['log_id']) == (0, 'Superseded by a later action')
+    assert [action['id'] for action in db_manager.get_ready_actions()] == [second]
+
+def test_bad_action_is_isolated_and_dead_lettered():
+    """One rejected action neither blocks the rest of its batch nor retries forever."""
+    scheduler = make_scheduler()
+    scheduler.outbox_max_attempts = 2
+    db_manager = scheduler.db_manager
+    good = [db_manager.enqueue_action(1, 'good1.com', 'block'), db_manager.enqueue_action(2, 'good2.com', 'block')]
+    bad = db_manager.enqueue_action(3, 'bad domain', 'block')
+
+    assert scheduler._dispatch_outbox() == 2
+    assert scheduler.adguard_api.rules == [SECTION_BEGIN, '||good1.com^', '||good2.com^', SECTION_END]
+    assert all(db_manager.get_action(outbox_id)['status'] == 'done' for outbox_id in good)
+
+    status = scheduler.get_action_status(bad)
+    assert status['status'] == 'pending' and status['attempts'] == 1
+    assert db_manager.get_ready_actions() == []  # backing off
+
+    # Make the retry due; the second failure uses up its attempts
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute('UPDATE outbox SET next_attempt_at = 0 WHERE id = ?', (bad,))
+    assert scheduler._dispatch_outbox() == 0
+
+    status = scheduler.get_action_status(bad)
+    assert status['status'] == 'failed' and status['attempts'] == 2
+    success, error_message = log_entry(db_manager, db_manager.get_action(bad)['log_id'])
+    assert success == 0 and error_message.startswith('Failed after 2 attempts')
+    assert db_manager.count_pending_actions() == 0
+
+def test_outage_never_uses_up_attempts():
+    """Passes that find AdGuard down postpone actions without counting them as attempts."""
+    scheduler = make_scheduler()
+    scheduler.outbox_max_attempts = 2
+    db_manager = scheduler.db_manager
+    circuit = scheduler.adguard_api.circuit
+    circuit.recovery_timeout = 3600
+    for _ in range(circuit.failure_threshold):
+        circuit.record_failure('connection refused')
+    outbox_id = db_manager.enqueue_action(1, 'example.com', 'block')
+
+    delays = []
+    for _ in range(scheduler.outbox_max_attempts + 3):
+        assert scheduler._dispatch_outbox() == 0
+        with sqlite3.connect(db_manager.db_path) as conn:
+            next_attempt_at, = conn.execute('SELECT next_attempt_at FROM outbox WHERE id = ?', (outbox_id,)).fetchone()
+            delays.append(next_attempt_at)
+            conn.execute('UPDATE outbox SET next_attempt_at = 0 WHERE id = ?', (outbox_id,))
+
+    status = scheduler.get_action_status(outbox_id)
+    assert status['status'] == 'pending' and status['attempts'] == 0
+    assert status['error'].startswith('AdGuard unavailable')
+    assert delays == sorted(delays)  # backing off
+
+    # Once AdGuard is back the action goes through
+    circuit.record_success()
+    assert scheduler._dispatch_outbox() == 1
+    assert scheduler.get_action_status(outbox_id)['status'] == 'succeeded'
+
+def test_debounced_manual_actions_dispatch_on_the_transitions_lane():
+    """Rapid manual clicks collapse into one dispatch, run by a lane worker rather than the timer thread."""
+    scheduler = make_scheduler()
+    scheduler._dispatch_buffer.delay = 0.05
+    threads = []
+    dispatch = scheduler._dispatch_outbox
+    scheduler._dispatch_outbox = lambda: threads.append(threading.current_thread().name) or dispatch()
+
+    first = scheduler.submit_manual_action(1, 'example.com', 'manual_block')
+    second = scheduler.submit_manual_action(1, 'example.com', 'manual_unblock')
+    assert threads == []
+    deadline = time.monotonic() + 5
+    while scheduler.get_action_status(second)['status'] == 'pending' and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert scheduler.get_action_status(first)['status'] == 'failed'  # superseded
+    assert scheduler.get_action_status(second)['status'] == 'succeeded'
+    assert len(threads) == 1 and threads[0].startswith('lane-transitions')
+
+if __name__ == '__main__':
+    test_later_action_supersedes_pending_one()
+    test_bad_action_is_isolated_and_dead_lettered()
+    test_outage_never_uses_up_attempts()
+    test_debounced_manual_actions_dispatch_on_the_transitions_lane()
+    print("All outbox tests passed")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental AdGuard query-log ingestion.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+from services.querylog_ingest import CURSOR_NAME, QueryLogIngester, parse_log_time
+
+class FakeQueryLog:
+    """Paged query log that serves entries newest first, like AdGuard's /control/querylog."""
+
+    def __init__(self):
+        """Initialize an empty log."""
+        self.entries = []
+        self.calls = 0
+        self.clock = 0
+
+    def log(self, name, reason='NotFilteredNotFound'):
+        """Append a query one second after the previous one."""
+        self.clock += 1
+        minute, second = divmod(self.clock, 60)
+        self.entries.insert(0, {
+            'time': f'2026-10-19T10:{minute:02d}:{second:02d}.123456789+02:00',
+            'question': {'name': name + '.', 'type': 'A'},
+            'reason': reason,
+        })
+
+    def get_query_log(self, older_than=None, limit=500):
+        """Get the page of entries older than older_than."""
+        self.calls += 1
+        cutoff = parse_log_time(older_than) if older_than else None
+        page = [entry for entry in self.entries
+                if cutoff is None or parse_log_time(entry['time']) < cutoff][:limit]
+        return {'data': page, 'oldest': page[-1]['time'] if page else ''}
+
+def make_ingester(querylog, max_pages=20):
+    """Get an ingester for youtube.com and reddit.com on a scratch database."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    ingester = QueryLogIngester(db_manager, querylog, lambda: ['youtube.com', 'reddit.com'],
+                                page_size=2, max_pages=max_pages)
+    return db_manager, ingester
+
+def totals(db_manager):
+    """Sum the stored queries and blocks per domain."""
+    result = {}
+    for bucket in db_manager.get_query_buckets(0, 2 ** 40):
+        counts = result.setdefault(bucket['domain'], [0, 0])
+        counts[0] += bucket['queries']
+        counts[1] += bucket['blocked']
+    return result
+
+def test_runs_stop_at_the_cursor():
+    """Each run reads only back to the previous run's newest entry, so nothing is counted twice."""
+    querylog = FakeQueryLog()
+    db_manager, ingester = make_ingester(querylog)
+    querylog.log('www.youtube.com')
+    querylog.log('example.org')
+    querylog.log('youtube.com', 'FilteredBlackList')
+    querylog.log('reddit.com')
+    querylog.log('youtube.com')
+
+    assert ingester.ingest() == 4
+    assert querylog.calls == 4  # three pages and the empty one past the end
+    assert totals(db_manager) == {'youtube.com': [3, 1], 'reddit.com': [1, 0]}
+    assert db_manager.get_ingest_cursor(CURSOR_NAME) == str(parse_log_time(querylog.entries[0]['time']))
+
+    querylog.calls = 0
+    querylog.log('reddit.com', 'FilteredBlackList')
+    querylog.log('old.reddit.com')
+    querylog.log('youtube.com')
+    assert ingester.ingest() == 3
+    assert querylog.calls == 2  # the second page reaches the cursor
+    assert totals(db_manager) == {'youtube.com': [4, 1], 'reddit.com': [3, 1]}
+
+    querylog.calls = 0
+    assert ingester.ingest() == 0
+    assert querylog.calls == 1
+    assert totals(db_manager) == {'youtube.com': [4, 1], 'reddit.com': [3, 1]}
+
+def test_backlog_past_max_pages_is_skipped():
+    """A backlog longer than max_pages keeps only the newest pages and never returns to the rest."""
+    querylog = FakeQueryLog()
+    db_manager, ingester = make_ingester(querylog, max_pages=3)
+    querylog.log('youtube.com')
+    assert ingester.ingest() == 1
+
+    querylog.calls = 0
+    for _ in range(10):
+        querylog.log('youtube.com')
+    assert ingester.ingest() == 6
+    assert querylog.calls == 3
+    assert totals(db_manager) == {'youtube.com': [7, 0]}
+
+    # The four skipped entries are older than the new cursor
+    querylog.calls = 0
+    assert ingester.ingest() == 0
+    assert querylog.calls == 1
+    assert totals(db_manager) == {'youtube.com': [7, 0]}
+
+def test_buckets_and_cursor_commit_together():
+    """If the cursor cannot be saved the buckets roll back too, and the retry counts each entry once."""
+    querylog = FakeQueryLog()
+    db_manager, ingester = make_ingester(querylog)
+    for _ in range(3):
+        querylog.log('youtube.com')
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute('''
+            CREATE TRIGGER fail_cursor BEFORE INSERT ON ingest_cursors
+            BEGIN SELECT RAISE(ABORT, 'disk I/O error'); END
+        ''')
+
+    assert ingester.ingest() is None
+    assert totals(db_manager) == {}
+    assert db_manager.get_ingest_cursor(CURSOR_NAME) is None
+
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute('DROP TRIGGER fail_cursor')
+    assert ingester.ingest() == 3
+    assert ingester.ingest() == 0
+    assert totals(db_manager) == {'youtube.com': [3, 0]}
+
+def test_failed_page_saves_nothing():
+    """A page AdGuard fails to serve aborts the run without moving the cursor."""
+    querylog = FakeQueryLog()
+    db_manager, ingester = make_ingester(querylog)
+    for _ in range(3):
+        querylog.log('reddit.com')
+    serve = querylog.get_query_log
+    querylog.get_query_log = lambda older_than=None, limit=500: serve(older_than, limit) if not older_than else None
+
+    assert ingester.ingest() is None
+    assert totals(db_manager) == {} and db_manager.get_ingest_cursor(CURSOR_NAME) is None
+
+    querylog.get_query_log = serve
+    assert ingester.ingest() == 3
+    assert totals(db_manager) == {'reddit.com': [3, 0]}
+
+if __name__ == '__main__':
+    test_runs_stop_at_the_cursor()
+    test_backlog_past_max_pages_is_skipped()
+    test_buckets_and_cursor_commit_together()
+    test_failed_page_saves_nothing()
+    print("All query-log ingestion tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for applying schedule edits as diffs, in the database and in the job engine.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.database import DatabaseManager
+from services.scheduler_service import SchedulerService
+
+def website_ids(db_manager, schedule_id):
+    """Map each URL of a schedule to its website ID."""
+    return {website['url']: website['id'] for website in db_manager.get_schedule(schedule_id)['websites']}
+
+def test_update_schedule_diff():
+    """Only added and removed websites are written; the schedule row only when a field changed."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    schedule_id = db_manager.add_schedule('Focus', '09:00', '17:00', ['a.com', 'b.com'])
+    before = website_ids(db_manager, schedule_id)
+
+    diff = db_manager.update_schedule(schedule_id, 'Focus', '09:00', '17:00', ['a.com', 'c.com', 'c.com'], True)
+    assert [website['url'] for website in diff['added']] == ['c.com']
+    assert diff['removed'] == [before['b.com']]
+    assert [website['id'] for website in diff['kept']] == [before['a.com']]
+    assert not diff['times_changed'] and not diff['enabled_changed']
+    assert website_ids(db_manager, schedule_id) == {'a.com': before['a.com'], 'c.com': diff['added'][0]['id']}
+
+    # An unchanged schedule row is not rewritten
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute("UPDATE schedules SET updated_at = 'untouched' WHERE id = ?", (schedule_id,))
+    diff = db_manager.update_schedule(schedule_id, 'Focus', '09:00', '17:00', ['a.com', 'c.com'], True)
+    assert (diff['added'], diff['removed'], len(diff['kept'])) == ([], [], 2)
+    assert db_manager.get_schedule(schedule_id)['updated_at'] == 'untouched'
+
+    diff = db_manager.update_schedule(schedule_id, 'Focus', '10:00', '17:00', ['a.com', 'c.com'], False)
+    assert diff['times_changed'] and diff['enabled_changed']
+    assert all(not website['enabled'] for website in diff['kept'])
+    schedule = db_manager.get_schedule(schedule_id)
+    assert (schedule['start_time'], schedule['enabled']) == ('10:00', 0)
+    assert all(not website['enabled'] for website in schedule['websites'])
+
+    assert db_manager.update_schedule(schedule_id + 1, 'Missing', '09:00', '17:00', ['a.com'], True) is None
+
+class JobSpy:
+    """Record the transition job calls a scheduler engine receives."""
+
+    def __init__(self, engine):
+        """Wrap an engine's job methods."""
+        self.calls = []
+        for method in ('add_job', 'remove_job', 'reschedule_job', 'modify_job'):
+            setattr(engine, method, self._wrap(method, getattr(engine, method)))
+
+    def _wrap(self, method, original):
+        def record(*args, **kwargs):
+            job_id = kwargs.get('id') or args[0]
+            if job_id.startswith(('block_', 'unblock_')):
+                self.calls.append((method, job_id))
+            return original(*args, **kwargs)
+        return record
+
+    def take(self):
+        """Get and clear the recorded calls (APScheduler's reschedule_job calls modify_job itself)."""
+        calls, self.calls = sorted(set(self.calls)), []
+        return calls
+
+def check_diff_jobs(engine):
+    """Edits touch only the jobs of the websites they change, moving jobs in place."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    scheduler = SchedulerService(db_manager, AdGuardAPI('http://127.0.0.1:9'), engine=engine)
+    schedule_id = db_manager.add_schedule('Focus', '09:00', '17:00', ['a.com', 'b.com'])
+    scheduler.schedule_many(db_manager.get_enabled_websites())
+    spy = JobSpy(scheduler.scheduler)
+
+    # Adding one site adds exactly its two jobs
+    diff = db_manager.update_schedule(schedule_id, 'Focus', '09:00', '17:00', ['a.com', 'b.com', 'c.com'], True)
+    scheduler.queue_schedule_diff(diff)
+    scheduler.flush_pending()
+    assert spy.take() == [('add_job', 'block_c.com_0'), ('add_job', 'unblock_c.com_0')]
+
+    # Moving the start moves each block job in place and leaves unblock jobs alone
+    diff = db_manager.update_schedule(schedule_id, 'Focus', '10:00', '17:00', ['a.com', 'b.com', 'c.com'], True)
+    scheduler.queue_schedule_diff(diff)
+    scheduler.flush_pending()
+    assert spy.take() == sorted((method, f'block_{domain}_0') for domain in ('a.com', 'b.com', 'c.com')
+                                for method in ('modify_job', 'reschedule_job'))
+    job = scheduler.scheduler.get_job('block_a.com_0')
+    assert job.args == ['a.com', 600] and 'a.com' in scheduler.get_domain_intervals()
+
+    # Removing one site removes only its jobs; a rename touches none
+    diff = db_manager.update_schedule(schedule_id, 'Focus', '10:00', '17:00', ['a.com', 'c.com'], True)
+    scheduler.queue_schedule_diff(diff)
+    scheduler.flush_pending()
+    assert spy.take() == [('remove_job', 'block_b.com_0'), ('remove_job', 'unblock_b.com_0')]
+
+    diff = db_manager.update_schedule(schedule_id, 'Renamed', '10:00', '17:00', ['a.com', 'c.com'], True)
+    assert scheduler.queue_schedule_diff(diff) is None
+    scheduler.flush_pending()
+    assert spy.take() == []
+    assert scheduler.get_domain_intervals() == {'a.com': [('10:00', '17:00')], 'c.com': [('10:00', '17:00')]}
+
+def test_diff_jobs_apscheduler():
+    """Diff-driven job changes on the APScheduler engine."""
+    check_diff_jobs('apscheduler')
+
+def test_diff_jobs_timeline():
+    """Diff-driven job changes on the timeline engine."""
+    check_diff_jobs('timeline')
+
+if __name__ == '__main__':
+    test_update_schedule_diff()
+    test_diff_jobs_apscheduler()
+    test_diff_jobs_timeline()
+    print("All schedule diff tests passed")
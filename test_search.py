@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for full-text search over schedules, websites and logs.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager, fts_query
+
+def hits(results, kind, field):
+    """Get one field of each hit of a kind."""
+    return [hit[field] for hit in results[kind]]
+
+def test_fts_query_sanitizes_input():
+    """Free text becomes a single prefix phrase, with FTS operators and quotes reduced to words."""
+    assert fts_query('*.tiktok.com') == '"tiktok com"*'
+    assert fts_query('redd') == '"redd"*'
+    assert fts_query('Say "NEAR" -me') == '"say near me"*'
+    assert fts_query('NEAR(youtube reddit, 2)') == '"near youtube reddit 2"*'
+    assert fts_query('"') is None
+    assert fts_query(' -*: ') is None
+
+def test_partial_domains_match():
+    """Wildcard and partial domains find websites, their schedules' names and their logs."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    db_manager.add_schedule('Social media', '09:00', '17:00', ['tiktok.com', 'reddit.com', 'old.reddit.com'])
+    db_manager.log_action(None, 'tiktok.com', 'block', False, 'Connection timeout')
+
+    assert hits(db_manager.search('*.tiktok.com'), 'websites', 'url') == ['tiktok.com']
+    assert hits(db_manager.search('*.tiktok.com'), 'logs', 'website_url') == ['tiktok.com']
+    assert sorted(hits(db_manager.search('redd'), 'websites', 'url')) == ['old.reddit.com', 'reddit.com']
+    assert hits(db_manager.search('old-redd'), 'websites', 'url') == ['old.reddit.com']
+    assert hits(db_manager.search('soc'), 'schedules', 'name') == ['Social media']
+    assert hits(db_manager.search('timeout'), 'logs', 'error_message') == ['Connection timeout']
+
+def test_query_syntax_is_not_interpreted():
+    """Quotes, NEAR and minus signs in the input neither raise nor act as operators."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    db_manager.add_schedule('Focus', '09:00', '17:00', ['youtube.com', 'reddit.com'])
+
+    for text in ('"', 'youtube"', '"youtube', 'NEAR(youtube reddit)', 'youtube NEAR reddit',
+                 '-reddit', 'youtube -reddit', 'youtube OR reddit', 'url:youtube', '*'):
+        results = db_manager.search(text)
+        assert set(results) == {'schedules', 'websites', 'logs'}, text
+
+    # Operators are plain words: a minus does not exclude, OR does not widen
+    assert hits(db_manager.search('-reddit'), 'websites', 'url') == ['reddit.com']
+    assert hits(db_manager.search('"youtube'), 'websites', 'url') == ['youtube.com']
+    assert hits(db_manager.search('youtube OR reddit'), 'websites', 'url') == []
+    assert hits(db_manager.search('url:youtube'), 'websites', 'url') == []
+    assert db_manager.search('"') == {'schedules': [], 'websites': [], 'logs': []}
+
+def test_index_follows_updates_and_deletes():
+    """The sync triggers keep every index current as rows change or go away."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    schedule_id = db_manager.add_schedule('Evening', '18:00', '22:00', ['twitch.tv', 'netflix.com'])
+    netflix_id = {w['url']: w['id'] for w in db_manager.get_schedule(schedule_id)['websites']}['netflix.com']
+
+    db_manager.update_schedule(schedule_id, 'Late night', '18:00', '22:00', ['twitch.tv', 'hulu.com'], True)
+    assert hits(db_manager.search('evening'), 'schedules', 'name') == []
+    assert hits(db_manager.search('late nig'), 'schedules', 'name') == ['Late night']
+    assert hits(db_manager.search('netflix'), 'websites', 'url') == []
+    assert hits(db_manager.search('hulu'), 'websites', 'url') == ['hulu.com']
+
+    db_manager.delete_website(db_manager.search('twitch')['websites'][0]['id'])
+    assert hits(db_manager.search('twitch'), 'websites', 'url') == []
+    assert db_manager.get_website(netflix_id) is None
+
+    # A log's error message is indexed as it changes and dropped once the row is deleted
+    outbox_id = db_manager.enqueue_action(None, 'hulu.com', 'block')
+    log_id = db_manager.get_action(outbox_id)['log_id']
+    assert hits(db_manager.search('hulu'), 'logs', 'id') == [log_id]
+    db_manager.postpone_actions([outbox_id], 'Connection refused', 5)
+    assert hits(db_manager.search('refused'), 'logs', 'id') == [log_id]
+    db_manager.complete_actions([outbox_id])
+    assert hits(db_manager.search('refused'), 'logs', 'id') == []
+    assert hits(db_manager.search('hulu'), 'logs', 'id') == [log_id]
+
+    assert db_manager.delete_archived_logs(log_id, int(time.time()) + 60) == 1
+    assert hits(db_manager.search('hulu'), 'logs', 'id') == []
+
+if __name__ == '__main__':
+    test_fts_query_sanitizes_input()
+    test_partial_domains_match()
+    test_query_syntax_is_not_interpreted()
+    test_index_follows_updates_and_deletes()
+    print("All search tests passed")
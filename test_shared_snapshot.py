@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared schedule snapshot web workers read instead of SQLite.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.database import DatabaseManager
+from services.shared_snapshot import HEADER, SnapshotReader, SnapshotView, _encode, publish
+
+def make_database():
+    """Build a scratch database with overlapping, wrapping and disabled schedules."""
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+    db_manager.add_schedule('Work', '09:00', '17:00', ['YouTube.com', 'reddit.com'])
+    db_manager.add_schedule('Night', '22:00', '07:00', ['https://YouTube.com/watch', 'news.example'])
+    disabled = db_manager.add_schedule('Weekend', '10:00', '12:00', ['games.example'])
+    db_manager.update_schedule(disabled, 'Weekend', '10:00', '12:00', ['games.example'], False)
+    return db_manager
+
+def test_encode_decode_round_trip():
+    """Decoding an encoded payload gives back the schedules and their merged intervals."""
+    db_manager = make_database()
+    schedules = db_manager.get_all_schedules()
+    view = SnapshotView(7, _encode(schedules))
+
+    assert view.generation == 7
+    assert [schedule.to_dict() for schedule in view.schedules] == [schedule.to_dict() for schedule in schedules]
+    # Both spellings of YouTube share one domain, and the disabled schedule is left out
+    assert view.domain_intervals == {
+        'news.example': [(1320, 420)],
+        'reddit.com': [(540, 1020)],
+        'youtube.com': [(540, 1020), (1320, 420)],
+    }
+    assert view.count_active_websites() == 4
+    assert sorted(view.blocked_domains(23 * 60)) == ['news.example', 'youtube.com']
+    assert view.blocked_domains(8 * 60) == []
+
+    assert SnapshotView(1, _encode([])).schedules == []
+
+def test_reader_follows_generations_and_ignores_corruption():
+    """Each publish bumps the generation; a damaged file leaves the last good view in place."""
+    db_manager = make_database()
+    path = os.path.join(tempfile.mkdtemp(), 'snapshot')
+    reader = SnapshotReader(path)
+    assert reader.get() is None
+
+    assert publish(db_manager, path) == 1
+    first = reader.get()
+    assert first.generation == 1
+    assert reader.get() is first
+
+    db_manager.add_schedule('Lunch', '12:00', '13:00', ['twitch.tv'])
+    assert publish(db_manager, path) == 2
+    second = reader.get()
+    assert second.generation == 2 and 'twitch.tv' in second.domain_intervals
+
+    # Flip one payload byte so the checksum no longer matches
+    with open(path, 'r+b') as f:
+        f.seek(HEADER.size)
+        byte = f.read(1)
+        f.seek(HEADER.size)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    assert reader.get() is second
+    assert SnapshotReader(path).get() is None
+
+    assert publish(db_manager, path) == 3
+    assert reader.get().generation == 3
+
+def test_malformed_rows_never_fail_publishing():
+    """A schedule with a bad time is left out; the rest are still published."""
+    db_manager = make_database()
+    with sqlite3.connect(db_manager.db_path) as conn:
+        conn.execute("UPDATE schedules SET start_time = '9am' WHERE name = 'Work'")
+        conn.execute("UPDATE schedules SET end_time = '25:00' WHERE name = 'Weekend'")
+    path = os.path.join(tempfile.mkdtemp(), 'snapshot')
+
+    assert publish(db_manager, path) == 1
+    view = SnapshotReader(path).get()
+    assert [schedule['name'] for schedule in view.schedules] == ['Night']
+    assert sorted(view.domain_intervals) == ['news.example', 'youtube.com']
+
+if __name__ == '__main__':
+    test_encode_decode_round_trip()
+    test_reader_follows_generations_and_ignores_corruption()
+    test_malformed_rows_never_fail_publishing()
+    print("All shared snapshot tests passed")
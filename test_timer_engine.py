@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests that both scheduler engines fire transitions on the same UTC clock.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.database import DatabaseManager
+from services.scheduler_service import SchedulerService
+from services.timer_engine import DailyTrigger, TimelineScheduler
+
+def test_engines_agree_off_utc():
+    """On a non-UTC host both engines put a 21:30 transition at 21:30 UTC."""
+    original_tz = os.environ.get('TZ')
+    os.environ['TZ'] = 'America/New_York'
+    time.tzset()
+    workdir = tempfile.mkdtemp()
+    try:
+        now = datetime.now(timezone.utc)
+        fire_times = []
+        for engine in ('apscheduler', 'timeline'):
+            scheduler = SchedulerService(DatabaseManager(os.path.join(workdir, f'{engine}.db')), AdGuardAPI(),
+                                         engine=engine)
+            trigger = scheduler._get_trigger('21:30')
+            if engine == 'timeline':
+                fire_times.append(trigger.next_fire_time(now))
+            else:
+                fire_times.append(trigger.get_next_fire_time(None, now))
+
+        assert fire_times[0] == fire_times[1]
+        assert fire_times[1].utcoffset() == timedelta(0)
+        assert (fire_times[1].hour, fire_times[1].minute) == (21, 30)
+    finally:
+        if original_tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = original_tz
+        time.tzset()
+
+def test_timeline_jobs_report_aware_utc_times():
+    """Daily jobs' next run times are aware UTC datetimes like APScheduler's."""
+    scheduler = TimelineScheduler()
+    job = scheduler.add_job(lambda: None, DailyTrigger(6, 0), id='block_1')
+    assert job.next_run_time.tzinfo is timezone.utc
+    assert job.next_run_time > datetime.now(timezone.utc)
+    assert (job.next_run_time.hour, job.next_run_time.minute) == (6, 0)
+
+    # Run-once jobs go through the timer thread on the same clock
+    ran = threading.Event()
+    scheduler.start()
+    try:
+        scheduler.add_job(ran.set)
+        assert ran.wait(5)
+    finally:
+        scheduler.shutdown()
+
+if __name__ == '__main__':
+    test_engines_agree_off_utc()
+    test_timeline_jobs_report_aware_utc_times()
+    print("All timer engine tests passed")
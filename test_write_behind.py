@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the write-behind buffer that coalesces rapid schedule changes.
+"""
+
+import os
+import sys
+import tempfile
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.adguard_api import AdGuardAPI
+from services.database import DatabaseManager
+from services.scheduler_service import SchedulerService
+from services.write_behind import WriteBehindBuffer
+
+def test_changes_coalesce_into_one_batch():
+    """Changes before the timer fires merge into one flush, the latest value per key winning."""
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, delay=0.1)
+    first = buffer.submit(1, 'a')
+    buffer.submit(2, 'b')
+    last = buffer.submit(1, 'c')
+    assert first is last and not first.done
+    assert buffer.pending_count() == 2
+
+    assert last.wait(2)
+    assert batches == [{1: 'c', 2: 'b'}]
+    assert buffer.pending_count() == 0
+
+    # The next change starts a new batch with a new ticket
+    following = buffer.submit(3, 'd')
+    assert following is not first
+    assert following.wait(2) and batches[-1] == {3: 'd'}
+
+def test_ticket_reports_flush_errors():
+    """A failed flush releases waiters and marks their ticket with the error."""
+    def fail(changes):
+        raise RuntimeError('database is locked')
+    buffer = WriteBehindBuffer(fail, delay=0.05)
+    ticket = buffer.submit('key', 'value')
+    assert not ticket.wait(2)
+    assert ticket.done and str(ticket.error) == 'database is locked'
+
+def test_zero_delay_and_explicit_flush():
+    """A zero delay applies at once; flush() applies a pending batch without waiting for the timer."""
+    batches = []
+    assert WriteBehindBuffer(batches.append, delay=0).submit('now', 1).done
+    assert batches == [{'now': 1}]
+
+    buffer = WriteBehindBuffer(batches.append, delay=3600)
+    ticket = buffer.submit('later', 2)
+    assert not ticket.done
+    assert buffer.flush() is ticket and ticket.done
+    assert batches[-1] == {'later': 2}
+    assert buffer.flush().done  # nothing pending is a no-op
+
+def test_stop_flushes_buffered_schedule_changes():
+    """Stopping the scheduler applies changes still waiting in the buffer."""
+    os.environ['WRITE_BEHIND_DELAY_MS'] = '3600000'
+    try:
+        db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'test.db'))
+        scheduler = SchedulerService(db_manager, AdGuardAPI('http://127.0.0.1:9'), engine='timeline')
+    finally:
+        del os.environ['WRITE_BEHIND_DELAY_MS']
+    scheduler._running = True  # as if started, without starting the engine's jobs
+
+    ticket = scheduler.queue_schedule_website(7, 'youtube.com', '09:00', '17:00')
+    assert not ticket.done and scheduler.get_domain_intervals() == {}
+    scheduler.stop()
+    assert ticket.done
+    assert scheduler.get_domain_intervals() == {'youtube.com': [('09:00', '17:00')]}
+
+if __name__ == '__main__':
+    test_changes_coalesce_into_one_batch()
+    test_ticket_reports_flush_errors()
+    test_zero_delay_and_explicit_flush()
+    test_stop_flushes_buffered_schedule_changes()
+    print("All write-behind tests passed")